@@ -0,0 +1,127 @@
+"""
+Estimate of bytes scanned by typical queries on the San Diego BigQuery table with the old and new clustering.
+The numbers are simulated on synthetic data, they aren't measured in BigQuery.
+
+BigQuery isn't needed: the table is emulated like its storage, month partitions of crime_date, rows sorted
+by the clustering columns and split into blocks with min/max of every column. A query reads the blocks of
+its partitions whose min/max may match its filters, the same pruning BigQuery does for clustered tables,
+and is billed for the bytes of its columns in those blocks. The old spec set 'clustering', which isn't
+an option of the connector, so the table wasn't clustered at all.
+
+Clustering prunes blocks by a column only together with filters on the columns before it: the table is
+clustered by call_type, then beat, the grain of crime code and area of the rollups and dashboard filters.
+Filters on beat or disposition alone scan the same bytes as the unclustered table.
+
+Run locally:
+    python benchmarks/bq_clustering.py --rows 1000000 --cluster_by call_type,beat
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flows"))
+
+from schemas import SOURCES
+
+# bytes of the values of the table's columns, like BigQuery's logical sizes (strings as 2 + length)
+COLUMN_BYTES = {
+    "incident_num": 14,
+    "crime_datetime": 8,
+    "crime_date": 8,
+    "call_type": 6,
+    "disposition": 3,
+    "beat": 8,
+    "priority": 8,
+    "address": 30,
+}
+
+# queries of the dbt models and the dashboard: name, columns read and filters (column, low, high)
+QUERIES = [
+    ("fact_sd_crimedata, one changed month", list(COLUMN_BYTES),
+     [("crime_date", date(2022, 5, 1), date(2022, 5, 31))]),
+    ("crimes of a call type in a year", ["crime_date", "call_type"],
+     [("crime_date", date(2022, 1, 1), date(2022, 12, 31)), ("call_type", "415", "415")]),
+    ("crimes of a call type in a beat", ["crime_date", "beat", "call_type"],
+     [("call_type", "415", "415"), ("beat", 521, 521)]),
+    ("closed calls of a month", ["crime_date", "call_type", "disposition"],
+     [("crime_date", date(2022, 5, 1), date(2022, 5, 31)), ("disposition", "A", "A")]),
+]
+
+# rows of a storage block, small enough for months of the synthetic table to span many blocks
+BLOCK_ROWS = 1000
+
+
+def synthetic_sd(rows: int, seed: int = 1) -> list:
+    """Create rows of the San Diego table: skewed call types and beats over three years"""
+    rnd = random.Random(seed)
+    call_types = [str(code) for code in range(100, 400)] + ["415", "1016", "459", "10852"]
+    dispositions = ["A", "K", "R", "O", "U", "W", "X"]
+    beats = list(range(111, 941))
+    start = date(2021, 1, 1)
+    return [
+        {
+            "incident_num": f"E{21000000 + index}",
+            "crime_date": start + timedelta(days=rnd.randrange(3 * 365)),
+            "call_type": rnd.choice(call_types[-4:]) if rnd.random() < 0.3 else rnd.choice(call_types),
+            "disposition": rnd.choice(dispositions),
+            "beat": rnd.choice(beats),
+            "priority": rnd.randrange(10),
+        }
+        for index in range(rows)
+    ]
+
+
+def build_table(rows: list, cluster_columns: list, block_rows: int = BLOCK_ROWS) -> list:
+    """Return blocks of the table as (month, number of rows, {column: (min, max)})"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row["crime_date"].replace(day=1), []).append(row)
+    blocks = []
+    for month, partition in sorted(partitions.items()):
+        if cluster_columns:
+            partition = sorted(partition, key=lambda row: tuple(row[column] for column in cluster_columns))
+        for offset in range(0, len(partition), block_rows):
+            block = partition[offset:offset + block_rows]
+            ranges = {column: (min(row[column] for row in block), max(row[column] for row in block))
+                      for column in ["crime_date", "call_type", "disposition", "beat"]}
+            blocks.append((month, len(block), ranges))
+    return blocks
+
+
+def bytes_scanned(blocks: list, columns: list, filters: list, cluster_columns: list) -> int:
+    """Return bytes of the columns in blocks which aren't pruned by the partition and clustering columns"""
+    row_bytes = sum(COLUMN_BYTES[column] for column in columns)
+    total = 0
+    for month, rows, ranges in blocks:
+        skip = False
+        for column, low, high in filters:
+            if column == "crime_date":
+                next_month = (month + timedelta(days=32)).replace(day=1)
+                skip = skip or next_month <= low or month > high
+            elif cluster_columns and column in cluster_columns:
+                block_low, block_high = ranges[column]
+                skip = skip or block_high < low or block_low > high
+        if not skip:
+            total += rows * row_bytes
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate bytes scanned with clustering of the SD table")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--block_rows", type=int, default=BLOCK_ROWS)
+    parser.add_argument("--cluster_by", type=str, default=",".join(SOURCES["sd"]["cluster_columns"]),
+                        help="Clustering columns to compare with the unclustered table")
+    args = parser.parse_args()
+
+    print(f"Simulated bytes scanned for {args.rows} synthetic rows")
+    data = synthetic_sd(args.rows)
+    specs = [("old (not clustered)", []), (f"clustered by {args.cluster_by}", args.cluster_by.split(","))]
+    tables = [(name, columns, build_table(data, columns, args.block_rows)) for name, columns in specs]
+    for query, columns, filters in QUERIES:
+        print(query)
+        for name, cluster_columns, blocks in tables:
+            scanned = bytes_scanned(blocks, columns, filters, cluster_columns)
+            print(f"    {name:<45} {scanned / 1024 ** 2:10.1f} MB")
@@ -0,0 +1,76 @@
+"""
+Benchmark of decoding LA code columns: chains of when() against map lookups of code tables.
+
+Run locally:
+    python benchmarks/code_tables.py --rows 3000000
+"""
+import argparse
+import os
+import sys
+import time
+
+from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql import functions as F
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flows"))
+
+from schemas import CODE_TABLES
+from spark_job import decode
+
+COLUMNS = ["vict_sex", "vict_descent"]
+
+
+def decode_with_when(column: str):
+    """Decode the column with a chain of when() like modify_la did before code tables"""
+    codes, default = CODE_TABLES[column]
+    decoded = None
+    for code, description in codes.items():
+        condition = F.col(column) == code
+        decoded = F.when(condition, description) if decoded is None else decoded.when(condition, description)
+    return decoded.otherwise(default)
+
+
+def synthetic_la(spark: SparkSession, rows: int) -> DataFrame:
+    """Create LA-sized data with random codes, some of them are unknown or null"""
+    columns = []
+    for column in COLUMNS:
+        codes = list(CODE_TABLES[column][0]) + ["-", None]
+        codes_array = F.array(*[F.lit(code) for code in codes])
+        index = (F.rand(seed=len(column)) * len(codes)).cast("int")
+        columns.append(codes_array[index].alias(column))
+    return spark.range(rows).select("id", *columns).cache()
+
+
+def run(df: DataFrame, decoder) -> float:
+    """Decode all columns and return seconds of the job without writing the result"""
+    start = time.perf_counter()
+    df.select("id", *[decoder(column).alias(column) for column in COLUMNS]) \
+        .write.format("noop").mode("overwrite").save()
+    return time.perf_counter() - start
+
+
+def main(params):
+    spark = SparkSession.builder \
+        .master(f"local[{params.cores}]") \
+        .appName("benchmark-code-tables") \
+        .getOrCreate()
+
+    df = synthetic_la(spark, params.rows)
+    print(f"Rows: {df.count()}")
+
+    # the first runs warm up JIT of both expressions
+    run(df, decode_with_when)
+    run(df, decode)
+    for name, decoder in [("when() chains", decode_with_when), ("code tables", decode)]:
+        timings = [run(df, decoder) for _ in range(params.repeat)]
+        print(f"{name}: best {min(timings):.2f} s, mean {sum(timings) / len(timings):.2f} s")
+
+    spark.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark decoding of code columns")
+    parser.add_argument("--rows", type=int, default=3_000_000, help="Number of rows, about the size of LA data")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each decoder")
+    parser.add_argument("--cores", type=int, default=4, help="Number of local cores")
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Benchmark of Parquet layouts of the LA lake: file size and scan time of default and sorted files
+with snappy and zstd compression.
+
+Run locally:
+    python benchmarks/parquet_layout.py --rows 3000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql import functions as F
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flows"))
+
+from spark_job import write_parquet, parquet_layout
+
+SETTINGS = [
+    ("default, snappy", None, "snappy"),
+    ("default, zstd", None, "zstd"),
+    ("sorted, snappy", "sorted", "snappy"),
+    ("sorted, zstd", "sorted", "zstd"),
+]
+
+# columns read by the scan, like the BigQuery load of modify_la
+SCAN_COLUMNS = ["DATE_OCC", "Crm_Cd", "Crm_Cd_Desc", "AREA_NAME", "Status_Desc"]
+
+
+def synthetic_la(spark: SparkSession, rows: int) -> DataFrame:
+    """Create LA-sized raw data with low-cardinality codes and descriptions of crimes, areas and statuses"""
+    crime_code = (F.rand(seed=1) * 140).cast("int") + 100
+    area = (F.rand(seed=2) * 21).cast("int") + 1
+    status = F.array(*[F.lit(value) for value in ["Invest Cont", "Adult Other", "Adult Arrest", "Juv Arrest"]])
+    return spark.range(rows).select(
+        F.col("id").cast("int").alias("DR_NO"),
+        F.date_format(F.date_add(F.lit("2020-01-01"), (F.rand(seed=3) * 1200).cast("int")),
+                      "MM/dd/yyyy hh:mm:ss a").alias("DATE_OCC"),
+        crime_code.alias("Crm_Cd"),
+        F.concat(F.lit("CRIME DESCRIPTION "), crime_code).alias("Crm_Cd_Desc"),
+        area.alias("AREA"),
+        F.concat(F.lit("Area "), area).alias("AREA_NAME"),
+        status[(F.rand(seed=4) * 4).cast("int")].alias("Status_Desc"),
+        (F.rand(seed=5) + 33.5).alias("LAT"),
+        (F.rand(seed=6) - 118.9).alias("LON"),
+    ).cache()
+
+
+def directory_size(path: str) -> int:
+    """Return total size in bytes of Parquet files in the directory"""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(".parquet"))
+
+
+def scan(spark: SparkSession, path: str) -> float:
+    """Read the columns of the load from the files and return seconds of the job without writing the result"""
+    start = time.perf_counter()
+    spark.read.parquet(path).select(*SCAN_COLUMNS).write.format("noop").mode("overwrite").save()
+    return time.perf_counter() - start
+
+
+def main(params):
+    spark = SparkSession.builder \
+        .master(f"local[{params.cores}]") \
+        .appName("benchmark-parquet-layout") \
+        .getOrCreate()
+
+    df = synthetic_la(spark, params.rows)
+    print(f"Rows: {df.count()}")
+
+    output_dir = tempfile.mkdtemp(prefix="parquet_layout_")
+    try:
+        for name, layout, compression in SETTINGS:
+            path = os.path.join(output_dir, name.replace(", ", "_"))
+            start = time.perf_counter()
+            with redirect_stdout(None):
+                write_parquet(df, path, params.files, **parquet_layout("la", layout, compression))
+            write_seconds = time.perf_counter() - start
+
+            # the first scan warms up the page cache and JIT
+            scan(spark, path)
+            timings = [scan(spark, path) for _ in range(params.repeat)]
+            print(f"{name}: {directory_size(path) / 1024 / 1024:.1f} MB, write {write_seconds:.2f} s, "
+                  f"scan best {min(timings):.2f} s, mean {sum(timings) / len(timings):.2f} s")
+    finally:
+        shutil.rmtree(output_dir)
+
+    spark.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark layouts of Parquet files")
+    parser.add_argument("--rows", type=int, default=3_000_000, help="Number of rows, about the size of LA data")
+    parser.add_argument("--files", type=int, default=8, help="Number of Parquet files")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of scans of each layout")
+    parser.add_argument("--cores", type=int, default=4, help="Number of local cores")
+    main(parser.parse_args())
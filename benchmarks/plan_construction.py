@@ -0,0 +1,151 @@
+"""
+Benchmark of building plans of modify_aus/modify_la on the driver:
+chains of withColumnRenamed/withColumn calls against one select generated from the column spec.
+Every call of the chain creates and analyzes a new plan, so the time grows with the number of columns.
+
+Run locally:
+    python benchmarks/plan_construction.py --repeat 50
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql import functions as F
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flows"))
+
+from spark_job import spark_schema, decode, modify_aus, modify_la
+
+
+def modify_aus_chained(df: DataFrame) -> DataFrame:
+    """modify_aus with chained withColumnRenamed/withColumn calls"""
+    # To convert fields like 'Occurred_Date_Time' to Timestamp format
+    timestamp_format = "MM/dd/yyyy hh:mm:ss a"
+    # To convert fields like 'Occurred_Date' to Date format
+    date_format = "MM/dd/yyyy"
+
+    df_dt = df \
+        .withColumnRenamed("Incident_Number", "incident_num") \
+        .withColumnRenamed("Highest_Offense_Description", "crime_description") \
+        .withColumnRenamed("Highest_Offense_Code", "crime_code") \
+        .withColumnRenamed("Family_Violence", "family_violence") \
+        .withColumnRenamed("Location_Type", "location_type") \
+        .withColumnRenamed("Address", "address") \
+        .withColumnRenamed("Zip_Code", "zip_code") \
+        .withColumnRenamed("Council_District", "council_district") \
+        .withColumnRenamed("APD_Sector", "apd_sector") \
+        .withColumnRenamed("APD_District", "apd_district") \
+        .withColumnRenamed("PRA", "pra") \
+        .withColumnRenamed("Census_Tract", "census_tract") \
+        .withColumnRenamed("Clearance_Status", "clearance_status") \
+        .withColumnRenamed("UCR_Category", "ucr_category") \
+        .withColumnRenamed("Category_Description", "category_description") \
+        .withColumn("crime_datetime", F.to_timestamp("Occurred_Date_Time", timestamp_format)) \
+        .withColumn("crime_date", F.to_date("Occurred_Date", date_format)) \
+        .withColumn("report_datetime", F.to_timestamp("Report_Date_Time", timestamp_format)) \
+        .withColumn("report_date", F.to_date("Report_Date", date_format)) \
+        .withColumn("clearance_date", F.to_date("Clearance_Date", date_format)) \
+        .withColumn("clearance_status", decode("clearance_status")) \
+        .select("incident_num", "crime_datetime", "crime_date", \
+                "report_datetime", "report_date", "crime_code", \
+                "crime_description", "family_violence", "location_type", \
+                "address", "zip_code", "council_district", \
+                "apd_sector", "apd_district", "pra", \
+                "census_tract", "clearance_status", "clearance_date", \
+                "ucr_category", "category_description")
+    return df_dt
+
+
+def modify_la_chained(df: DataFrame) -> DataFrame:
+    """modify_la with chained withColumnRenamed/withColumn calls"""
+    # To convert fields like 'Occurred_Date_Time' to Timestamp format
+    timestamp_format = "MM/dd/yyyy hh:mm:ss a"
+    # To convert fields like 'crime_datetime' to Timestamp format
+    date_time_format = "yyyy-MM-dd HH:mm:ss"
+
+    df_dt = df \
+        .withColumnRenamed("DR_NO", "incident_num") \
+        .withColumnRenamed("Crm_Cd_Desc", "crime_description") \
+        .withColumnRenamed("Crm_Cd", "crime_code") \
+        .withColumnRenamed("AREA", "area_code") \
+        .withColumnRenamed("AREA_NAME", "area_name") \
+        .withColumnRenamed("Rpt_Dist_No", "rpt_dist_num") \
+        .withColumnRenamed("Part_1-2", "part_1_2") \
+        .withColumnRenamed("Mocodes", "mocodes") \
+        .withColumnRenamed("Vict_Age", "vict_age") \
+        .withColumnRenamed("Vict_Sex", "vict_sex") \
+        .withColumnRenamed("Vict_Descent", "vict_descent") \
+        .withColumnRenamed("Premis_Cd", "premis_code") \
+        .withColumnRenamed("Premis_Desc", "premis_description") \
+        .withColumnRenamed("Weapon_Used_Cd", "weapon_used_code") \
+        .withColumnRenamed("Weapon_Desc", "weapon_description") \
+        .withColumnRenamed("Status", "status") \
+        .withColumnRenamed("Status_Desc", "status_description") \
+        .withColumnRenamed("Crm_Cd_1", "crime_code_1") \
+        .withColumnRenamed("Crm_Cd_2", "crime_code_2") \
+        .withColumnRenamed("Crm_Cd_3", "crime_code_3") \
+        .withColumnRenamed("Crm_Cd_4", "crime_code_4") \
+        .withColumnRenamed("LOCATION", "location") \
+        .withColumnRenamed("Cross_Street", "cross_street") \
+        .withColumnRenamed("LAT", "latitude") \
+        .withColumnRenamed("LON", "longtitude") \
+        .withColumn("report_date", F.to_date("Date_Rptd", timestamp_format)) \
+        .withColumn("crime_date", F.to_date("DATE_OCC", timestamp_format)) \
+        .withColumn("crime_datetime", F.concat(F.col("crime_date"), \
+                                               F.lit(" "), \
+                                               F.col("TIME_OCC").substr(1, 2), \
+                                               F.lit(":"), \
+                                               F.col("TIME_OCC").substr(3, 2), \
+                                               F.lit(":00"))) \
+        .withColumn("crime_datetime", F.to_timestamp(F.col("crime_datetime"), date_time_format)) \
+        .withColumn("vict_sex", decode("vict_sex")) \
+        .withColumn("vict_descent", decode("vict_descent")) \
+        .select("incident_num", "crime_datetime", "crime_date", \
+                "report_date", "crime_code", "crime_description", \
+                "area_code", "area_name", "rpt_dist_num", \
+                "part_1_2", "mocodes", "vict_age", \
+                "vict_sex", "vict_descent", "premis_code", \
+                "premis_description", "weapon_used_code", "weapon_description", \
+                "status", "status_description", "crime_code_1", \
+                "crime_code_2", "crime_code_3", "crime_code_4", \
+                "location", "cross_street", "latitude", \
+                "longtitude")
+    return df_dt
+
+
+def build_plan(df: DataFrame, modify) -> float:
+    """Build the plan of modify and optimize it, return seconds spent on the driver"""
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        df_modified = modify(df)
+        df_modified._jdf.queryExecution().optimizedPlan()
+        return time.perf_counter() - start
+
+
+def main(params):
+    spark = SparkSession.builder \
+        .master("local[1]") \
+        .appName("benchmark-plan-construction") \
+        .getOrCreate()
+
+    for city, chained, projected in [("aus", modify_aus_chained, modify_aus), ("la", modify_la_chained, modify_la)]:
+        df = spark.createDataFrame([], spark_schema(city))
+        # the first runs warm up the JVM
+        build_plan(df, chained)
+        build_plan(df, projected)
+        for name, modify in [("chained calls", chained), ("one select", projected)]:
+            timings = [build_plan(df, modify) for _ in range(params.repeat)]
+            print(f"{city}, {name}: best {min(timings) * 1000:.1f} ms, "
+                  f"mean {sum(timings) / len(timings) * 1000:.1f} ms")
+
+    spark.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark building plans of column transformations")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of plans built with each approach")
+    main(parser.parse_args())
@@ -0,0 +1,45 @@
+{# This macro returns the list of months (as date literals) of month partitions of the upstream relations
+   which were modified after the last build of the current model, for filters of insert_overwrite models:
+       where date_trunc(crime_date, month) in ({{ changed_months([source('staging', 'sd_crimedata')]) }})
+   Partitions are taken from INFORMATION_SCHEMA.PARTITIONS, so months replaced by the Spark job
+   (incremental loads replace only affected months) are found without scanning the tables.
+   The months can be set with --vars 'changed_months: ["2023-05-01"]'. #}
+
+{% macro changed_months(relations) %}
+
+    {%- if var('changed_months', none) is not none -%}
+        {%- set months = var('changed_months') -%}
+    {%- elif execute -%}
+        {%- set query -%}
+            select distinct parse_date('%Y%m', partitions.partition_id) as month
+            from (
+            {%- for relation in relations %}
+                select partition_id, last_modified_time
+                from `{{ relation.database }}`.`{{ relation.schema }}`.INFORMATION_SCHEMA.PARTITIONS
+                where table_name = '{{ relation.identifier }}'
+                {% if not loop.last %}union all{% endif %}
+            {%- endfor %}
+            ) as partitions
+            where regexp_contains(partitions.partition_id, r'^[0-9]{6}$')
+                and partitions.last_modified_time > (
+                    select coalesce(max(last_modified_time), timestamp '1970-01-01')
+                    from `{{ this.database }}`.`{{ this.schema }}`.INFORMATION_SCHEMA.PARTITIONS
+                    where table_name = '{{ this.identifier }}'
+                )
+            order by month
+        {%- endset -%}
+        {%- set months = run_query(query).columns[0].values() -%}
+        {{ log("Changed months of " ~ this.identifier ~ ": " ~ (months | join(", ")), info=true) }}
+    {%- else -%}
+        {%- set months = [] -%}
+    {%- endif -%}
+
+    {%- if months -%}
+        {%- for month in months -%}
+            date '{{ month }}'{% if not loop.last %}, {% endif %}
+        {%- endfor -%}
+    {%- else -%}
+        cast(null as date)
+    {%- endif -%}
+
+{% endmacro %}
@@ -1,8 +1,19 @@
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'crime_date', 'data_type': 'date', 'granularity': 'month'},
     cluster_by = ["city", "crime_date"],
     ) }}
 
+-- incremental runs replace only month partitions which were reloaded to the sources since the last build
+{% if is_incremental() %}
+{% set months = changed_months([
+    source('staging', 'austin_crimedata'),
+    source('staging', 'la_crimedata'),
+    ref('fact_sd_crimedata'),
+]) %}
+{% endif %}
+
 with austin_data as (
     select
         incident_num,
@@ -15,6 +26,9 @@ with austin_data as (
         '' as area_name,
         clearance_status as status
     from {{ ref('stg_austin_crimedata') }}
+    {% if is_incremental() %}
+    where date_trunc(crime_date, month) in ({{ months }})
+    {% endif %}
 ),
 
 la_data as (
@@ -29,6 +43,9 @@ la_data as (
         area_name,
         status_description as status
     from {{ ref('stg_la_crimedata') }}
+    {% if is_incremental() %}
+    where date_trunc(crime_date, month) in ({{ months }})
+    {% endif %}
 ),
 
 sd_data as (
@@ -43,6 +60,9 @@ sd_data as (
         area_name,
         status_description as status
     from {{ ref('fact_sd_crimedata') }}
+    {% if is_incremental() %}
+    where date_trunc(crime_date, month) in ({{ months }})
+    {% endif %}
 )
 
 select * from austin_data
@@ -1,8 +1,16 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'crime_date', 'data_type': 'date', 'granularity': 'month'},
+    ) }}
 
+-- incremental runs replace only month partitions which were reloaded to the source since the last build
 with sd_data as (
     select *
     from {{ ref('stg_sd_crimedata') }}
+    {% if is_incremental() %}
+    where date_trunc(crime_date, month) in ({{ changed_months([source('staging', 'sd_crimedata')]) }})
+    {% endif %}
 ),
 
 sd_call_types as (
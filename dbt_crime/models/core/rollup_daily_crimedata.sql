@@ -0,0 +1,24 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'crime_date', 'data_type': 'date', 'granularity': 'month'},
+    cluster_by = ["city", "crime_code", "area_code"],
+    ) }}
+
+-- number of crimes per day by city, crime code and area,
+-- incremental runs replace only partitions of the months changed in fact_crimedata since the last build
+select
+    city,
+    crime_date,
+    crime_code,
+    crime_description,
+    area_code,
+    area_name,
+    count(*) as crimes
+
+from {{ ref('fact_crimedata') }}
+where crime_date is not null
+{% if is_incremental() %}
+    and date_trunc(crime_date, month) in ({{ changed_months([ref('fact_crimedata')]) }})
+{% endif %}
+group by city, crime_date, crime_code, crime_description, area_code, area_name
@@ -0,0 +1,24 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'crime_month', 'data_type': 'date', 'granularity': 'year'},
+    cluster_by = ["city"],
+    ) }}
+
+-- number of crimes per month by city, day of week (1 = Sunday) and hour of day for heatmaps,
+-- incremental runs replace only partitions of the years with months changed in fact_crimedata
+select
+    city,
+    date_trunc(crime_date, month) as crime_month,
+    extract(dayofweek from crime_datetime) as day_of_week,
+    extract(hour from crime_datetime) as hour_of_day,
+    count(*) as crimes
+
+from {{ ref('fact_crimedata') }}
+where crime_datetime is not null
+{% if is_incremental() %}
+    and date_trunc(crime_date, year) in (
+        select date_trunc(month, year) from unnest([{{ changed_months([ref('fact_crimedata')]) }}]) as month
+    )
+{% endif %}
+group by city, crime_month, day_of_week, hour_of_day
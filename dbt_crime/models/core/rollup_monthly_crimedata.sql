@@ -0,0 +1,25 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='insert_overwrite',
+    partition_by={'field': 'crime_month', 'data_type': 'date', 'granularity': 'year'},
+    cluster_by = ["city", "crime_code", "area_code"],
+    ) }}
+
+-- number of crimes per month by city, crime code and area from the daily rollup,
+-- incremental runs replace only partitions of the years with months changed in the daily rollup
+select
+    city,
+    date_trunc(crime_date, month) as crime_month,
+    crime_code,
+    crime_description,
+    area_code,
+    area_name,
+    sum(crimes) as crimes
+
+from {{ ref('rollup_daily_crimedata') }}
+{% if is_incremental() %}
+where date_trunc(crime_date, year) in (
+    select date_trunc(month, year) from unnest([{{ changed_months([ref('rollup_daily_crimedata')]) }}]) as month
+)
+{% endif %}
+group by city, crime_month, crime_code, crime_description, area_code, area_name
@@ -1,12 +1,12 @@
 {{ config(materialized='view') }}
 
+-- generated from flows/schemas.py by flows/make_dbt_staging.py
 select
     cast(incident_num as integer) as incident_num,
     cast(crime_datetime as timestamp) as crime_datetime,
     cast(crime_date as date) as crime_date,
     cast(report_datetime as timestamp) as report_datetime,
     cast(report_date as date) as report_date,
-
     cast(crime_code as integer) as crime_code,
     crime_description,
     family_violence,
@@ -15,7 +15,6 @@ select
     cast(zip_code as integer) as zip_code,
     cast(council_district as integer) as council_district,
     apd_sector,
-
     apd_district,
     cast(pra as integer) as pra,
     cast(census_tract as numeric) as census_tract,
@@ -29,7 +28,3 @@ from {{ source('staging','austin_crimedata') }}
 {% if var('is_test_run', default=true) %}
   limit 100
 {% endif %}
-
-
-
-
@@ -1,11 +1,11 @@
 {{ config(materialized='view') }}
 
+-- generated from flows/schemas.py by flows/make_dbt_staging.py
 select
     cast(incident_num as integer) as incident_num,
     cast(crime_datetime as timestamp) as crime_datetime,
     cast(crime_date as date) as crime_date,
     cast(report_date as date) as report_date,
-
     cast(crime_code as integer) as crime_code,
     crime_description,
     cast(area_code as integer) as area_code,
@@ -32,11 +32,7 @@ select
     cast(longtitude as numeric) as longtitude
 
 from {{ source('staging','la_crimedata') }}
--- dbt run -m stg_austin_crimedata --vars 'is_test_run: false'
+-- dbt run -m stg_la_crimedata --vars 'is_test_run: false'
 {% if var('is_test_run', default=true) %}
   limit 100
 {% endif %}
-
-
-
-
@@ -0,0 +1,83 @@
+"""
+Process-level cache of Prefect blocks and GCP credentials made from them.
+
+Every GcsBucket.load or GcpCredentials.load is a round trip to the Prefect server, so tasks of a flow run
+reuse blocks loaded in the last BLOCK_TTL seconds. Blocks which are saved again are invalidated.
+Round trips to the server and reuses of the cache are counted, print_block_stats reports them.
+"""
+import threading
+import time
+from collections import Counter
+
+from prefect_gcp import GcpCredentials
+
+# seconds a loaded block or credentials are reused before they are loaded again
+BLOCK_TTL = 600
+
+# (kind, block name) -> (monotonic time of the load, value)
+block_cache = {}
+# guards the dictionaries of the module, it isn't held during round trips to the server
+block_cache_lock = threading.Lock()
+# (kind, block name) -> lock held while the value is loaded, so concurrent tasks don't load the same block
+# at once, while blocks of other names are loaded in parallel
+load_locks = {}
+# "<kind> load" and "<kind> save" for round trips to the server or credential construction,
+# "<kind> hit" for reuses
+block_stats = Counter()
+
+
+def cached(kind: str, name: str, load, ttl: float = BLOCK_TTL):
+    """Return value of the kind and name from the cache, load() it if it's missing or older than ttl seconds"""
+    key = (kind, name)
+    with block_cache_lock:
+        load_lock = load_locks.setdefault(key, threading.Lock())
+    with load_lock:
+        with block_cache_lock:
+            entry = block_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                block_stats[f"{kind} hit"] += 1
+                return entry[1]
+        value = load()
+        with block_cache_lock:
+            block_cache[key] = (time.monotonic(), value)
+            block_stats[f"{kind} load"] += 1
+        return value
+
+
+def load_block(block_class, name: str, ttl: float = BLOCK_TTL):
+    """Return the block of the class (GcsBucket, GcpCredentials) loaded from the Prefect server or the cache"""
+    return cached(block_class.__name__, name, lambda: block_class.load(name), ttl)
+
+
+def load_credentials(credentials_block_name: str, ttl: float = BLOCK_TTL):
+    """Return service account credentials of the GcpCredentials block, made once for ttl seconds"""
+    def load():
+        return load_block(GcpCredentials, credentials_block_name, ttl).get_credentials_from_service_account()
+
+    return cached("credentials", credentials_block_name, load, ttl)
+
+
+def invalidate_blocks(name: str = None) -> None:
+    """Remove blocks and credentials of the name from the cache, all of them without the name"""
+    with block_cache_lock:
+        for key in list(block_cache):
+            if name is None or key[1] == name:
+                del block_cache[key]
+
+
+def save_block(block, name: str) -> None:
+    """Save the block to the Prefect server replacing the one of the name, its cached copies are removed"""
+    block.save(name, overwrite=True)
+    invalidate_blocks(name)
+    with block_cache_lock:
+        block_stats[f"{block.__class__.__name__} save"] += 1
+
+
+def print_block_stats() -> dict:
+    """Print and return numbers of round trips and cache hits by kinds of blocks"""
+    stats = dict(sorted(block_stats.items()))
+    round_trips = sum(count for key, count in stats.items() if not key.endswith(" hit"))
+    hits = sum(count for key, count in stats.items() if key.endswith(" hit"))
+    details = ", ".join(f"{key} {count}" for key, count in stats.items())
+    print(f"Prefect blocks: {round_trips} round trips, {hits} reused from the cache ({details})")
+    return stats
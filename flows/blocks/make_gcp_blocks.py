@@ -4,6 +4,9 @@ import json
 from dotenv import load_dotenv
 import os
 
+# run from the flows folder (python -m blocks.make_gcp_blocks), so the block cache is imported like in ingest.py
+from block_cache import load_block, save_block, print_block_stats
+
 
 def load_and_get_environment_variables(env_path=None) -> dict:
     """
@@ -45,7 +48,7 @@ def create_gcp_credentials_block(credentials_file_path: str, credentials_block_n
     credentials_block = GcpCredentials(
         service_account_info=service_account_info
     )
-    credentials_block.save(credentials_block_name, overwrite=True)
+    save_block(credentials_block, credentials_block_name)
 
     return
 
@@ -57,13 +60,13 @@ def create_gcp_bucket_block(credentials_block_name: str, bucket_name: str, bucke
     :param bucket_name: the name of the storage (bucket) in GCP
     :param bucket_block_name: name for GCP bucket block
     """
-    gcp_credentials_block = GcpCredentials.load(credentials_block_name)
+    gcp_credentials_block = load_block(GcpCredentials, credentials_block_name)
 
     bucket_block = GcsBucket(
         gcp_credentials=gcp_credentials_block,
         bucket=bucket_name,
     )
-    bucket_block.save(bucket_block_name, overwrite=True)
+    save_block(bucket_block, bucket_block_name)
 
     return
 
@@ -108,6 +111,8 @@ def main():
         bucket_block_name=env_vars["bucket_block_name"]
     )
 
+    print_block_stats()
+
 
 if __name__ == '__main__':
     main()
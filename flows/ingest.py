@@ -1,14 +1,28 @@
 import requests
 import os
+import io
+import json
+import hashlib
+import shutil
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import uuid
-from prefect import flow, task
+import zipfile
+import pyarrow as pa
+from pyarrow import csv as pv
+from pyarrow import compute as pc
+from pyarrow import parquet as pq
+from prefect import flow, task, allow_failure
 from prefect_gcp.cloud_storage import GcsBucket
-# use GCP Credentials block for storing credentials
-from prefect_gcp import GcpCredentials
 from google.cloud import dataproc_v1 as dataproc
 
+from block_cache import load_block, load_credentials, print_block_stats
+from schemas import INTEGRAL_PATTERN, read_columns, column_types, narrowed_columns
+
 
 @task(log_prints=True)
 def load_env(env_path=None) -> None:
@@ -25,30 +39,375 @@ def load_env(env_path=None) -> None:
     return
 
 
+# manifest file is shared by concurrent transfers
+manifest_lock = threading.Lock()
+
+# Dataproc clients by region and credentials block, reused by jobs of the flow run
+dataproc_clients = {}
+dataproc_clients_lock = threading.Lock()
+
+# size of chunks for streaming downloads
+CHUNK_SIZE = 1024 * 1024
+# files smaller than segments * MIN_SEGMENT_SIZE are downloaded in one stream
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024
+# size of chunks for resumable uploads to GCS, must be a multiple of 256 KB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# size of CSV blocks converted to Parquet at once
+PARQUET_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Arrow types for type names used in schemas.py
+ARROW_TYPES = {
+    'string': pa.string(),
+    'int': pa.int32(),
+    'long': pa.int64(),
+    'double': pa.float64(),
+    'timestamp': pa.timestamp('us'),
+}
+# trimmed text of values which can be cast to the types, other values are malformed
+CAST_PATTERNS = {
+    'int': r"^[+-]?\d{1,9}$",
+    'long': r"^[+-]?\d{1,18}$",
+    'double': r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$",
+    'timestamp': r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])[ T]([01]\d|2[0-3]):[0-5]\d:[0-5]\d(\.\d{1,6})?$",
+}
+
+# Spark job's dependencies which are passed in python_file_uris
+JOB_DEPENDENCIES = ["schemas.py"]
+# name of the zip with JOB_DEPENDENCIES, modules are imported from it like from the folder
+JOB_DEPENDENCIES_ZIP = "job_dependencies.zip"
+# length of the content hash in paths of the job's files in GCS
+ARTIFACT_HASH_LENGTH = 16
+
+# pinned BigQuery connector, "latest" changes between runs and isn't cached by the cluster
+BIGQUERY_CONNECTOR_JAR = "gs://spark-lib/bigquery/spark-bigquery-with-dependencies_2.12-0.36.1.jar"
+
+# the first year of San Diego data, the last one is discovered by probing the source
+SD_START_YEAR = 2015
+
+# seconds between polls of a Dataproc job, the interval grows by JOB_POLL_BACKOFF up to JOB_POLL_MAX_INTERVAL
+JOB_POLL_INTERVAL = 5
+JOB_POLL_BACKOFF = 1.5
+JOB_POLL_MAX_INTERVAL = 60
+# final states of Dataproc jobs
+JOB_FINAL_STATES = {"DONE", "ERROR", "CANCELLED"}
+
+# options of the Spark job and their defaults, an option is passed to the job as its flag only if it's set
+JOB_OPTIONS = {
+    "cities": None,
+    "input_format": "csv",
+    "sd_years": None,
+    "watermark_path": None,
+    "single_pass": False,
+    "parallel_cities": 1,
+    "target_file_mb": None,
+    "partition_lake_by": None,
+    "parquet_layout": None,
+    "parquet_compression": None,
+    "bq_write_method": None,
+    "bq_cluster_by": None,
+}
+
+# Spark properties of per-city jobs sharing the cluster, San Diego has the most data
+CITY_JOB_PROPERTIES = {
+    "aus": {"spark.dynamicAllocation.maxExecutors": "4"},
+    "la": {"spark.dynamicAllocation.maxExecutors": "4"},
+    "sd": {"spark.dynamicAllocation.maxExecutors": "8"},
+}
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    """Load the manifest of downloaded files (url -> validators and content hash)"""
+    if manifest_path is None or not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path: Path, manifest: dict) -> None:
+    """Save the manifest, the caller holds manifest_lock"""
+    Path(manifest_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def update_manifest(manifest_path: Path, url: str, **values) -> None:
+    """Update the manifest entry for url with values and save the manifest"""
+    with manifest_lock:
+        manifest = load_manifest(manifest_path)
+        manifest.setdefault(url, {}).update(values)
+        save_manifest(manifest_path, manifest)
+
+
+def update_pending(manifest_path: Path, url: str, **values) -> None:
+    """
+    Save validators and the content hash of a new file of url as pending,
+    they replace the current ones only when the Spark job has loaded the file (commit_manifest)
+    """
+    with manifest_lock:
+        manifest = load_manifest(manifest_path)
+        manifest.setdefault(url, {})["pending"] = values
+        save_manifest(manifest_path, manifest)
+
+
+def commit_manifest(manifest_path: Path, urls: list) -> None:
+    """
+    Make pending validators of urls current once the Spark job has loaded their files,
+    the next run skips these files if they haven't changed
+    """
+    with manifest_lock:
+        manifest = load_manifest(manifest_path)
+        for url in urls:
+            entry = manifest.get(url, {})
+            if "pending" in entry:
+                entry.update(entry.pop("pending"), uploaded=True)
+        save_manifest(manifest_path, manifest)
+
+
+def conditional_headers(entry: dict) -> dict:
+    """
+    Build If-None-Match/If-Modified-Since headers from a manifest entry.
+    Only files which were loaded by the Spark job can be skipped, validators of files which were
+    only uploaded to GCS are pending until the job succeeds.
+    """
+    headers = {}
+    if not entry or not entry.get("uploaded"):
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    return headers
+
+
+def partition_key(csv_name: str) -> str:
+    """Return the ledger key of the source file: sd_2019.csv -> sd/2019"""
+    city, _, rest = Path(csv_name).stem.partition("_")
+    return f"{city}/{rest}"
+
+
+def partition_year(csv_name: str) -> int:
+    """Return the year of one-year source files (sd_2019.csv -> 2019), None for multi-year files"""
+    rest = partition_key(csv_name).split("/")[1]
+    return int(rest) if rest.isdigit() else None
+
+
+def pending_sources(sources: list, ledger: dict, recheck_final: bool = False) -> list:
+    """
+    Drop sources whose partitions are final in the ledger, closed years never change.
+    With recheck_final they are kept and checked with conditional requests like other files.
+    """
+    pending = []
+    for url, csv_name in sources:
+        if not recheck_final and ledger.get(partition_key(csv_name), {}).get("final"):
+            print(f"Partition {partition_key(csv_name)} is final, {csv_name} is not downloaded.")
+            continue
+        pending.append((url, csv_name))
+
+    return pending
+
+
+def update_ledger(ledger_path: Path, manifest_path: Path, sources: list, results: list,
+                  current_year: int = None) -> None:
+    """
+    Record loaded partitions with the content hash of their files in the ledger.
+    Partitions of closed years (before current_year) become final.
+    """
+    if current_year is None:
+        current_year = date.today().year
+    manifest = load_manifest(manifest_path)
+    urls = {csv_name: url for url, csv_name in sources}
+    for result in results:
+        if "error" in result:
+            continue
+        entry = manifest.get(urls[result["csv_name"]], {})
+        # the file wasn't loaded by the Spark job
+        if not entry.get("uploaded") or "pending" in entry:
+            continue
+        year = partition_year(result["csv_name"])
+        update_manifest(ledger_path, partition_key(result["csv_name"]),
+                        sha256=entry.get("sha256"),
+                        final=year is not None and year < current_year)
+
+
+def file_sha256(path: Path) -> str:
+    """Return sha256 hash of the file content"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def write_chunks(response: requests.Response, f, downloaded_size: int = 0) -> int:
+    """Write the response body into file f printing progress, return the full size of the file"""
+    size = 0
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if chunk:
+            f.write(chunk)
+            downloaded_size += len(chunk)
+            downloaded_size_mb = downloaded_size / (1024 * 1024)
+
+            if int(downloaded_size_mb) % 5 == 0 and size != int(downloaded_size_mb):
+                print(f"\rDownloaded size: {int(downloaded_size_mb)} MB", end="")
+                size = int(downloaded_size_mb)
+
+    return downloaded_size
+
+
+def fetch_resumable(url: str, path: Path, headers: dict) -> requests.Response:
+    """
+    Download url into path in one stream.
+    A partial file left by a failed attempt is resumed with a Range request,
+    If-Range makes the server send the whole file again if it has changed since.
+    :return: the response, the file is downloaded only for 200 and 206 status codes
+    """
+    part_path = path.with_name(f"{path.name}.part")
+    validator_path = path.with_name(f"{path.name}.part.json")
+
+    offset = 0
+    if part_path.exists() and part_path.stat().st_size and validator_path.exists():
+        with open(validator_path, "r") as f:
+            validator = json.load(f)["validator"]
+        if validator:
+            offset = part_path.stat().st_size
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+            print(f"Resuming download of {path.name} from {offset / (1024 * 1024):.2f} MB")
+
+    response = requests.get(url, stream=True, headers=headers)
+    if response.status_code == 416:
+        # partial file can't be resumed, the next attempt starts from the beginning
+        part_path.unlink()
+        validator_path.unlink()
+    if response.status_code not in (200, 206):
+        return response
+    if response.status_code == 200:
+        # the server sends the whole file
+        offset = 0
+        with open(validator_path, "w") as f:
+            json.dump({"validator": response.headers.get("ETag") or response.headers.get("Last-Modified")}, f)
+
+    with open(part_path, "ab" if offset else "wb") as f:
+        write_chunks(response, f, offset)
+
+    part_path.replace(path)
+    validator_path.unlink()
+
+    return response
+
+
+def fetch_segment(url: str, part_path: Path, start: int, end: int, validator: str) -> None:
+    """Download bytes start-end of url into part_path, resuming the part if it exists"""
+    done = part_path.stat().st_size if part_path.exists() else 0
+    if start + done > end:
+        return
+
+    headers = {"Range": f"bytes={start + done}-{end}"}
+    if validator:
+        headers["If-Range"] = validator
+    response = requests.get(url, stream=True, headers=headers)
+    if response.status_code != 206:
+        raise RuntimeError(f"Range {start + done}-{end} of {url} wasn't returned, status: {response.status_code}")
+
+    with open(part_path, "ab") as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+
+
+def fetch_segments(url: str, path: Path, headers: dict, segments: int) -> requests.Response:
+    """
+    Download url into path in parallel byte-range segments which are stitched together on disk.
+    Segments already downloaded by a failed attempt are resumed.
+    Falls back to fetch_resumable if the server doesn't support ranges or the file is small.
+    :return: the response of HEAD request, the file is downloaded only for 200 status code
+    """
+    response = requests.head(url, headers=headers, allow_redirects=True)
+    if response.status_code != 200:
+        return response
+
+    size = int(response.headers.get("Content-Length", 0))
+    if response.headers.get("Accept-Ranges") != "bytes" or size < segments * MIN_SEGMENT_SIZE:
+        return fetch_resumable(url, path, headers)
+
+    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+    state = {"size": size, "segments": segments, "validator": validator}
+    state_path = path.with_name(f"{path.name}.parts.json")
+    part_paths = [path.with_name(f"{path.name}.part{i}") for i in range(segments)]
+
+    # parts of another version of the file can't be resumed
+    if state_path.exists():
+        with open(state_path, "r") as f:
+            if json.load(f) != state:
+                for part_path in part_paths:
+                    part_path.unlink(missing_ok=True)
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+
+    segment_size = -(-size // segments)
+    bounds = [(i * segment_size, min((i + 1) * segment_size, size) - 1) for i in range(segments)]
+    print(f"Downloading {path.name} ({size / (1024 * 1024):.2f} MB) in {segments} segments")
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [executor.submit(fetch_segment, url, part_path, start, end, validator)
+                   for part_path, (start, end) in zip(part_paths, bounds)]
+        for future in futures:
+            future.result()
+
+    # stitch segments together
+    with open(path, "wb") as f:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, f, CHUNK_SIZE)
+    if path.stat().st_size != size:
+        raise RuntimeError(f"Downloaded size of {path.name} doesn't match Content-Length {size}")
+    for part_path in part_paths:
+        part_path.unlink()
+    state_path.unlink()
+
+    return response
+
+
 # @task(log_prints=True, retries=3, retry_delay_seconds=60,
 #       cache_key_fn=task_input_hash, cache_expiration=timedelta(days=1))
 @task(log_prints=True, retries=3, retry_delay_seconds=60)
-def download_file(url: str, csv_name: str) -> Path:
-    """Download data from web into local storage"""
+def download_file(url: str, csv_name: str, manifest_path: Path = None, segments: int = 1) -> Path:
+    """
+    Download data from web into local storage.
+    If manifest_path is given, the request is conditional on the validators saved
+    for url and None is returned when the file hasn't changed since the last upload.
+    Partial files are resumed on retries, with segments > 1 the file is downloaded
+    in parallel byte ranges when the server supports them.
+    """
     city = csv_name.split("_")[0]
     path = Path(f"data/{city}/{csv_name}")
+    path.parent.mkdir(parents=True, exist_ok=True)
     print(f"Downloading file {csv_name} for {city}")
 
-    response = requests.get(url, stream=True)
-    if response.status_code == 200:
-        downloaded_size = 0
-        size = 0
-        with open(path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded_size += len(chunk)
-                    downloaded_size_mb = downloaded_size / (1024 * 1024)
-
-                    if int(downloaded_size_mb) % 5 == 0 and size != int(downloaded_size_mb):
-                        print(f"\rDownloaded size: {int(downloaded_size_mb)} MB", end="")
-                        size = int(downloaded_size_mb)
-        print(f"File {csv_name} downloaded successfully. Full size is {downloaded_size_mb:.2f} MB")
+    entry = load_manifest(manifest_path).get(url)
+    if segments > 1:
+        response = fetch_segments(url, path, conditional_headers(entry), segments)
+    else:
+        response = fetch_resumable(url, path, conditional_headers(entry))
+    if response.status_code == 304:
+        print(f"File {csv_name} was not modified since the last download.")
+        return None
+
+    if response.status_code in (200, 206):
+        downloaded_size = path.stat().st_size
+        print(f"File {csv_name} downloaded successfully. Full size is {downloaded_size / (1024 * 1024):.2f} MB")
+
+        if manifest_path is not None:
+            sha256 = file_sha256(path)
+            # Server doesn't support validators, but the content is the same
+            if entry and entry.get("uploaded") and entry.get("sha256") == sha256:
+                print(f"File {csv_name} has the same content as the last upload.")
+                remove_file(path=path)
+                return None
+            update_pending(manifest_path, url,
+                           etag=response.headers.get("ETag"),
+                           last_modified=response.headers.get("Last-Modified"),
+                           content_length=downloaded_size,
+                           sha256=sha256)
     else:
         print("Error downloading the file.")
 
@@ -82,11 +441,104 @@ def remove_file(path: Path) -> None:
     return
 
 
+def parse_integral(array: pa.Array, arrow_type: pa.DataType) -> tuple:
+    """
+    Parse integer values like "521" or "521.0" of the text array, malformed values are null
+    :return: parsed array and number of malformed values
+    """
+    matched = pc.match_substring_regex(array, INTEGRAL_PATTERN)
+    # Arrow can't cast "+5" to int like Spark does, the plus sign is removed
+    digits = pc.replace_substring_regex(pc.replace_substring_regex(array, INTEGRAL_PATTERN, r"\1"), r"^\+", "")
+    parsed = pc.if_else(matched, digits, pa.scalar(None, pa.string()))
+    malformed = pc.sum(pc.invert(matched)).as_py() or 0
+    return parsed.cast(arrow_type), malformed
+
+
+def cast_values(array, type_name: str) -> tuple:
+    """
+    Cast text values to the type of schemas.py, values which don't match CAST_PATTERNS of the type are null
+    like in PERMISSIVE mode of Spark. The whole array is masked and cast at once.
+    :return: cast array and number of malformed values
+    """
+    text = pc.utf8_trim_whitespace(array)
+    matched = pc.match_substring_regex(text, CAST_PATTERNS[type_name])
+    if type_name == 'timestamp':
+        # the pattern doesn't know lengths of months, dates like 2023-02-30 are rolled over by strptime
+        day = pc.utf8_slice_codeunits(text, 0, 10)
+        parsed_day = pc.strptime(pc.if_else(matched, day, pa.scalar(None, pa.string())), format="%Y-%m-%d",
+                                 unit="s", error_is_null=True)
+        matched = pc.and_kleene(matched, pc.equal(pc.strftime(parsed_day, format="%Y-%m-%d"), day))
+    elif type_name in ('int', 'long'):
+        # Arrow can't cast "+5" to int like Spark does, the plus sign is removed
+        text = pc.replace_substring_regex(text, r"^\+", "")
+    parsed = pc.if_else(matched, text, pa.scalar(None, pa.string()))
+    malformed = pc.sum(pc.invert(matched)).as_py() or 0
+    return parsed.cast(ARROW_TYPES[type_name]), malformed
+
+
+def csv_to_parquet(source, parquet_path: Path, city: str) -> int:
+    """
+    Convert CSV data to Parquet in batches using the raw schema of the city from schemas.py,
+    so the Parquet file has the same columns and types as the one written by the Spark job.
+    Columns are read as text and cast afterwards, so a malformed value is null instead of failing the conversion.
+    :param source: path or file object with CSV data, the header is replaced by schema names
+    :return: number of converted rows
+    """
+    columns = read_columns(city)
+    narrowed = narrowed_columns(city)
+    # Spark reads timestamps in UTC session time zone of the cluster
+    parquet_schema = pa.schema([
+        (name, pa.timestamp('us', tz='UTC') if type_name == 'timestamp' else ARROW_TYPES[type_name])
+        for name, type_name in column_types(city)
+    ])
+    reader = pv.open_csv(
+        source,
+        read_options=pv.ReadOptions(column_names=[name for name, _ in columns], skip_rows=1,
+                                    block_size=PARQUET_BLOCK_SIZE),
+        convert_options=pv.ConvertOptions(column_types={name: pa.string() for name, _ in columns},
+                                          strings_can_be_null=True),
+    )
+
+    rows = 0
+    malformed = {}
+    with pq.ParquetWriter(parquet_path, parquet_schema) as writer:
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            for name, type_name in columns:
+                if name in narrowed:
+                    parsed, count = parse_integral(table[name], ARROW_TYPES[narrowed[name]])
+                elif type_name != 'string':
+                    parsed, count = cast_values(table[name], type_name)
+                else:
+                    continue
+                table = table.set_column(table.schema.get_field_index(name), name, parsed)
+                if count:
+                    malformed[name] = malformed.get(name, 0) + count
+            writer.write_table(table.cast(parquet_schema, safe=False))
+            rows += batch.num_rows
+
+    if malformed:
+        print(f"{sum(malformed.values())} malformed values of {', '.join(malformed)} are null in {parquet_path}")
+    return rows
+
+
+@task(log_prints=True)
+def convert_to_parquet(path: Path) -> Path:
+    """Convert downloaded CSV file to Parquet next to it"""
+    city = path.name.split("_")[0]
+    parquet_path = path.with_suffix(".parquet")
+    rows = csv_to_parquet(path, parquet_path, city)
+    print(f"File {path.name} converted to {parquet_path.name}: {rows} rows, "
+          f"{parquet_path.stat().st_size / (1024 * 1024):.2f} MB")
+
+    return parquet_path
+
+
 @task(log_prints=True)
 def upload_to_gcs(from_path: Path, to_path: Path) -> None:
     """Upload file to GCS"""
     bucket_block_name = os.getenv("BUCKET_BLOCK_NAME")
-    gcs_block = GcsBucket.load(bucket_block_name)
+    gcs_block = load_block(GcsBucket, bucket_block_name)
 
     # Check if the file exists
     if os.path.exists(from_path):
@@ -102,7 +554,7 @@ def upload_to_gcs(from_path: Path, to_path: Path) -> None:
 def upload_dataset_to_gcs(path: Path) -> None:
     """Upload dataset to GCS"""
     to_path = destination_path_for_file(path=path)
-    upload_to_gcs(from_path=path, to_path=to_path)
+    upload_to_gcs.fn(from_path=path, to_path=to_path)
     remove_file(path=path)
 
     return
@@ -127,15 +579,78 @@ def upload_dataset_to_gcs(path: Path) -> None:
 #     return
 
 
+def artifact_path(from_path: Path) -> Path:
+    """
+    Return path of the file in GCS in the folder named by hash of its content: code/<hash>/<name>.
+    The name is kept, so modules are imported by their names.
+    """
+    digest = file_sha256(from_path)[:ARTIFACT_HASH_LENGTH]
+    return Path(f"code/{digest}/{Path(from_path).name}")
+
+
+def upload_artifact(from_path: Path) -> Path:
+    """Upload file to its content-addressed path in GCS unless it's there already, return the path"""
+    path = artifact_path(from_path)
+    if get_gcs_bucket().blob(path.as_posix()).exists():
+        print(f"'{path}' is already in GCS, upload of '{from_path}' is skipped")
+    else:
+        upload_to_gcs.fn(from_path=from_path, to_path=path)
+
+    return path
+
+
+def zip_modules(paths: list, zip_path: Path) -> Path:
+    """Pack python modules into the zip, with fixed timestamps the same modules give the same zip"""
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path in sorted(paths, key=lambda p: Path(p).name):
+            info = zipfile.ZipInfo(Path(path).name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, Path(path).read_bytes())
+
+    return zip_path
+
+
 @task(log_prints=True)
 def upload_job_to_gcs() -> Path:
-    """Upload python-file with Spark job to gcs"""
+    """Upload python-file with Spark job to gcs, a file with the same content isn't uploaded again"""
     spark_job_file = os.getenv("SPARK_JOB_FILE")
-    spark_job_file_path = f'flows/{spark_job_file}'
-    path = Path(f"code/{spark_job_file}")
-    upload_to_gcs(from_path=spark_job_file_path, to_path=path)
+    spark_job_file_path = Path(f'flows/{spark_job_file}')
+
+    return upload_artifact(spark_job_file_path)
 
-    return path
+
+@task(log_prints=True)
+def upload_job_dependencies_to_gcs(zip_dependencies: bool = False) -> list:
+    """
+    Upload python modules imported by Spark job to gcs, modules with the same content aren't uploaded again.
+    With zip_dependencies they are packed into one zip.
+    """
+    dependencies = [Path(f'flows/{dependency}') for dependency in JOB_DEPENDENCIES]
+    if not zip_dependencies:
+        return [upload_artifact(path) for path in dependencies]
+
+    os.makedirs("data", exist_ok=True)
+    zip_path = zip_modules(dependencies, Path(f"data/{JOB_DEPENDENCIES_ZIP}"))
+    path = upload_artifact(zip_path)
+    remove_file(zip_path)
+
+    return [path]
+
+
+@task(log_prints=True)
+def cache_connector_jar(connector_jar: str = BIGQUERY_CONNECTOR_JAR) -> str:
+    """Copy the connector jar to jars/ of the data lake bucket unless it's there already, return its URI"""
+    source_bucket_name, source_name = connector_jar[len("gs://"):].split("/", 1)
+    bucket = get_gcs_bucket()
+    path = f"jars/{Path(source_name).name}"
+    if bucket.blob(path).exists():
+        print(f"Connector '{path}' is already in GCS")
+    else:
+        source_bucket = bucket.client.bucket(source_bucket_name)
+        source_bucket.copy_blob(source_bucket.blob(source_name), bucket, path)
+        print(f"Connector '{connector_jar}' is copied to '{path}'")
+
+    return f"gs://{bucket.name}/{path}"
 
 
 # @task(log_prints=True)
@@ -157,28 +672,116 @@ def upload_job_to_gcs() -> Path:
 #     return path
 
 
+def get_dataproc_client(region: str, credentials_block_name: str) -> dataproc.JobControllerClient:
+    """Return JobControllerClient of the region with credentials of the block, created once and then reused"""
+    key = (region, credentials_block_name)
+    with dataproc_clients_lock:
+        if key not in dataproc_clients:
+            # Use Prefect GcpCredentials Block which stores credentials
+            dataproc_clients[key] = dataproc.JobControllerClient(
+                credentials=load_credentials(credentials_block_name),
+                client_options={"api_endpoint": "{}-dataproc.googleapis.com:443".format(region)}
+            )
+        return dataproc_clients[key]
+
+
+@task(log_prints=True)
+def wait_for_dataproc_job(job_id: str, poll_interval: float = JOB_POLL_INTERVAL,
+                          max_interval: float = JOB_POLL_MAX_INTERVAL, timeout: float = None) -> str:
+    """
+    Poll the Dataproc job with growing intervals until it's finished, printing its state changes
+    and the location of its driver output. Raise RuntimeError if the job fails or is cancelled,
+    TimeoutError if it isn't finished in timeout seconds.
+    """
+    project_id = os.getenv("PROJECT_ID")
+    region = os.getenv("REGION")
+    dataproc_client = get_dataproc_client(region, os.getenv("CREDS_BLOCK_NAME"))
+
+    start = time.monotonic()
+    state = None
+    output_printed = False
+    while True:
+        job = dataproc_client.get_job(request={"project_id": project_id, "region": region, "job_id": job_id})
+        if job.driver_output_resource_uri and not output_printed:
+            print(f"Job {job_id} driver output: {job.driver_output_resource_uri}")
+            output_printed = True
+        if job.status.state.name != state:
+            state = job.status.state.name
+            print(f"Job {job_id} is {state} after {time.monotonic() - start:.0f} s")
+        if state in JOB_FINAL_STATES:
+            break
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Job {job_id} isn't finished in {timeout} s, its state is {state}")
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * JOB_POLL_BACKOFF, max_interval)
+
+    if state != "DONE":
+        raise RuntimeError(f"Job {job_id} is {state}: {job.status.details}")
+    return job_id
+
+
+def job_option_args(job_options: dict) -> list:
+    """Return flags of the Spark job for job_options which are set, lists are joined with commas"""
+    unknown = set(job_options) - set(JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+    args = []
+    for name, default in JOB_OPTIONS.items():
+        value = job_options.get(name, default)
+        if not value or value == default:
+            continue
+        if value is True:
+            args.append(f"--{name}")
+        elif isinstance(value, (list, tuple)):
+            args.extend([f"--{name}", ",".join(str(item) for item in value)])
+        else:
+            args.extend([f"--{name}", str(value)])
+    return args
+
+
 @task(log_prints=True)
 def submit_dataproc_job(spark_job_file: Path, temp_gcs_bucket: str,
                         input_path_aus: str, output_path_aus: str, output_bq_aus: str,
                         input_path_la: str, output_path_la: str, output_bq_la: str,
-                        input_path_sd: str, output_path_sd: str, output_bq_sd: str):
-    """Submit Spark job to DataProc Cluster"""
+                        input_path_sd: str, output_path_sd: str, output_bq_sd: str,
+                        job_options: dict = None, python_files: list = None, wait: bool = True,
+                        properties: dict = None, connector_jar: str = BIGQUERY_CONNECTOR_JAR):
+    """
+    Submit Spark job to DataProc Cluster.
+    job_options are options of the job from JOB_OPTIONS:
+    cities - only these cities are processed,
+    sd_years - only these San Diego years are rebuilt and reloaded,
+    watermark_path - Austin and Los Angeles are loaded incrementally,
+    single_pass - the job reads CSV once for both Parquet and BigQuery writes,
+    parallel_cities > 1 - pipelines of the cities run concurrently in the job,
+    target_file_mb and partition_lake_by - sizes of Parquet files and partitioning of the lake,
+    parquet_layout ('sorted') and parquet_compression ('snappy' or 'zstd') - the layout of its files,
+    bq_write_method 'direct' - writes to BigQuery with the Storage Write API instead of staged files,
+    bq_cluster_by ("sd=call_type,beat;la=area_code") - clustering columns replacing defaults of the tables.
+    python_files are paths of job's dependencies in the data lake bucket.
+    Without wait the job is only submitted and its ID is returned at once, wait_for_dataproc_job polls it.
+    properties are Spark properties of the job, connector_jar is URI of the BigQuery connector.
+    """
     project_id = os.getenv("PROJECT_ID")
     region = os.getenv("REGION")
     cluster_name = os.getenv("DATAPROC_CLUSTER_NAME")
     bucket_name = os.getenv("DATA_LAKE_BUCKET_NAME")
 
-    # Use Prefect GcpCredentials Block which stores credentials
-    credentials_block_name = os.getenv("CREDS_BLOCK_NAME")
+    # Set up DataProc client with credentials of the GcpCredentials Block
+    dataproc_client = get_dataproc_client(region, os.getenv("CREDS_BLOCK_NAME"))
 
-    gcp_credentials_block = GcpCredentials.load(credentials_block_name)
-    credentials = gcp_credentials_block.get_credentials_from_service_account()
-
-    # Set up DataProc client and cluster information
-    dataproc_client = dataproc.JobControllerClient(
-        credentials=credentials,
-        client_options={"api_endpoint": "{}-dataproc.googleapis.com:443".format(region)}
-    )
+    args = [
+        "--temp_gcs_bucket", temp_gcs_bucket,
+        "--input_path_aus", input_path_aus,
+        "--output_path_aus", output_path_aus,
+        "--output_bq_aus", output_bq_aus,
+        "--input_path_la", input_path_la,
+        "--output_path_la", output_path_la,
+        "--output_bq_la", output_bq_la,
+        "--input_path_sd", input_path_sd,
+        "--output_path_sd", output_path_sd,
+        "--output_bq_sd", output_bq_sd
+    ] + job_option_args(job_options or {})
 
     # Define the PySpark job
     job_details = {
@@ -186,32 +789,30 @@ def submit_dataproc_job(spark_job_file: Path, temp_gcs_bucket: str,
         "placement": {"cluster_name": cluster_name},
         "pyspark_job": {
             "main_python_file_uri": f"gs://{bucket_name}/{spark_job_file}",
-            "args": [
-                "--temp_gcs_bucket", temp_gcs_bucket,
-                "--input_path_aus", input_path_aus,
-                "--output_path_aus", output_path_aus,
-                "--output_bq_aus", output_bq_aus,
-                "--input_path_la", input_path_la,
-                "--output_path_la", output_path_la,
-                "--output_bq_la", output_bq_la,
-                "--input_path_sd", input_path_sd,
-                "--output_path_sd", output_path_sd,
-                "--output_bq_sd", output_bq_sd
-            ],
-            "jar_file_uris": ["gs://spark-lib/bigquery/spark-bigquery-latest_2.12.jar"],
-            "python_file_uris": [],
+            "args": args,
+            "jar_file_uris": [connector_jar],
+            "python_file_uris": [f"gs://{bucket_name}/{path}" for path in python_files or []],
             "file_uris": [],
             "archive_uris": [],
         },
     }
+    if properties:
+        job_details["pyspark_job"]["properties"] = properties
+
+    request = {
+        "project_id": project_id,
+        "region": region,
+        "job": job_details
+    }
+    if not wait:
+        # the cluster runs the job while the flow does other work
+        job = dataproc_client.submit_job(request=request)
+        print(f"Submitted job {job.reference.job_id}, driver output: {job.driver_output_resource_uri}")
+        return job.reference.job_id
 
     # Submit the job
     operation = dataproc_client.submit_job_as_operation(
-        request={
-            "project_id": project_id,
-            "region": region,
-            "job": job_details
-        }
+        request=request
     )
     response = operation.result()
     print(f"response = {response}")
@@ -221,26 +822,418 @@ def submit_dataproc_job(spark_job_file: Path, temp_gcs_bucket: str,
     return response.reference.job_id
 
 
+def transfer_file(url: str, csv_name: str, manifest_path: Path = None, segments: int = 1,
+                  parquet_mode: str = None) -> dict:
+    """
+    Download data from web, upload it to GCS and return transfer statistics.
+    With parquet_mode 'alongside' or 'instead' the CSV file is converted to Parquet
+    which is uploaded with or instead of the CSV file.
+    """
+    start = time.perf_counter()
+    path = download_file.fn(url, csv_name, manifest_path, segments)
+    if path is None:
+        return {"csv_name": csv_name, "size": 0, "seconds": time.perf_counter() - start, "skipped": True}
+    if not path.exists():
+        raise FileNotFoundError(f"The file {csv_name} was not downloaded from {url}")
+
+    size = path.stat().st_size
+    if parquet_mode:
+        parquet_path = convert_to_parquet.fn(path)
+        upload_to_gcs.fn(from_path=parquet_path, to_path=destination_path_for_file(path=parquet_path))
+        remove_file(path=parquet_path)
+    if parquet_mode != "instead":
+        upload_to_gcs.fn(from_path=path, to_path=destination_path_for_file(path=path))
+    remove_file(path=path)
+
+    return {"csv_name": csv_name, "size": size, "seconds": time.perf_counter() - start}
+
+
+class ResponseStream(io.RawIOBase):
+    """
+    Read-only file object over the body of a streaming response.
+    It holds at most one chunk in memory and counts the size and sha256 of the data read.
+    """
+
+    def __init__(self, response: requests.Response):
+        self.chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        self.buffer = b""
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.buffer = chunk
+            self.size += len(chunk)
+            self.sha256.update(chunk)
+
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def get_gcs_bucket():
+    """Return google.cloud.storage bucket of the GCS bucket block"""
+    bucket_block_name = os.getenv("BUCKET_BLOCK_NAME")
+    gcs_block = load_block(GcsBucket, bucket_block_name)
+
+    return gcs_block.get_bucket()
+
+
+def stream_file_to_gcs(url: str, csv_name: str, manifest_path: Path = None, parquet_mode: str = None,
+                       bucket=None) -> dict:
+    """
+    Pipe data from web straight into a resumable chunked upload to GCS without a local file.
+    Memory is bounded by UPLOAD_CHUNK_SIZE, the object is replaced only when the upload is complete.
+    With parquet_mode 'instead' the stream is converted to Parquet while it's downloaded
+    and only the local Parquet file is uploaded.
+    The sha256 of the stream is known only after the upload, so unlike transfer_file a file with the same content
+    as the loaded one is still uploaded, the hash only marks it skipped to avoid the reload by the Spark job.
+    :param bucket: google.cloud.storage bucket (or a stand-in with the same blob interface),
+        the bucket of the GCS bucket block is used by default
+    :return: transfer statistics like transfer_file
+    """
+    if parquet_mode == "alongside":
+        raise ValueError("Parquet can be uploaded only instead of CSV in the streaming mode")
+    start = time.perf_counter()
+    city = csv_name.split("_")[0]
+    path = Path(f"data/{city}/{csv_name}")
+    to_path = destination_path_for_file(path)
+    print(f"Streaming file {csv_name} for {city} to {to_path}")
+
+    entry = load_manifest(manifest_path).get(url)
+    response = requests.get(url, stream=True, headers=conditional_headers(entry))
+    if response.status_code == 304:
+        print(f"File {csv_name} was not modified since the last download.")
+        return {"csv_name": csv_name, "size": 0, "seconds": time.perf_counter() - start, "skipped": True}
+    if response.status_code != 200:
+        raise RuntimeError(f"Error downloading the file {csv_name}, status: {response.status_code}")
+
+    if bucket is None:
+        bucket = get_gcs_bucket()
+    stream = ResponseStream(response)
+    if parquet_mode == "instead":
+        parquet_path = path.with_suffix(".parquet")
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        csv_to_parquet(io.BufferedReader(stream, CHUNK_SIZE), parquet_path, city)
+        blob = bucket.blob(f"{destination_path_for_file(parquet_path)}", chunk_size=UPLOAD_CHUNK_SIZE)
+        with open(parquet_path, "rb") as f:
+            blob.upload_from_file(f, timeout=300)
+        remove_file(path=parquet_path)
+    else:
+        blob = bucket.blob(f"{to_path}", chunk_size=UPLOAD_CHUNK_SIZE)
+        blob.upload_from_file(io.BufferedReader(stream, CHUNK_SIZE), timeout=300)
+    print(f"File {csv_name} uploaded successfully. Full size is {stream.size / (1024 * 1024):.2f} MB")
+
+    result = {"csv_name": csv_name, "size": stream.size, "seconds": time.perf_counter() - start}
+    if manifest_path is not None:
+        sha256 = stream.sha256.hexdigest()
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                      "content_length": stream.size, "sha256": sha256}
+        # Server doesn't support validators, but the content is the same as the loaded one:
+        # the object is already replaced with the same data, only the reload by the Spark job is avoided
+        if entry and entry.get("uploaded") and entry.get("sha256") == sha256:
+            print(f"File {csv_name} has the same content as the last upload, it isn't loaded again.")
+            result["skipped"] = True
+            update_manifest(manifest_path, url, **validators)
+        else:
+            update_pending(manifest_path, url, **validators)
+
+    return result
+
+
+def sd_year_url(sd_url: str, year: int) -> str:
+    """Return url of San Diego file for the year"""
+    if year < 2018:
+        return f"{sd_url}_{year}_datasd_v1.csv"
+    return f"{sd_url}_{year}_datasd.csv"
+
+
+def discover_sd_years(sd_url: str, start_year: int = SD_START_YEAR, end_year: int = None,
+                      ledger: dict = None) -> list:
+    """
+    Return years of San Diego data to ingest.
+    If end_year isn't given, years up to the current one are probed with HEAD requests
+    and only published years are returned. Years which are final in the ledger were published,
+    so only the other years and the current one are probed.
+    """
+    if end_year is not None:
+        return list(range(start_year, end_year + 1))
+
+    current_year = date.today().year
+    years = []
+    for year in range(start_year, current_year + 1):
+        if year < current_year and (ledger or {}).get(partition_key(f"sd_{year}.csv"), {}).get("final"):
+            years.append(year)
+            continue
+        response = requests.head(sd_year_url(sd_url, year), allow_redirects=True)
+        if response.status_code == 200:
+            years.append(year)
+        else:
+            print(f"San Diego data for {year} is not available, status: {response.status_code}")
+
+    return years
+
+
+def build_sources(aus_url: str, la_url_1: str, la_url_2: str, sd_url: str, sd_years: list) -> list:
+    """Return (url, csv_name) pairs for all datasets to ingest"""
+    sources = [
+        (aus_url, "aus_2003_2023.csv"),
+        (la_url_1, "la_2010_2019.csv"),
+        (la_url_2, "la_2020_2023.csv"),
+    ]
+    for year in sd_years:
+        sources.append((sd_year_url(sd_url, year), f"sd_{year}.csv"))
+
+    return sources
+
+
+@task(log_prints=True, retries=3, retry_delay_seconds=60)
+def run_transfer(slots: threading.Semaphore, url: str, csv_name: str, manifest_path: Path = None,
+                 segments: int = 1, stream_upload: bool = False, parquet_mode: str = None) -> dict:
+    """
+    Run transfer_file (or stream_file_to_gcs with stream_upload) once one of the slots is free,
+    the slot is released while the task waits for a retry. The retries of transfers are kept here only,
+    the transfer functions are plain functions.
+    The slots are a threading semaphore shared by the tasks in memory, so they limit transfers only with
+    the thread pool task runner (ConcurrentTaskRunner, the default one of flows).
+    """
+    with slots:
+        if stream_upload:
+            return stream_file_to_gcs(url, csv_name, manifest_path, parquet_mode)
+        return transfer_file(url, csv_name, manifest_path, segments, parquet_mode)
+
+
+def start_transfers(sources: list, max_concurrency: int, manifest_path: Path = None, segments: int = 1,
+                    stream_upload: bool = False, parquet_mode: str = None) -> list:
+    """
+    Submit a transfer for every source, running at most max_concurrency transfers at once.
+    All transfers share the slots, so the next file starts as soon as any transfer finishes,
+    and a failed transfer doesn't abort the rest of the batch.
+    :return: futures of the transfers in the order of sources
+    """
+    slots = threading.BoundedSemaphore(max_concurrency)
+    return [run_transfer.submit(slots, url, csv_name, manifest_path, segments, stream_upload, parquet_mode)
+            for url, csv_name in sources]
+
+
+def transfer_result(csv_name: str, outcome) -> dict:
+    """Return statistics of a finished transfer, the exception of a failed one becomes its 'error'"""
+    if isinstance(outcome, BaseException):
+        return {"csv_name": csv_name, "error": str(outcome).strip()}
+    return outcome
+
+
+def transfer_results(sources: list, futures: list) -> list:
+    """
+    Wait for all transfers of start_transfers
+    :return: list of transfer statistics, failed transfers have an 'error' key
+    """
+    return [transfer_result(csv_name, future.result(raise_on_failure=False))
+            for (_, csv_name), future in zip(sources, futures)]
+
+
+def summarize_transfers(results: list, elapsed: float) -> dict:
+    """Print per-file timings and throughput of the transfers and return the totals"""
+    mb = 1024 * 1024
+    total_size = 0
+    failed = []
+    skipped = []
+    for result in results:
+        if "error" in result:
+            failed.append(result["csv_name"])
+            print(f"{result['csv_name']}: FAILED ({result['error']})")
+            continue
+        if result.get("skipped"):
+            skipped.append(result["csv_name"])
+            print(f"{result['csv_name']}: not modified")
+            continue
+        total_size += result["size"]
+        throughput = result["size"] / mb / result["seconds"] if result["seconds"] else 0.0
+        print(f"{result['csv_name']}: {result['size'] / mb:.2f} MB in {result['seconds']:.1f} s "
+              f"({throughput:.2f} MB/s)")
+
+    summary = {
+        "files": len(results) - len(failed) - len(skipped),
+        "failed": failed,
+        "skipped": skipped,
+        "size_mb": total_size / mb,
+        "seconds": elapsed,
+        "throughput_mb_s": total_size / mb / elapsed if elapsed else 0.0,
+    }
+    print(f"Transferred {summary['files']} files ({summary['size_mb']:.2f} MB) "
+          f"in {summary['seconds']:.1f} s ({summary['throughput_mb_s']:.2f} MB/s), "
+          f"not modified: {len(skipped)}, failed: {len(failed)}")
+
+    return summary
+
+
+def changed_cities(results: list) -> list:
+    """Return cities which have at least one new file uploaded to GCS"""
+    cities = set()
+    for result in results:
+        if "error" not in result and not result.get("skipped"):
+            cities.add(result["csv_name"].split("_")[0])
+
+    return sorted(cities)
+
+
+def changed_urls(sources: list, results: list) -> dict:
+    """Return urls of new files uploaded to GCS by cities"""
+    urls = {csv_name: url for url, csv_name in sources}
+    cities = {}
+    for result in results:
+        if "error" not in result and not result.get("skipped"):
+            cities.setdefault(result["csv_name"].split("_")[0], []).append(urls[result["csv_name"]])
+
+    return cities
+
+
+def changed_sd_years(results: list) -> list:
+    """Return San Diego years which have a new file uploaded to GCS"""
+    return sorted(partition_year(result["csv_name"]) for result in results
+                  if result["csv_name"].startswith("sd_") and "error" not in result and not result.get("skipped"))
+
+
+def city_job_properties(city: str, city_properties: dict = None) -> dict:
+    """Return Spark properties of the city's job, CITY_JOB_PROPERTIES updated with the city's city_properties"""
+    properties = dict(CITY_JOB_PROPERTIES.get(city, {}))
+    properties.update((city_properties or {}).get(city, {}))
+    return properties
+
+
+@task(log_prints=True, retries=1, retry_delay_seconds=60)
+def run_city_job(city: str, spark_job_file: Path, job_paths: dict, job_options: dict = None,
+                 python_files: list = None, connector_jar: str = BIGQUERY_CONNECTOR_JAR,
+                 properties: dict = None, manifest_path: Path = None, urls: list = None,
+                 sources: list = None, transfers: list = None, changed_years: bool = False) -> str:
+    """
+    Submit the Spark job processing only the city and wait until it's finished.
+    job_paths are the bucket and paths arguments of submit_dataproc_job by their names.
+    A failed job is submitted again by retries of the task without affecting jobs of other cities.
+    When the job succeeds, pending validators of the city's urls are committed to the manifest.
+    With transfers (outcomes of the transfers of the city's sources, exceptions of failed ones) the task
+    starts once they are finished and the job is submitted only if one of them uploaded a new file,
+    urls are taken from them and with changed_years only San Diego years with new files are rebuilt.
+    :return: ID of the job, None if the city hasn't changed
+    """
+    city_options = {**(job_options or {}), "cities": [city]}
+    if transfers is not None:
+        results = [transfer_result(csv_name, outcome) for (_, csv_name), outcome in zip(sources, transfers)]
+        urls = changed_urls(sources, results).get(city)
+        if not urls:
+            print(f"{city}: source files haven't changed, Spark job is not submitted.")
+            return None
+        if changed_years:
+            city_options["sd_years"] = changed_sd_years(results)
+    job_id = submit_dataproc_job.fn(spark_job_file, **job_paths, job_options=city_options, python_files=python_files,
+                                    wait=False, properties=properties, connector_jar=connector_jar)
+    print(f"{city}: job {job_id}")
+    wait_for_dataproc_job.fn(job_id)
+    if manifest_path is not None:
+        commit_manifest(manifest_path, urls or [])
+    return job_id
+
+
+def wait_for_city_jobs(futures: dict) -> dict:
+    """
+    Wait for jobs of all cities, a failed city doesn't stop the others, failures are raised after all jobs finish
+    :return: IDs of the jobs by cities
+    """
+    job_ids = {city: future.result(raise_on_failure=False) for city, future in futures.items()}
+    failed = [city for city, job_id in job_ids.items() if isinstance(job_id, BaseException)]
+    if failed:
+        raise RuntimeError(f"Spark jobs of {', '.join(failed)} failed")
+    return job_ids
+
+
+def spark_job_paths(temp_gcs_bucket: str,
+                    input_path_aus: str, output_path_aus: str, output_bq_aus: str,
+                    input_path_la: str, output_path_la: str, output_bq_la: str,
+                    input_path_sd: str, output_path_sd: str, output_bq_sd: str) -> dict:
+    """Return the bucket and paths arguments of submit_dataproc_job by their names"""
+    return {
+        "temp_gcs_bucket": temp_gcs_bucket,
+        "input_path_aus": input_path_aus, "output_path_aus": output_path_aus, "output_bq_aus": output_bq_aus,
+        "input_path_la": input_path_la, "output_path_la": output_path_la, "output_bq_la": output_bq_la,
+        "input_path_sd": input_path_sd, "output_path_sd": output_path_sd, "output_bq_sd": output_bq_sd,
+    }
+
+
+def upload_job_files(zip_dependencies: bool = False, cache_connector: bool = False) -> tuple:
+    """
+    Upload the Spark job and its dependencies to GCS
+    :return: path of the job file, paths of its dependencies and URI of the BigQuery connector
+    """
+    spark_job_file = upload_job_to_gcs()
+    python_files = upload_job_dependencies_to_gcs(zip_dependencies)
+    connector_jar = cache_connector_jar() if cache_connector else BIGQUERY_CONNECTOR_JAR
+    return spark_job_file, python_files, connector_jar
+
+
 @flow(name="Ingest Flow")
-def web_to_gcs(url: str, csv_name: str) -> None:
-    """Download data in csv and upload to GCS"""
-    downloaded_file = download_file(url, csv_name)
-    upload_dataset_to_gcs(downloaded_file)
+def web_to_gcs(url: str, csv_name: str, manifest_path: Path = None, segments: int = 1,
+               stream_upload: bool = False, parquet_mode: str = None) -> bool:
+    """Download data in csv and upload to GCS, return False if the file hasn't changed"""
+    if stream_upload:
+        result = run_transfer(threading.BoundedSemaphore(1), url, csv_name, manifest_path,
+                              stream_upload=True, parquet_mode=parquet_mode)
+        return not result.get("skipped")
+
+    downloaded_file = download_file(url, csv_name, manifest_path, segments)
+    if downloaded_file is None:
+        return False
+    if parquet_mode:
+        parquet_file = convert_to_parquet(downloaded_file)
+        upload_dataset_to_gcs(parquet_file)
+    if parquet_mode == "instead":
+        remove_file(downloaded_file)
+    else:
+        upload_dataset_to_gcs(downloaded_file)
+
+    return True
 
 
 @flow(name="Submit Spark Job")
 def submit_job(temp_gcs_bucket: str,
                input_path_aus: str, output_path_aus: str, output_bq_aus: str,
                input_path_la: str, output_path_la: str, output_bq_la: str,
-               input_path_sd: str, output_path_sd: str, output_bq_sd: str) -> None:
-    """Upload spark-job file to GCS and submit this job to DataProc Cluster"""
-    # upload python-file with Spark job to gcs
-    spark_job_file = upload_job_to_gcs()
+               input_path_sd: str, output_path_sd: str, output_bq_sd: str,
+               job_options: dict = None, wait: bool = True, per_city_jobs: bool = False,
+               city_properties: dict = None, zip_dependencies: bool = False, cache_connector: bool = False,
+               manifest_path: Path = None, city_urls: dict = None):
+    """
+    Upload spark-job file to GCS and submit this job to DataProc Cluster, job_options are passed to the job.
+    Without wait the ID of the submitted job is returned at once, wait_for_dataproc_job polls it.
+    With per_city_jobs every city is processed by its own job, the jobs run in parallel and are retried
+    independently, city_properties ({"sd": {"spark.executor.memory": "8g"}}) size them.
+    IDs of the jobs are returned by cities. With manifest_path pending validators of city_urls
+    (city -> urls of its new files) are committed as soon as the city's job succeeds.
+    Files of the job are uploaded only when their content changes, with zip_dependencies modules are passed
+    in one zip, with cache_connector the BigQuery connector is read from the data lake bucket.
+    """
+    # upload python-file with Spark job and its dependencies to gcs
+    spark_job_file, python_files, connector_jar = upload_job_files(zip_dependencies, cache_connector)
+    job_options = job_options or {}
+    job_paths = spark_job_paths(temp_gcs_bucket, input_path_aus, output_path_aus, output_bq_aus,
+                                input_path_la, output_path_la, output_bq_la,
+                                input_path_sd, output_path_sd, output_bq_sd)
+    if per_city_jobs:
+        futures = {city: run_city_job.submit(city, spark_job_file, job_paths, job_options,
+                                             python_files=python_files, connector_jar=connector_jar,
+                                             properties=city_job_properties(city, city_properties),
+                                             manifest_path=manifest_path, urls=(city_urls or {}).get(city))
+                   for city in job_options.get("cities") or list(CITY_JOB_PROPERTIES)}
+        return wait_for_city_jobs(futures)
     # submit spark job to DataProc Cluster
-    submit_dataproc_job(spark_job_file, temp_gcs_bucket,
-                        input_path_aus, output_path_aus, output_bq_aus,
-                        input_path_la, output_path_la, output_bq_la,
-                        input_path_sd, output_path_sd, output_bq_sd)
+    return submit_dataproc_job(spark_job_file, **job_paths, job_options=job_options, python_files=python_files,
+                               wait=wait, connector_jar=connector_jar)
 
 
 @flow()
@@ -248,27 +1241,109 @@ def parent_flow(aus_url: str, la_url_1: str, la_url_2: str, sd_url: str,
                 temp_gcs_bucket: str,
                 input_path_aus: str, output_path_aus: str, output_bq_aus: str,
                 input_path_la: str, output_path_la: str, output_bq_la: str,
-                input_path_sd: str, output_path_sd: str, output_bq_sd: str):
+                input_path_sd: str, output_path_sd: str, output_bq_sd: str,
+                max_concurrency: int = 1, manifest_path: str = None, segments: int = 1,
+                stream_upload: bool = False, parquet_mode: str = None,
+                sd_start_year: int = SD_START_YEAR, sd_end_year: int = None,
+                ledger_path: str = None, recheck_final: bool = False, watermark_path: str = None,
+                single_pass: bool = False, parallel_cities: int = 1,
+                target_file_mb: int = None, partition_lake_by: str = None,
+                parquet_layout: str = None, parquet_compression: str = None, bq_write_method: str = None,
+                bq_cluster_by: str = None, poll_job: bool = False, per_city_jobs: bool = False,
+                city_properties: dict = None, zip_dependencies: bool = False, cache_connector: bool = False):
+    if parquet_mode not in (None, "alongside", "instead"):
+        raise ValueError(f"Unknown parquet_mode '{parquet_mode}', use 'alongside' or 'instead'")
+    if stream_upload and parquet_mode == "alongside":
+        raise ValueError("Parquet can be uploaded only instead of CSV with stream_upload, use parquet_mode 'instead'")
+    if ledger_path is not None and manifest_path is None:
+        raise ValueError("ledger_path requires manifest_path, hashes of partitions are taken from the manifest")
 
     # Load file .env
     load_env()
-    # load data for Austin
-    web_to_gcs(aus_url, "aus_2003_2023.csv")
+    # load data for Austin, Los Angeles and San Diego
+    ledger = load_manifest(ledger_path)
+    sd_years = discover_sd_years(sd_url, sd_start_year, sd_end_year, ledger)
+    all_sources = build_sources(aus_url, la_url_1, la_url_2, sd_url, sd_years)
+    sources = all_sources
+    if ledger_path is not None:
+        # closed years which were loaded are not downloaded again
+        sources = pending_sources(all_sources, ledger, recheck_final)
+    # options of the Spark job, the cities and San Diego years are those with new files
+    job_options = {
+        "input_format": "parquet" if parquet_mode else "csv",
+        "watermark_path": watermark_path,
+        "single_pass": single_pass,
+        "parallel_cities": parallel_cities,
+        "target_file_mb": target_file_mb,
+        "partition_lake_by": partition_lake_by,
+        "parquet_layout": parquet_layout,
+        "parquet_compression": parquet_compression,
+        "bq_write_method": bq_write_method,
+        "bq_cluster_by": bq_cluster_by,
+    }
+    job_paths = spark_job_paths(temp_gcs_bucket, input_path_aus, output_path_aus, output_bq_aus,
+                                input_path_la, output_path_la, output_bq_la,
+                                input_path_sd, output_path_sd, output_bq_sd)
+    city_jobs = None
+    if max_concurrency > 1:
+        # download and upload files concurrently
+        start = time.perf_counter()
+        futures = start_transfers(sources, max_concurrency, manifest_path, segments, stream_upload, parquet_mode)
+        if per_city_jobs:
+            # files of the job are uploaded while the sources are transferred, the job of a city is
+            # submitted as soon as transfers of its sources finish and runs while other cities are transferred
+            spark_job_file, python_files, connector_jar = upload_job_files(zip_dependencies, cache_connector)
+            city_transfers = {}
+            for source, future in zip(sources, futures):
+                city_transfers.setdefault(source[1].split("_")[0], []).append((source, future))
+            city_jobs = {
+                city: run_city_job.submit(city, spark_job_file, job_paths, job_options,
+                                          python_files=python_files, connector_jar=connector_jar,
+                                          properties=city_job_properties(city, city_properties),
+                                          manifest_path=manifest_path,
+                                          sources=[source for source, _ in transfers],
+                                          transfers=[allow_failure(future) for _, future in transfers],
+                                          changed_years=ledger_path is not None)
+                for city, transfers in city_transfers.items()}
+        results = transfer_results(sources, futures)
+        summarize_transfers(results, time.perf_counter() - start)
+    else:
+        results = []
+        for url, csv_name in sources:
+            changed = web_to_gcs(url, csv_name, manifest_path, segments, stream_upload, parquet_mode)
+            results.append({"csv_name": csv_name, "skipped": not changed})
 
-    # load data for Los Angeles
-    web_to_gcs(la_url_1, "la_2010_2019.csv")
-    web_to_gcs(la_url_2, "la_2020_2023.csv")
+    # process only cities with new data
+    cities = changed_cities(results)
+    city_urls = changed_urls(sources, results)
+    if city_jobs is not None:
+        # jobs of cities without new files aren't submitted
+        wait_for_city_jobs(city_jobs)
+    elif cities:
+        # with the ledger only changed years of San Diego are rebuilt,
+        # with poll_job the job is polled with backoff instead of blocking on its operation,
+        # with per_city_jobs only changed cities are submitted, each one as its own job
+        job_options["cities"] = cities
+        job_options["sd_years"] = changed_sd_years(results) if ledger_path is not None else None
+        job_id = submit_job(**job_paths, job_options=job_options, wait=not poll_job, per_city_jobs=per_city_jobs,
+                            city_properties=city_properties, zip_dependencies=zip_dependencies,
+                            cache_connector=cache_connector, manifest_path=manifest_path,
+                            city_urls=city_urls)
+        if not per_city_jobs:
+            if poll_job:
+                wait_for_dataproc_job(job_id)
+            # new files are skipped by the next run only after the job has loaded them,
+            # per-city jobs commit their cities themselves
+            if manifest_path is not None:
+                commit_manifest(manifest_path, [url for urls in city_urls.values() for url in urls])
+    else:
+        print("Source files haven't changed, Spark job is not submitted.")
 
-    # load data for San Diego
-    for year in range(2015, 2024):
-        if year < 2018:
-            sd_url_full = f"{sd_url}_{year}_datasd_v1.csv"
-        else:
-            sd_url_full = f"{sd_url}_{year}_datasd.csv"
-        web_to_gcs(sd_url_full, f"sd_{year}.csv")
-    submit_job(temp_gcs_bucket, input_path_aus, output_path_aus, output_bq_aus,
-               input_path_la, output_path_la, output_bq_la,
-               input_path_sd, output_path_sd, output_bq_sd)
+    if ledger_path is not None:
+        update_ledger(ledger_path, manifest_path, sources, results)
+
+    # round trips to the Prefect server for blocks during the run
+    print_block_stats()
 
 
 if __name__ == '__main__':
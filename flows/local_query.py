@@ -0,0 +1,194 @@
+"""
+Local query engine over the Parquet lake written by the Spark job (data/pq/{aus,la,sd}).
+
+The lake is loaded into an embedded DuckDB database as the table fact_crimedata with the same shape
+as the dbt model fact_crimedata.sql, so exploratory queries and dashboard prototypes run offline.
+Rows are sorted by city and crime_date, so filters on them skip row groups by their min/max values.
+Runs of parent_flow with parquet_mode don't write the lake, it keeps the data of the last CSV run.
+
+Run locally:
+    python flows/local_query.py --city "Los Angeles" --start_date 2023-01-01 --end_date 2023-01-31
+"""
+import argparse
+import os
+import re
+import time
+from datetime import date
+
+import duckdb
+
+from schemas import CODE_TABLES, AUS_TIMESTAMP_FORMAT, AUS_DATE_FORMAT, LA_DATE_FORMAT
+
+LAKE_PATH = "data/pq"
+SEEDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbt_crime", "seeds")
+
+# cities of fact_crimedata and directories of their lakes
+CITIES = {
+    "aus": "Austin",
+    "la": "Los Angeles",
+    "sd": "San Diego",
+}
+
+FACT_COLUMNS = ["incident_num", "city", "crime_datetime", "crime_date", "crime_code", "crime_description",
+                "area_code", "area_name", "status"]
+
+# Spark datetime patterns of schemas.py -> DuckDB strptime specifiers
+STRPTIME_SPECIFIERS = {"yyyy": "%Y", "MM": "%m", "dd": "%d", "HH": "%H", "hh": "%I", "mm": "%M", "ss": "%S", "a": "%p"}
+
+
+def strptime_format(spark_format: str) -> str:
+    """Return DuckDB strptime format of the Spark datetime pattern of raw dates from schemas.py"""
+    return re.sub("|".join(STRPTIME_SPECIFIERS), lambda match: STRPTIME_SPECIFIERS[match.group()], spark_format)
+
+
+def decode_sql(column: str, table: str) -> str:
+    """Return CASE expression decoding the column with the code table from schemas.py"""
+    codes, default = CODE_TABLES[table]
+    cases = " ".join(f"when '{code}' then '{description}'" for code, description in codes.items())
+    otherwise = "null" if default is None else f"'{default}'"
+    return f"case {column} {cases} else {otherwise} end"
+
+
+def lake_files(lake_path: str, city: str) -> str:
+    """Return glob of Parquet files of the city's lake, flat or partitioned by year and month"""
+    return f"read_parquet('{lake_path}/{city}/**/*.parquet', hive_partitioning = true)"
+
+
+def city_select(lake_path: str, city: str) -> str:
+    """Return SQL projecting the city's raw lake to columns of fact_crimedata like the dbt models"""
+    if city == "aus":
+        return f"""
+            select
+                cast(Incident_Number as bigint) as incident_num,
+                '{CITIES[city]}' as city,
+                try_strptime(Occurred_Date_Time, '{strptime_format(AUS_TIMESTAMP_FORMAT)}') as crime_datetime,
+                cast(try_strptime(Occurred_Date, '{strptime_format(AUS_DATE_FORMAT)}') as date) as crime_date,
+                cast(Highest_Offense_Code as varchar) as crime_code,
+                Highest_Offense_Description as crime_description,
+                Zip_Code as area_code,
+                '' as area_name,
+                {decode_sql('Clearance_Status', 'clearance_status')} as status
+            from {lake_files(lake_path, city)}"""
+    if city == "la":
+        # date of DATE_OCC and time of TIME_OCC (HHmm)
+        return f"""
+            select
+                cast(DR_NO as bigint) as incident_num,
+                '{CITIES[city]}' as city,
+                try_strptime(strftime(try_strptime(DATE_OCC, '{strptime_format(LA_DATE_FORMAT)}'), '%Y-%m-%d ')
+                             || substr(TIME_OCC, 1, 2) || ':' || substr(TIME_OCC, 3, 2), '%Y-%m-%d %H:%M')
+                    as crime_datetime,
+                cast(try_strptime(DATE_OCC, '{strptime_format(LA_DATE_FORMAT)}') as date) as crime_date,
+                cast(Crm_Cd as varchar) as crime_code,
+                Crm_Cd_Desc as crime_description,
+                AREA as area_code,
+                AREA_NAME as area_name,
+                Status_Desc as status
+            from {lake_files(lake_path, city)}"""
+    if city == "sd":
+        # codes are decoded with dbt seeds like fact_sd_crimedata.sql
+        return f"""
+            select
+                cast(substring(sd.incident_num, 2) as bigint) as incident_num,
+                '{CITIES[city]}' as city,
+                cast(sd.date_time as timestamp) as crime_datetime,
+                cast(sd.date_time as date) as crime_date,
+                sd.call_type as crime_code,
+                call_types.description as crime_description,
+                sd.beat as area_code,
+                areas.neighborhood as area_name,
+                dispositions.description as status
+            from {lake_files(lake_path, city)} as sd
+            inner join read_csv('{SEEDS_PATH}/pd_cfs_calltypes_datasd.csv', header = true, all_varchar = true)
+                as call_types on sd.call_type = call_types.call_type
+            inner join read_csv('{SEEDS_PATH}/pd_dispo_codes_historical_datasd.csv', header = true,
+                                all_varchar = true)
+                as dispositions on sd.disposition = dispositions.dispo_code
+            inner join read_csv('{SEEDS_PATH}/pd_beat_codes_list_datasd.csv', header = true, all_varchar = true)
+                as areas on sd.beat = cast(areas.beat as integer)"""
+    raise ValueError(f"Unknown city '{city}', use one of {', '.join(CITIES)}")
+
+
+def connect(lake_path: str = LAKE_PATH, cities: list = None, database: str = ":memory:",
+            materialize: bool = True) -> duckdb.DuckDBPyConnection:
+    """
+    Return DuckDB connection with fact_crimedata of the cities (all of them by default) from the lake.
+    With materialize the lake is loaded into a table sorted by city and crime_date,
+    otherwise fact_crimedata is a view which reads the Parquet files on every query.
+    """
+    cities = cities or [city for city in CITIES if os.path.isdir(os.path.join(lake_path, city))]
+    if not cities:
+        raise FileNotFoundError(f"No lakes of cities in {lake_path}")
+    con = duckdb.connect(database)
+    # the Spark job writes timestamps in UTC
+    con.execute("set TimeZone = 'UTC'")
+    union = "\nunion all\n".join(city_select(lake_path, city) for city in cities)
+    if materialize:
+        start = time.perf_counter()
+        con.execute(f"create or replace table fact_crimedata as "
+                    f"select {', '.join(FACT_COLUMNS)} from ({union}) order by city, crime_date")
+        rows = con.execute("select count(*) from fact_crimedata").fetchone()[0]
+        print(f"Loaded {rows} rows of {', '.join(cities)} from {lake_path} in {time.perf_counter() - start:.2f} s")
+    else:
+        con.execute(f"create or replace view fact_crimedata as select {', '.join(FACT_COLUMNS)} from ({union})")
+    return con
+
+
+def fact_filter(city: str = None, start_date: date = None, end_date: date = None) -> tuple:
+    """Return WHERE clause and its parameters for the city and the range of crime dates (inclusive)"""
+    conditions, params = [], []
+    if city:
+        conditions.append("city = ?")
+        params.append(city)
+    if start_date:
+        conditions.append("crime_date >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("crime_date <= ?")
+        params.append(end_date)
+    return ("where " + " and ".join(conditions) if conditions else ""), params
+
+
+def daily_counts(con: duckdb.DuckDBPyConnection, city: str = None, start_date: date = None,
+                 end_date: date = None) -> list:
+    """Return (city, crime_date, number of crimes) ordered by city and date"""
+    where, params = fact_filter(city, start_date, end_date)
+    return con.execute(f"""
+        select city, crime_date, count(*) as crimes
+        from fact_crimedata
+        {where}
+        group by city, crime_date
+        order by city, crime_date
+    """, params).fetchall()
+
+
+def top_crimes(con: duckdb.DuckDBPyConnection, city: str = None, start_date: date = None,
+               end_date: date = None, limit: int = 10) -> list:
+    """Return (city, crime_description, number of crimes) of the most frequent crimes of each city"""
+    where, params = fact_filter(city, start_date, end_date)
+    return con.execute(f"""
+        select city, crime_description, crimes
+        from (
+            select city, crime_description, count(*) as crimes
+            from fact_crimedata
+            {where}
+            group by city, crime_description
+        )
+        qualify row_number() over (partition by city order by crimes desc, crime_description) <= ?
+        order by city, crimes desc, crime_description
+    """, params + [limit]).fetchall()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query the local Parquet lake")
+    parser.add_argument("--lake_path", type=str, default=LAKE_PATH, help="Directory with lakes of the cities")
+    parser.add_argument("--city", type=str, default=None, choices=list(CITIES.values()))
+    parser.add_argument("--start_date", type=date.fromisoformat, default=None)
+    parser.add_argument("--end_date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    connection = connect(args.lake_path)
+    start = time.perf_counter()
+    for row in top_crimes(connection, args.city, args.start_date, args.end_date):
+        print(*row, sep=" | ")
+    print(f"Query took {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,32 @@
+from schemas import SOURCES, staging_sql
+import argparse
+import os
+
+
+def write_staging_models(models_dir: str = None) -> list:
+    """
+    Write dbt staging models of the cities generated from schemas.py
+    :param models_dir: directory of staging models, dbt_crime/models/staging by default
+    :return: paths of the written models
+    """
+    if models_dir is None:
+        basedir = os.path.abspath(os.path.dirname(__file__))
+        models_dir = os.path.join(basedir, '../dbt_crime/models/staging')
+
+    paths = []
+    for city, source in SOURCES.items():
+        path = os.path.join(models_dir, f"stg_{source['table']}.sql")
+        with open(path, "w") as f:
+            f.write(staging_sql(city))
+        print(f"Write staging model {path}")
+        paths.append(path)
+
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models_dir', required=False, default=None)
+    args = parser.parse_args()
+
+    write_staging_models(args.models_dir)
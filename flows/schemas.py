@@ -0,0 +1,300 @@
+"""
+Registry of the crime datasets: raw schemas, formats, models and tables of each city.
+
+The module has no dependencies, so it's shared by the Spark job (flows/spark_job.py),
+the ingest flow (flows/ingest.py) which converts CSV to Parquet with pyarrow
+and flows/make_dbt_staging.py which generates dbt staging models.
+A new city is added with its columns, model and an entry in SOURCES.
+
+Raw columns are listed in the order of the CSV files, the header of the files is replaced by these names:
+(name, type) or (name, 'int', 'string') for integer columns with values like "521.0",
+such columns are read as text and parsed with INTEGRAL_PATTERN, malformed values are quarantined.
+Types: 'string', 'int', 'long', 'double', 'timestamp'.
+Code tables decode columns of the cities in the Spark job.
+"""
+
+# Schema for Austin Crime data
+AUS_COLUMNS = [
+    ('Incident_Number', 'long'),
+    ('Highest_Offense_Description', 'string'),
+    ('Highest_Offense_Code', 'int'),
+    ('Family_Violence', 'string'),
+    ('Occurred_Date_Time', 'string'),
+    ('Occurred_Date', 'string'),
+    ('Occurred_Time', 'string'),
+    ('Report_Date_Time', 'string'),
+    ('Report_Date', 'string'),
+    ('Report_Time', 'string'),
+    ('Location_Type', 'string'),
+    ('Address', 'string'),
+    ('Zip_Code', 'int'),
+    ('Council_District', 'int'),
+    ('APD_Sector', 'string'),
+    ('APD_District', 'string'),
+    ('PRA', 'int'),
+    ('Census_Tract', 'double'),
+    ('Clearance_Status', 'string'),
+    ('Clearance_Date', 'string'),
+    ('UCR_Category', 'string'),
+    ('Category_Description', 'string'),
+    ('X-coordinate', 'int'),
+    ('Y-coordinate', 'int'),
+    ('Latitude', 'double'),
+    ('Longitude', 'double'),
+    ('Location', 'string'),
+]
+
+# Schema for Los Angeles Crime data
+LA_COLUMNS = [
+    ('DR_NO', 'int'),
+    ('Date_Rptd', 'string'),
+    ('DATE_OCC', 'string'),
+    ('TIME_OCC', 'string'),
+    ('AREA', 'int'),
+    ('AREA_NAME', 'string'),
+    ('Rpt_Dist_No', 'int'),
+    ('Part_1-2', 'int'),
+    ('Crm_Cd', 'int'),
+    ('Crm_Cd_Desc', 'string'),
+    ('Mocodes', 'string'),
+    ('Vict_Age', 'int'),
+    ('Vict_Sex', 'string'),
+    ('Vict_Descent', 'string'),
+    ('Premis_Cd', 'int'),
+    ('Premis_Desc', 'string'),
+    ('Weapon_Used_Cd', 'int'),
+    ('Weapon_Desc', 'string'),
+    ('Status', 'string'),
+    ('Status_Desc', 'string'),
+    ('Crm_Cd_1', 'int'),
+    ('Crm_Cd_2', 'int'),
+    ('Crm_Cd_3', 'int'),
+    ('Crm_Cd_4', 'int'),
+    ('LOCATION', 'string'),
+    ('Cross_Street', 'string'),
+    ('LAT', 'double'),
+    ('LON', 'double'),
+]
+
+# Schema for San Diego Crime data
+SD_COLUMNS = [
+    ('incident_num', 'string'),
+    ('date_time', 'timestamp'),
+    ('day_of_week', 'int'),
+    ('address_number_primary', 'int'),
+    ('address_dir_primary', 'string'),
+    ('address_road_primary', 'string'),
+    ('address_sfx_primary', 'string'),
+    ('address_dir_intersecting', 'string'),
+    ('address_road_intersecting', 'string'),
+    ('address_sfx_intersecting', 'string'),
+    ('call_type', 'string'),
+    ('disposition', 'string'),
+    # some values of beat and priority have Double type like 521.0
+    ('beat', 'int', 'string'),
+    ('priority', 'int', 'string'),
+]
+
+# Integer values of text columns: optional sign, up to 9 digits (fit into int) and optional zero fraction
+INTEGRAL_PATTERN = r"^\s*([+-]?\d{1,9})(\.0*)?\s*$"
+
+# Code tables: column -> (code -> description, description of unknown codes)
+CODE_TABLES = {
+    # Austin
+    "clearance_status": ({
+        "C": "Arrested",
+        "O": "Exception",
+        "N": "Not cleared",
+    }, None),
+    # Los Angeles
+    "vict_sex": ({
+        "F": "Female",
+        "M": "Male",
+        "X": "Unknown",
+    }, "Unknown"),
+    "vict_descent": ({
+        "A": "Other Asian",
+        "B": "Black",
+        "C": "Chinese",
+        "D": "Cambodian",
+        "F": "Filipino",
+        "G": "Guamanian",
+        "H": "Hispanic/Latin/Mexican",
+        "I": "American Indian/Alaskan Native",
+        "J": "Japanese",
+        "K": "Korean",
+        "L": "Laotian",
+        "O": "Other",
+        "P": "Pacific Islander",
+        "S": "Samoan",
+        "U": "Hawaiian",
+        "V": "Vietnamese",
+        "W": "White",
+        "X": "Unknown",
+        "Z": "Asian Indian",
+    }, "Unknown"),
+}
+
+# Formats of dates and timestamps in raw data
+AUS_TIMESTAMP_FORMAT = "MM/dd/yyyy hh:mm:ss a"
+AUS_DATE_FORMAT = "MM/dd/yyyy"
+LA_DATE_FORMAT = "MM/dd/yyyy hh:mm:ss a"
+SD_TIMESTAMP_FORMAT = "yyyy-MM-dd HH:mm:ss"
+
+# Columns of the tables loaded to BigQuery: (name, source, type) in the order of the table.
+# source is the name of a raw column or a derivation:
+#   ('timestamp', column, format), ('date', column, format) - parsed from a string column,
+#   ('decode', column) - decoded with the code table of the name,
+#   ('expr', sql) - Spark SQL expression over raw columns.
+# type is the type of the column in dbt staging models:
+#   'integer', 'numeric', 'timestamp', 'date' or 'string' (not cast).
+AUS_MODEL = [
+    ("incident_num", "Incident_Number", "integer"),
+    ("crime_datetime", ("timestamp", "Occurred_Date_Time", AUS_TIMESTAMP_FORMAT), "timestamp"),
+    ("crime_date", ("date", "Occurred_Date", AUS_DATE_FORMAT), "date"),
+    ("report_datetime", ("timestamp", "Report_Date_Time", AUS_TIMESTAMP_FORMAT), "timestamp"),
+    ("report_date", ("date", "Report_Date", AUS_DATE_FORMAT), "date"),
+    ("crime_code", "Highest_Offense_Code", "integer"),
+    ("crime_description", "Highest_Offense_Description", "string"),
+    ("family_violence", "Family_Violence", "string"),
+    ("location_type", "Location_Type", "string"),
+    ("address", "Address", "string"),
+    ("zip_code", "Zip_Code", "integer"),
+    ("council_district", "Council_District", "integer"),
+    ("apd_sector", "APD_Sector", "string"),
+    ("apd_district", "APD_District", "string"),
+    ("pra", "PRA", "integer"),
+    ("census_tract", "Census_Tract", "numeric"),
+    ("clearance_status", ("decode", "Clearance_Status"), "string"),
+    ("clearance_date", ("date", "Clearance_Date", AUS_DATE_FORMAT), "date"),
+    ("ucr_category", "UCR_Category", "string"),
+    ("category_description", "Category_Description", "string"),
+]
+
+LA_MODEL = [
+    ("incident_num", "DR_NO", "integer"),
+    # date of DATE_OCC and time of TIME_OCC (HHmm)
+    ("crime_datetime", ("expr", f"to_timestamp(concat(to_date(DATE_OCC, '{LA_DATE_FORMAT}'), ' ', "
+                                f"substr(TIME_OCC, 1, 2), ':', substr(TIME_OCC, 3, 2), ':00'), "
+                                f"'yyyy-MM-dd HH:mm:ss')"), "timestamp"),
+    ("crime_date", ("date", "DATE_OCC", LA_DATE_FORMAT), "date"),
+    ("report_date", ("date", "Date_Rptd", LA_DATE_FORMAT), "date"),
+    ("crime_code", "Crm_Cd", "integer"),
+    ("crime_description", "Crm_Cd_Desc", "string"),
+    ("area_code", "AREA", "integer"),
+    ("area_name", "AREA_NAME", "string"),
+    ("rpt_dist_num", "Rpt_Dist_No", "integer"),
+    ("part_1_2", "Part_1-2", "integer"),
+    ("mocodes", "Mocodes", "string"),
+    ("vict_age", "Vict_Age", "integer"),
+    ("vict_sex", ("decode", "Vict_Sex"), "string"),
+    ("vict_descent", ("decode", "Vict_Descent"), "string"),
+    ("premis_code", "Premis_Cd", "integer"),
+    ("premis_description", "Premis_Desc", "string"),
+    ("weapon_used_code", "Weapon_Used_Cd", "integer"),
+    ("weapon_description", "Weapon_Desc", "string"),
+    ("status", "Status", "string"),
+    ("status_description", "Status_Desc", "string"),
+    ("crime_code_1", "Crm_Cd_1", "integer"),
+    ("crime_code_2", "Crm_Cd_2", "integer"),
+    ("crime_code_3", "Crm_Cd_3", "integer"),
+    ("crime_code_4", "Crm_Cd_4", "integer"),
+    ("location", "LOCATION", "string"),
+    ("cross_street", "Cross_Street", "string"),
+    ("latitude", "LAT", "numeric"),
+    ("longtitude", "LON", "numeric"),
+]
+
+SD_MODEL = [
+    # incident numbers without the first letter
+    ("incident_num", ("expr", "substring(incident_num, 2, length(incident_num) - 1)"), "integer"),
+    ("crime_datetime", "date_time", "timestamp"),
+    ("crime_date", ("date", "date_time", SD_TIMESTAMP_FORMAT), "date"),
+    ("day_of_week", "day_of_week", "integer"),
+    ("address_number_primary", "address_number_primary", "integer"),
+    ("address_dir_primary", "address_dir_primary", "string"),
+    ("address_road_primary", "address_road_primary", "string"),
+    ("address_sfx_primary", "address_sfx_primary", "string"),
+    ("address_dir_intersecting", "address_dir_intersecting", "string"),
+    ("address_road_intersecting", "address_road_intersecting", "string"),
+    ("address_sfx_intersecting", "address_sfx_intersecting", "string"),
+    ("call_type", "call_type", "string"),
+    ("disposition", "disposition", "string"),
+    ("beat", "beat", "integer"),
+    ("priority", "priority", "integer"),
+]
+
+SOURCES = {
+    "aus": {
+        "columns": AUS_COLUMNS,
+        "model": AUS_MODEL,
+        # raw column with the date of crime, used to partition the lake by year or month
+        "date_column": ("Occurred_Date", AUS_DATE_FORMAT),
+        # raw columns which sort rows of a day in the sorted Parquet layout
+        "sort_columns": ["Highest_Offense_Code"],
+        # BigQuery table of the staging source in dbt
+        "table": "austin_crimedata",
+        # model columns partitioning the table by month and clustering rows inside months,
+        # the columns which dbt models filter and join on
+        "partition_column": "crime_date",
+        "cluster_columns": ["crime_code", "zip_code"],
+    },
+    "la": {
+        "columns": LA_COLUMNS,
+        "model": LA_MODEL,
+        "date_column": ("DATE_OCC", LA_DATE_FORMAT),
+        "sort_columns": ["Crm_Cd"],
+        "table": "la_crimedata",
+        "partition_column": "crime_date",
+        "cluster_columns": ["crime_code", "area_code"],
+    },
+    "sd": {
+        "columns": SD_COLUMNS,
+        "model": SD_MODEL,
+        "date_column": ("date_time", None),
+        "sort_columns": ["call_type"],
+        "table": "sd_crimedata",
+        "partition_column": "crime_date",
+        # call type and beat are the crime code and area filters of the rollups and the dashboard,
+        # a key prunes only with filters on the keys before it (benchmarks/bq_clustering.py)
+        "cluster_columns": ["call_type", "beat", "disposition"],
+        # columns added by dbt macros to the staging model
+        "staging_columns": ["{{ get_priority_description('priority') }} as priority_description"],
+    },
+}
+
+
+def read_columns(city: str) -> list:
+    """Return (name, type) of raw columns of the city with types used to parse the files"""
+    return [(name, read_type[0] if read_type else type_name) for name, type_name, *read_type in SOURCES[city]["columns"]]
+
+
+def column_types(city: str) -> list:
+    """Return (name, type) of raw columns of the city after reading"""
+    return [(name, type_name) for name, type_name, *_ in SOURCES[city]["columns"]]
+
+
+def narrowed_columns(city: str) -> dict:
+    """Return name -> type of raw columns of the city which are read as text and parsed with INTEGRAL_PATTERN"""
+    return {name: type_name for name, type_name, *read_type in SOURCES[city]["columns"] if read_type}
+
+
+def staging_sql(city: str) -> str:
+    """Return SQL of the dbt staging model of the city"""
+    source = SOURCES[city]
+    columns = [name if type_name == "string" else f"cast({name} as {type_name}) as {name}"
+               for name, _, type_name in source["model"]]
+    columns += source.get("staging_columns", [])
+    select = ",\n    ".join(columns)
+    return f"""{{{{ config(materialized='view') }}}}
+
+-- generated from flows/schemas.py by flows/make_dbt_staging.py
+select
+    {select}
+
+from {{{{ source('staging','{source["table"]}') }}}}
+-- dbt run -m stg_{source["table"]} --vars 'is_test_run: false'
+{{% if var('is_test_run', default=true) %}}
+  limit 100
+{{% endif %}}
+"""
@@ -1,19 +1,136 @@
 import argparse
 
 import pyspark
-from pyspark.sql import SparkSession, DataFrame, types
+from pyspark.sql import SparkSession, DataFrame, Column, Observation, types
 from pyspark.sql import functions as F
 from pyspark.conf import SparkConf
 from pyspark.context import SparkContext
+from pyspark import StorageLevel
 import os
+import json
+import math
+import time
+import queue
+from contextlib import contextmanager
+
+from schemas import SOURCES, CODE_TABLES, INTEGRAL_PATTERN, read_columns, narrowed_columns
+
+# size of CSV input per Parquet file for San Diego, Parquet files are several times smaller
+SD_INPUT_BYTES_PER_FILE = 256 * 1024 * 1024
+
+# column of raw rows which can't be parsed with the schema, filled by the CSV reader
+CORRUPT_RECORD_COLUMN = "_corrupt_record"
+# manifest with parse statistics of input files inside the Parquet output, ignored by readers of the lake
+PARSE_STATS_FILE = "_parse_stats.json"
+
+# sizes of row groups and pages of the sorted Parquet layout (Parquet defaults, set explicitly)
+PARQUET_ROW_GROUP_BYTES = 128 * 1024 * 1024
+PARQUET_PAGE_BYTES = 1024 * 1024
+
+# Spark types for type names used in schemas.py
+SPARK_TYPES = {
+    'string': types.StringType(),
+    'int': types.IntegerType(),
+    'long': types.LongType(),
+    'double': types.DoubleType(),
+    'timestamp': types.TimestampType(),
+}
+
+
+def spark_schema(city: str) -> types.StructType:
+    """Build Spark schema for raw data of the city from schemas.py with the types used to parse the files"""
+    return types.StructType([
+        types.StructField(name, SPARK_TYPES[type_name], True)
+        for name, type_name in read_columns(city)
+    ])
 
 
-def read_csv(spark: SparkSession, schema: types.StructType, input_path: str) -> DataFrame:
-    """Read csv data using schema"""
+def parse_integral(column: str, type_name: str) -> Column:
+    """Parse integer values like "521" or "521.0" of the text column, malformed values are null"""
+    value = F.col(column)
+    return F.when(value.rlike(INTEGRAL_PATTERN),
+                  F.regexp_extract(value, INTEGRAL_PATTERN, 1).cast(SPARK_TYPES[type_name])).alias(column)
+
+
+def parse_raw_columns(city: str) -> list:
+    """Return raw columns of the city with text columns parsed to their types in schemas.py, to use in one select"""
+    narrowed = narrowed_columns(city)
+    return [parse_integral(name, narrowed[name]) if name in narrowed else F.col(f"`{name}`")
+            for name, _ in read_columns(city)]
+
+
+def malformed_values(city: str, corrupt_column: str = None) -> Column:
+    """
+    Return condition of raw rows of the city with values which can't be parsed to their types,
+    with corrupt_column rows rejected by the CSV reader are malformed too
+    """
+    condition = F.col(corrupt_column).isNotNull() if corrupt_column else F.lit(False)
+    for name in narrowed_columns(city):
+        condition = condition | (F.col(name).isNotNull() & ~F.col(name).rlike(INTEGRAL_PATTERN))
+    return condition
+
+
+def quarantine_malformed(df: DataFrame, city: str, quarantine_path: str, partition_by: list = None,
+                         dynamic: bool = False, corrupt_column: str = None) -> int:
+    """
+    Write raw rows of the city with malformed values as text to quarantine_path
+    (replacing only its partitions with dynamic), return number of the rows
+    """
+    df_malformed = df.where(malformed_values(city, corrupt_column)) \
+        .withColumn("source_file", F.input_file_name()) \
+        .persist(StorageLevel.MEMORY_AND_DISK)
+    count = df_malformed.count()
+    if count:
+        print(f"Quarantine {count} rows with malformed values to {quarantine_path}")
+        df_malformed.coalesce(1).write \
+            .option("partitionOverwriteMode", "dynamic" if dynamic else "static") \
+            .parquet(quarantine_path, mode='overwrite', partitionBy=partition_by)
+    df_malformed.unpersist()
+    return count
+
+
+def decode(column: str, table: str = None) -> Column:
+    """
+    Decode values of the column with the code table (of the same name by default) from schemas.py.
+    The table is a map literal, so decoding is one hash lookup per row instead of a chain of conditions.
+    """
+    codes, default = CODE_TABLES[table or column]
+    code_map = F.create_map(*[F.lit(value) for item in codes.items() for value in item])
+    decoded = code_map[F.col(column)]
+    return decoded if default is None else F.coalesce(decoded, F.lit(default))
+
+
+def model_column(name: str, source) -> Column:
+    """Build the column of the model from its source in schemas.py: a raw column or a derivation"""
+    if isinstance(source, str):
+        return F.col(f"`{source}`").alias(name)
+    kind, column, *args = source
+    if kind == "timestamp":
+        return F.to_timestamp(column, args[0]).alias(name)
+    if kind == "date":
+        return F.to_date(column, args[0]).alias(name)
+    if kind == "decode":
+        return decode(column, name).alias(name)
+    if kind == "expr":
+        return F.expr(column).alias(name)
+    raise ValueError(f"Unknown source of column {name}: {source}")
+
+
+def project(df: DataFrame, city: str) -> DataFrame:
+    """Rename and derive columns of the city's model in one select, so the plan is built and analyzed once"""
+    return df.select(*[model_column(name, source) for name, source, _ in SOURCES[city]["model"]])
+
+
+def read_csv(spark: SparkSession, schema: types.StructType, input_path: str, corrupt_column: str = None) -> DataFrame:
+    """Read csv data using schema, with corrupt_column the raw text of rows which don't match the schema is kept in it"""
     print(f"Read csv data {input_path}")
-    df = spark.read \
+    reader = spark.read \
         .option("header", "true") \
-        .option("inferSchema", "false") \
+        .option("inferSchema", "false")
+    if corrupt_column:
+        schema = types.StructType(schema.fields + [types.StructField(corrupt_column, types.StringType(), True)])
+        reader = reader.option("columnNameOfCorruptRecord", corrupt_column)
+    df = reader \
         .schema(schema) \
         .csv(input_path)
     return df
@@ -27,348 +144,692 @@ def read_parquet(spark: SparkSession, input_path: str) -> DataFrame:
     return df
 
 
-def write_parquet(df: DataFrame, output_path: str, partitions_num: int) -> None:
-    """Write data to parquet with repartitioning"""
-    print(f"Write parquet data {output_path}")
-    df \
-        .repartition(partitions_num) \
-        .write.parquet(output_path, mode='overwrite')
+def estimated_size(df: DataFrame) -> int:
+    """Return size of the data in bytes estimated by Spark optimizer, for files it's the size of input files"""
+    return int(str(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes()))
+
+
+def write_parquet(df: DataFrame, output_path: str, partitions_num: int,
+                  target_file_bytes: int = None, partition_by: list = None,
+                  sort_by: list = None, options: dict = None) -> None:
+    """
+    Write data to parquet with repartitioning.
+    With target_file_bytes the number of files is estimated from the size of the data instead of partitions_num,
+    partitions are merged with coalesce if there are more of them, so the data isn't shuffled.
+    partition_by columns are written as directories (year=2023/month=5/) for partition pruning,
+    rows of each directory are written by one task.
+    sort_by columns sort rows within files and options are Parquet writer options, see parquet_layout.
+    """
+    if target_file_bytes:
+        partitions_num = math.ceil(estimated_size(df) / target_file_bytes) or 1
+    print(f"Write parquet data {output_path} in {partitions_num} partitions")
+    if partition_by:
+        df = df.repartition(partitions_num, *partition_by)
+    elif target_file_bytes and partitions_num <= df.rdd.getNumPartitions():
+        df = df.coalesce(partitions_num)
+    else:
+        df = df.repartition(partitions_num)
+    if sort_by:
+        # the writer needs rows ordered by partition columns, otherwise it sorts them again
+        df = df.sortWithinPartitions(*(partition_by or []), *sort_by)
+    df.write.options(**(options or {})).parquet(output_path, mode='overwrite', partitionBy=partition_by)
+
+
+def parquet_layout(city: str, layout: str = None, compression: str = None,
+                   row_group_bytes: int = PARQUET_ROW_GROUP_BYTES, page_bytes: int = PARQUET_PAGE_BYTES) -> dict:
+    """
+    Return sort_by and options of write_parquet for the layout of the city's lake.
+    The 'sorted' layout sorts rows within files by the crime date and code from schemas.py,
+    so low-cardinality columns get long runs in dictionary-encoded pages,
+    with explicit dictionary encoding, row group and page sizes.
+    compression ('snappy' or 'zstd') is used with any layout.
+    """
+    options = {"compression": compression} if compression else {}
+    if layout != "sorted":
+        return {"options": options}
+    column, date_format = SOURCES[city]["date_column"]
+    return {
+        "sort_by": [F.to_date(F.col(column), date_format), *SOURCES[city]["sort_columns"]],
+        "options": {
+            **options,
+            "parquet.enable.dictionary": "true",
+            "parquet.block.size": str(row_group_bytes),
+            "parquet.page.size": str(page_bytes),
+        },
+    }
+
+
+def add_date_partitions(df: DataFrame, city: str, partition_by: str) -> DataFrame:
+    """Add year (and month for partition_by 'month') columns of the crime date to raw data of the city"""
+    column, date_format = SOURCES[city]["date_column"]
+    crime_date = F.to_date(F.col(column), date_format)
+    df = df.withColumn("year", F.year(crime_date))
+    if partition_by == "month":
+        df = df.withColumn("month", F.month(crime_date))
+    return df
 
 
-def write_to_bigquery(df: DataFrame, output: str, partition_column: str) -> None:
-    """Saving the data to BigQuery"""
+def date_partition_columns(partition_by: str) -> list:
+    """Return partition columns of the lake for partition_by 'year' or 'month'"""
+    if partition_by is None:
+        return None
+    return ["year", "month"] if partition_by == "month" else ["year"]
+
+
+def write_parquet_by_year(df: DataFrame, output_path: str, partitions_num: int, dynamic: bool = False,
+                          sort_by: list = None, options: dict = None) -> None:
+    """
+    Write data to parquet partitioned by year (output_path/year=2023/).
+    Rows are hash-partitioned by year, so every year is written by one task into one file
+    and small years don't produce tiny files. Range partitioning would sample the data with
+    an extra job, scanning the CSV again and counting observed parse stats twice.
+    With dynamic only directories of the written years are replaced.
+    sort_by and options set the layout of files like in write_parquet.
+    """
+    print(f"Write parquet data {output_path} in {partitions_num} partitions")
+    df = df \
+        .repartition(partitions_num, "year") \
+        .sortWithinPartitions("year", *(sort_by or []))
+    df \
+        .write \
+        .options(**(options or {})) \
+        .partitionBy("year") \
+        .option("partitionOverwriteMode", "dynamic" if dynamic else "static") \
+        .parquet(output_path, mode='overwrite')
+
+
+def write_to_bigquery(df: DataFrame, output: str, partition_column: str,
+                      partition_overwrite: bool = False, write_method: str = None,
+                      cluster_columns: list = None) -> None:
+    """
+    Saving the data to BigQuery partitioned by month of partition_column and clustered by cluster_columns.
+    With partition_overwrite only the month partitions present in df are replaced,
+    other partitions of the table are kept.
+    write_method 'direct' writes with the Storage Write API without staging files in temporaryGcsBucket,
+    'indirect' loads staged files, the method of the session (--bq_write_method) is used by default.
+    """
     print(f"Write to BigQuery {output}")
-    df.write.format('bigquery') \
+    writer = df.write.format('bigquery')
+    if write_method:
+        writer = writer.option('writeMethod', write_method)
+    writer = writer \
         .option('table', output) \
         .option('partitionType', 'MONTH') \
-        .option('partitionField', partition_column) \
-        .option('clustering', partition_column) \
+        .option('partitionField', partition_column)
+    if cluster_columns:
+        writer = writer.option('clusteredFields', ",".join(cluster_columns))
+    if partition_overwrite:
+        writer = writer.option('spark.sql.sources.partitionOverwriteMode', 'DYNAMIC')
+    writer \
         .mode("overwrite") \
         .save()
 
 
-def csv_to_parquet_aus(spark: SparkSession, input_path: str, output_path: str) -> None:
-    """Read data from csv and save to parquet for Austin"""
+def observe_parse_stats(df: DataFrame, city: str, files: list) -> tuple:
+    """
+    Count rows, malformed rows and nulls of raw columns of every input file of the city
+    while the DataFrame is written. Metrics are collected by the write itself, so there is no extra scan.
+    The DataFrame must be written by one job: a job sampling the data before the write
+    (like repartitionByRange) executes the observed plan too and its rows are counted again.
+    df must have CORRUPT_RECORD_COLUMN, the column is dropped from the returned DataFrame.
+    :return: DataFrame and its Observation
+    """
+    source_file = F.col("_source_file")
+    malformed = malformed_values(city, CORRUPT_RECORD_COLUMN)
+    metrics = []
+    for i, name in enumerate(files):
+        in_file = source_file == name
+        metrics.append(F.count_if(in_file).alias(f"rows_{i}"))
+        metrics.append(F.count_if(in_file & malformed).alias(f"malformed_{i}"))
+        metrics += [F.count_if(in_file & F.col(f"`{column}`").isNull()).alias(f"nulls_{i}_{j}")
+                    for j, (column, _) in enumerate(read_columns(city))]
+
+    observation = Observation(f"parse_stats_{city}")
+    # input_file_name() is non-deterministic, observed metrics can only use it as a column
+    df = df \
+        .withColumn("_source_file", F.element_at(F.split(F.input_file_name(), "/"), -1)) \
+        .observe(observation, *metrics) \
+        .drop("_source_file", CORRUPT_RECORD_COLUMN)
+    return df, observation
+
+
+def parse_stats(observation: Observation, city: str, files: list) -> dict:
+    """
+    Return file name -> rows, malformed rows and null rates of raw columns (only non-zero ones)
+    from the observation of a finished write
+    """
+    metrics = observation.get
+    stats = {}
+    for i, name in enumerate(files):
+        rows = metrics[f"rows_{i}"]
+        null_rates = {column: round(metrics[f"nulls_{i}_{j}"] / rows, 4)
+                      for j, (column, _) in enumerate(read_columns(city)) if rows and metrics[f"nulls_{i}_{j}"]}
+        stats[name] = {"rows": rows, "malformed": metrics[f"malformed_{i}"], "null_rate": null_rates}
+    return stats
+
+
+def read_parse_stats(spark: SparkSession, output_path: str):
+    """Read the parse stats manifest of the Parquet output, None if there isn't one"""
+    fs, hpath = hadoop_path(spark, f"{output_path.rstrip('/')}/{PARSE_STATS_FILE}")
+    if not fs.exists(hpath):
+        return None
+    stream = fs.open(hpath)
+    try:
+        return json.loads(spark.sparkContext._jvm.org.apache.commons.io.IOUtils.toString(stream, "UTF-8"))
+    finally:
+        stream.close()
+
+
+def write_parse_stats(spark: SparkSession, output_path: str, stats: dict, merge: bool = False) -> None:
+    """Save the parse stats as a compact JSON manifest inside the Parquet output, with merge other files are kept"""
+    if merge:
+        stats = {**(read_parse_stats(spark, output_path) or {}), **stats}
+    path = f"{output_path.rstrip('/')}/{PARSE_STATS_FILE}"
+    print(f"Write parse stats of {len(stats)} files to {path}")
+    fs, hpath = hadoop_path(spark, path)
+    stream = fs.create(hpath, True)
+    try:
+        stream.write(bytearray(json.dumps(stats, sort_keys=True, separators=(",", ":")).encode("utf-8")))
+    finally:
+        stream.close()
+
+
+def check_parse_stats(spark: SparkSession, df_raw: DataFrame, city: str, observation: Observation, files: list,
+                      output_path: str, quarantine_path: str = None, partition_by: list = None,
+                      dynamic: bool = False) -> dict:
+    """
+    Save the parse stats of the written files next to the Parquet output and print malformed rows.
+    Raw data is scanned again only if there are malformed rows to quarantine.
+    """
+    stats = parse_stats(observation, city, files)
+    write_parse_stats(spark, output_path, stats, merge=dynamic)
+    malformed = sum(file_stats["malformed"] for file_stats in stats.values())
+    if malformed:
+        print(f"{malformed} malformed rows in {', '.join(name for name in stats if stats[name]['malformed'])}")
+        if quarantine_path:
+            quarantine_malformed(df_raw, city, quarantine_path, partition_by, dynamic, CORRUPT_RECORD_COLUMN)
+    return stats
+
+
+def hadoop_path(spark: SparkSession, path: str):
+    """Return Hadoop FileSystem and Path for path (gs:// or local)"""
+    hpath = spark.sparkContext._jvm.org.apache.hadoop.fs.Path(path)
+    return hpath.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration()), hpath
+
+
+def read_watermark(spark: SparkSession, path: str):
+    """Read the high-water mark saved by write_watermark, None if there isn't one yet"""
+    fs, hpath = hadoop_path(spark, path)
+    if not fs.exists(hpath):
+        return None
+    return spark.read.json(path).first()["watermark"]
+
+
+def write_watermark(spark: SparkSession, path: str, watermark) -> None:
+    """Save the high-water mark as JSON beside the data lake"""
+    print(f"Write watermark {watermark} to {path}")
+    spark.createDataFrame([(str(watermark),)], ["watermark"]) \
+        .coalesce(1) \
+        .write.json(path, mode='overwrite')
+
+
+def incremental_months(df: DataFrame, watermark_column: str, partition_column: str, watermark) -> tuple:
+    """
+    Return the new high-water mark of watermark_column and the months (by partition_column) which have rows
+    on or after the watermark, both are computed by one aggregation and collected to the driver.
+    The mark is None if there are no rows, months are None without the watermark.
+    """
+    aggregations = [F.max(watermark_column)]
+    if watermark is not None:
+        reported = F.col(watermark_column) >= F.lit(watermark).cast(types.DateType())
+        aggregations.append(F.collect_set(F.when(reported, F.trunc(partition_column, "month"))))
+    row = df.agg(*aggregations).first()
+    return row[0], sorted(row[1]) if watermark is not None else None
+
+
+def select_incremental(df: DataFrame, partition_column: str, months: list) -> DataFrame:
+    """
+    Return all rows of the months (by partition_column) from incremental_months.
+    Whole months are returned, because they replace month partitions.
+    """
+    return df.filter(F.trunc(partition_column, "month").isin(months))
+
+
+def write_to_bigquery_incremental(spark: SparkSession, df: DataFrame, output: str, partition_column: str,
+                                  watermark_column: str, watermark_path: str, cluster_columns: list = None) -> None:
+    """
+    Saving to BigQuery only the months affected by rows reported since the last run.
+    The high-water mark of watermark_column is saved to watermark_path after the write,
+    the table is overwritten completely if there is no mark yet.
+    Without rows or affected months neither the table nor the mark is changed.
+    """
+    watermark = read_watermark(spark, watermark_path)
+    new_watermark, months = incremental_months(df, watermark_column, partition_column, watermark)
+    if new_watermark is None:
+        print(f"No rows to write to {output}, the watermark is kept")
+        return
+    if watermark is None:
+        print(f"No watermark in {watermark_path}, {output} is overwritten")
+        write_to_bigquery(df, output, partition_column, cluster_columns=cluster_columns)
+    elif not months:
+        print(f"No rows with {watermark_column} since {watermark}, {output} is kept")
+        return
+    else:
+        print(f"Write rows of {len(months)} months with {watermark_column} since {watermark} to {output}")
+        write_to_bigquery(select_incremental(df, partition_column, months),
+                          output, partition_column, partition_overwrite=True, cluster_columns=cluster_columns)
+    write_watermark(spark, watermark_path, new_watermark)
+
+
+def csv_to_parquet_aus(spark: SparkSession, input_path: str, output_path: str, persist: bool = False,
+                       target_file_bytes: int = None, partition_by: str = None,
+                       quarantine_path: str = None, layout: dict = None) -> DataFrame:
+    """Read data from csv and save to parquet for Austin,
+        with persist the parsed data is kept for the next stage.
+        partition_by 'year' or 'month' of the crime date partitions the lake.
+        Parse stats of the files are saved with the lake, malformed rows are written to quarantine_path.
+        layout is sort order and writer options of Parquet files from parquet_layout"""
     print(f"Processing data for AUSTIN")
-    # Schema for Austin Crime data
-    df_aus_schema = types.StructType([
-        types.StructField('Incident_Number', types.LongType(), True),
-        types.StructField('Highest_Offense_Description', types.StringType(), True),
-        types.StructField('Highest_Offense_Code', types.IntegerType(), True),
-        types.StructField('Family_Violence', types.StringType(), True),
-        types.StructField('Occurred_Date_Time', types.StringType(), True),
-        types.StructField('Occurred_Date', types.StringType(), True),
-        types.StructField('Occurred_Time', types.StringType(), True),
-        types.StructField('Report_Date_Time', types.StringType(), True),
-        types.StructField('Report_Date', types.StringType(), True),
-        types.StructField('Report_Time', types.StringType(), True),
-        types.StructField('Location_Type', types.StringType(), True),
-        types.StructField('Address', types.StringType(), True),
-        types.StructField('Zip_Code', types.IntegerType(), True),
-        types.StructField('Council_District', types.IntegerType(), True),
-        types.StructField('APD_Sector', types.StringType(), True),
-        types.StructField('APD_District', types.StringType(), True),
-        types.StructField('PRA', types.IntegerType(), True),
-        types.StructField('Census_Tract', types.DoubleType(), True),
-        types.StructField('Clearance_Status', types.StringType(), True),
-        types.StructField('Clearance_Date', types.StringType(), True),
-        types.StructField('UCR_Category', types.StringType(), True),
-        types.StructField('Category_Description', types.StringType(), True),
-        types.StructField('X-coordinate', types.IntegerType(), True),
-        types.StructField('Y-coordinate', types.IntegerType(), True),
-        types.StructField('Latitude', types.DoubleType(), True),
-        types.StructField('Longitude', types.DoubleType(), True),
-        types.StructField('Location', types.StringType(), True)
-    ])
-
-    df_aus = read_csv(spark, df_aus_schema, input_path)
-    write_parquet(df_aus, output_path, 24)
+    files = input_files(spark, input_path)
+    df_raw = read_csv(spark, spark_schema("aus"), input_path, CORRUPT_RECORD_COLUMN)
+    df_aus = add_date_partitions(df_raw, "aus", partition_by) if partition_by else df_raw
+    # names of input files are taken before the data is persisted, input_file_name() of cached data is empty
+    df_aus, observation = observe_parse_stats(df_aus, "aus", files)
+    if persist:
+        df_aus = df_aus.persist(StorageLevel.MEMORY_AND_DISK)
+    write_parquet(df_aus, output_path, 24, target_file_bytes, date_partition_columns(partition_by),
+                  **(layout or {}))
+    check_parse_stats(spark, df_raw, "aus", observation, files, output_path, quarantine_path)
+    return df_aus
 
 
 def modify_aus(df: DataFrame) -> DataFrame:
     """Modify columns for AUSTIN"""
     print(f"Modify columns for AUSTIN")
-    # To convert fields like 'Occurred_Date_Time' to Timestamp format
-    timestamp_format = "MM/dd/yyyy hh:mm:ss a"
-    # To convert fields like 'Occurred_Date' to Date format
-    date_format = "MM/dd/yyyy"
-
-    # for filling field 'clearance_status'
-    new_clearance_status = (F.when(F.col("clearance_status") == "C", "Arrested") \
-                            .when(F.col("clearance_status") == "O", "Exception") \
-                            .when(F.col("clearance_status") == "N", "Not cleared") \
-                            .otherwise(None))
-
-    df_dt = df \
-        .withColumnRenamed("Incident_Number", "incident_num") \
-        .withColumnRenamed("Highest_Offense_Description", "crime_description") \
-        .withColumnRenamed("Highest_Offense_Code", "crime_code") \
-        .withColumnRenamed("Family_Violence", "family_violence") \
-        .withColumnRenamed("Location_Type", "location_type") \
-        .withColumnRenamed("Address", "address") \
-        .withColumnRenamed("Zip_Code", "zip_code") \
-        .withColumnRenamed("Council_District", "council_district") \
-        .withColumnRenamed("APD_Sector", "apd_sector") \
-        .withColumnRenamed("APD_District", "apd_district") \
-        .withColumnRenamed("PRA", "pra") \
-        .withColumnRenamed("Census_Tract", "census_tract") \
-        .withColumnRenamed("Clearance_Status", "clearance_status") \
-        .withColumnRenamed("UCR_Category", "ucr_category") \
-        .withColumnRenamed("Category_Description", "category_description") \
-        .withColumn("crime_datetime", F.to_timestamp("Occurred_Date_Time", timestamp_format)) \
-        .withColumn("crime_date", F.to_date("Occurred_Date", date_format)) \
-        .withColumn("report_datetime", F.to_timestamp("Report_Date_Time", timestamp_format)) \
-        .withColumn("report_date", F.to_date("Report_Date", date_format)) \
-        .withColumn("clearance_date", F.to_date("Clearance_Date", date_format)) \
-        .withColumn("clearance_status", new_clearance_status) \
-        .select("incident_num", "crime_datetime", "crime_date", \
-                "report_datetime", "report_date", "crime_code", \
-                "crime_description", "family_violence", "location_type", \
-                "address", "zip_code", "council_district", \
-                "apd_sector", "apd_district", "pra", \
-                "census_tract", "clearance_status", "clearance_date", \
-                "ucr_category", "category_description")
-    return df_dt
-
-
-def csv_to_parquet_la(spark: SparkSession, input_path: str, output_path: str) -> None:
-    """Read data from csv and save to parquet for Los Angeles"""
-    print(f"Processing data for LOS ANGELES")
-    # Schema for Los Angeles Crime data
-    df_la_schema = types.StructType([
-        types.StructField('DR_NO', types.IntegerType(), True),
-        types.StructField('Date_Rptd', types.StringType(), True),
-        types.StructField('DATE_OCC', types.StringType(), True),
-        types.StructField('TIME_OCC', types.StringType(), True),
-        types.StructField('AREA', types.IntegerType(), True),
-        types.StructField('AREA_NAME', types.StringType(), True),
-        types.StructField('Rpt_Dist_No', types.IntegerType(), True),
-        types.StructField('Part_1-2', types.IntegerType(), True),
-        types.StructField('Crm_Cd', types.IntegerType(), True),
-        types.StructField('Crm_Cd_Desc', types.StringType(), True),
-        types.StructField('Mocodes', types.StringType(), True),
-        types.StructField('Vict_Age', types.IntegerType(), True),
-        types.StructField('Vict_Sex', types.StringType(), True),
-        types.StructField('Vict_Descent', types.StringType(), True),
-        types.StructField('Premis_Cd', types.IntegerType(), True),
-        types.StructField('Premis_Desc', types.StringType(), True),
-        types.StructField('Weapon_Used_Cd', types.IntegerType(), True),
-        types.StructField('Weapon_Desc', types.StringType(), True),
-        types.StructField('Status', types.StringType(), True),
-        types.StructField('Status_Desc', types.StringType(), True),
-        types.StructField('Crm_Cd_1', types.IntegerType(), True),
-        types.StructField('Crm_Cd_2', types.IntegerType(), True),
-        types.StructField('Crm_Cd_3', types.IntegerType(), True),
-        types.StructField('Crm_Cd_4', types.IntegerType(), True),
-        types.StructField('LOCATION', types.StringType(), True),
-        types.StructField('Cross_Street', types.StringType(), True),
-        types.StructField('LAT', types.DoubleType(), True),
-        types.StructField('LON', types.DoubleType(), True)
-    ])
+    return project(df, "aus")
 
-    df_la = read_csv(spark, df_la_schema, input_path)
-    write_parquet(df_la, output_path, 24)
+
+def csv_to_parquet_la(spark: SparkSession, input_path: str, output_path: str, persist: bool = False,
+                       target_file_bytes: int = None, partition_by: str = None,
+                       quarantine_path: str = None, layout: dict = None) -> DataFrame:
+    """Read data from csv and save to parquet for Los Angeles,
+        with persist the parsed data is kept for the next stage.
+        partition_by 'year' or 'month' of the crime date partitions the lake.
+        Parse stats of the files are saved with the lake, malformed rows are written to quarantine_path.
+        layout is sort order and writer options of Parquet files from parquet_layout"""
+    print(f"Processing data for LOS ANGELES")
+    files = input_files(spark, input_path)
+    df_raw = read_csv(spark, spark_schema("la"), input_path, CORRUPT_RECORD_COLUMN)
+    df_la = add_date_partitions(df_raw, "la", partition_by) if partition_by else df_raw
+    # names of input files are taken before the data is persisted, input_file_name() of cached data is empty
+    df_la, observation = observe_parse_stats(df_la, "la", files)
+    if persist:
+        df_la = df_la.persist(StorageLevel.MEMORY_AND_DISK)
+    write_parquet(df_la, output_path, 24, target_file_bytes, date_partition_columns(partition_by),
+                  **(layout or {}))
+    check_parse_stats(spark, df_raw, "la", observation, files, output_path, quarantine_path)
+    return df_la
 
 
 def modify_la(df: DataFrame) -> DataFrame:
     """Modify columns for LOS ANGELES"""
     print(f"Modify columns for LOS ANGELES")
-    # To convert fields like 'Occurred_Date_Time' to Timestamp format
-    timestamp_format = "MM/dd/yyyy hh:mm:ss a"
-    # To convert fields like 'crime_datetime' to Timestamp format
-    date_time_format = "yyyy-MM-dd HH:mm:ss"
-
-    # for filling field 'vict_sex'
-    new_vict_sex = (F.when(F.col("vict_sex") == "F", "Female") \
-                    .when(F.col("vict_sex") == "M", "Male") \
-                    .when(F.col("vict_sex") == "X", "Unknown") \
-                    .otherwise("Unknown"))
-
-    # for filling field 'vict_descent'
-    new_vict_descent = (F.when(F.col("vict_descent") == "A", "Other Asian") \
-                        .when(F.col("vict_descent") == "B", "Black") \
-                        .when(F.col("vict_descent") == "C", "Chinese") \
-                        .when(F.col("vict_descent") == "D", "Cambodian") \
-                        .when(F.col("vict_descent") == "F", "Filipino") \
-                        .when(F.col("vict_descent") == "G", "Guamanian") \
-                        .when(F.col("vict_descent") == "H", "Hispanic/Latin/Mexican") \
-                        .when(F.col("vict_descent") == "I", "American Indian/Alaskan Native") \
-                        .when(F.col("vict_descent") == "J", "Japanese") \
-                        .when(F.col("vict_descent") == "K", "Korean") \
-                        .when(F.col("vict_descent") == "L", "Laotian") \
-                        .when(F.col("vict_descent") == "O", "Other") \
-                        .when(F.col("vict_descent") == "P", "Pacific Islander") \
-                        .when(F.col("vict_descent") == "S", "Samoan") \
-                        .when(F.col("vict_descent") == "U", "Hawaiian") \
-                        .when(F.col("vict_descent") == "V", "Vietnamese") \
-                        .when(F.col("vict_descent") == "W", "White") \
-                        .when(F.col("vict_descent") == "X", "Unknown") \
-                        .when(F.col("vict_descent") == "Z", "Asian Indian") \
-                        .otherwise("Unknown"))
-
-    df_dt = df \
-        .withColumnRenamed("DR_NO", "incident_num") \
-        .withColumnRenamed("Crm_Cd_Desc", "crime_description") \
-        .withColumnRenamed("Crm_Cd", "crime_code") \
-        .withColumnRenamed("AREA", "area_code") \
-        .withColumnRenamed("AREA_NAME", "area_name") \
-        .withColumnRenamed("Rpt_Dist_No", "rpt_dist_num") \
-        .withColumnRenamed("Part_1-2", "part_1_2") \
-        .withColumnRenamed("Mocodes", "mocodes") \
-        .withColumnRenamed("Vict_Age", "vict_age") \
-        .withColumnRenamed("Vict_Sex", "vict_sex") \
-        .withColumnRenamed("Vict_Descent", "vict_descent") \
-        .withColumnRenamed("Premis_Cd", "premis_code") \
-        .withColumnRenamed("Premis_Desc", "premis_description") \
-        .withColumnRenamed("Weapon_Used_Cd", "weapon_used_code") \
-        .withColumnRenamed("Weapon_Desc", "weapon_description") \
-        .withColumnRenamed("Status", "status") \
-        .withColumnRenamed("Status_Desc", "status_description") \
-        .withColumnRenamed("Crm_Cd_1", "crime_code_1") \
-        .withColumnRenamed("Crm_Cd_2", "crime_code_2") \
-        .withColumnRenamed("Crm_Cd_3", "crime_code_3") \
-        .withColumnRenamed("Crm_Cd_4", "crime_code_4") \
-        .withColumnRenamed("LOCATION", "location") \
-        .withColumnRenamed("Cross_Street", "cross_street") \
-        .withColumnRenamed("LAT", "latitude") \
-        .withColumnRenamed("LON", "longtitude") \
-        .withColumn("report_date", F.to_date("Date_Rptd", timestamp_format)) \
-        .withColumn("crime_date", F.to_date("DATE_OCC", timestamp_format)) \
-        .withColumn("crime_datetime", F.concat(F.col("crime_date"), \
-                                               F.lit(" "), \
-                                               F.col("TIME_OCC").substr(1, 2), \
-                                               F.lit(":"), \
-                                               F.col("TIME_OCC").substr(3, 2), \
-                                               F.lit(":00"))) \
-        .withColumn("crime_datetime", F.to_timestamp(F.col("crime_datetime"), date_time_format)) \
-        .withColumn("vict_sex", new_vict_sex) \
-        .withColumn("vict_descent", new_vict_descent) \
-        .select("incident_num", "crime_datetime", "crime_date", \
-                "report_date", "crime_code", "crime_description", \
-                "area_code", "area_name", "rpt_dist_num", \
-                "part_1_2", "mocodes", "vict_age", \
-                "vict_sex", "vict_descent", "premis_code", \
-                "premis_description", "weapon_used_code", "weapon_description", \
-                "status", "status_description", "crime_code_1", \
-                "crime_code_2", "crime_code_3", "crime_code_4", \
-                "location", "cross_street", "latitude", \
-                "longtitude")
-    return df_dt
-
-
-def csv_to_parquet_sd(spark: SparkSession, input_path: str, output_path: str) -> None:
-    """Read data from csv and save to parquet for San Diego"""
-    print(f"Processing data for SAN DIEGO")
-    # Schema for San Diego Crime data
-    df_sd_schema = types.StructType([
-        types.StructField('incident_num', types.StringType(), True),
-        types.StructField('date_time', types.TimestampType(), True),
-        types.StructField('day_of_week', types.IntegerType(), True),
-        types.StructField('address_number_primary', types.IntegerType(), True),
-        types.StructField('address_dir_primary', types.StringType(), True),
-        types.StructField('address_road_primary', types.StringType(), True),
-        types.StructField('address_sfx_primary', types.StringType(), True),
-        types.StructField('address_dir_intersecting', types.StringType(), True),
-        types.StructField('address_road_intersecting', types.StringType(), True),
-        types.StructField('address_sfx_intersecting', types.StringType(), True),
-        types.StructField('call_type', types.StringType(), True),
-        types.StructField('disposition', types.StringType(), True),
-        types.StructField('beat', types.DoubleType(), True),
-        types.StructField('priority', types.DoubleType(), True)
-    ])
+    return project(df, "la")
 
-    df_sd = read_csv(spark, df_sd_schema, input_path)
-    # Some values have Double type, need to convert
-    df_sd = df_sd \
-        .withColumn("beat", F.col("beat").cast(types.IntegerType())) \
-        .withColumn("priority", F.col("priority").cast(types.IntegerType()))
 
-    write_parquet(df_sd, output_path, 4)
+def csv_to_parquet_sd(spark: SparkSession, input_path_sd: str, output_path: str, years: list = None,
+                      persist: bool = False, target_file_bytes: int = SD_INPUT_BYTES_PER_FILE,
+                      quarantine_path: str = None, layout: dict = None) -> DataFrame:
+    """Read CSV files of all years (or only of the years) in one scan and save to parquet
+        partitioned by year for San Diego, with persist the parsed data is kept for the next stage.
+        Parse stats of the files are saved with the lake, rows with malformed values
+        (like beat or priority) are written to quarantine_path with raw values.
+        layout is sort order and writer options of Parquet files from parquet_layout"""
+    print(f"Processing data for SAN DIEGO")
+    input_path = f"{input_path_sd}sd_{years_glob(years) if years else '*'}.csv"
+    files = input_files(spark, input_path)
+    df_raw = read_csv(spark, spark_schema("sd"), input_path, CORRUPT_RECORD_COLUMN) \
+        .withColumn("year", F.regexp_extract(F.input_file_name(), r"sd_(\d{4})\.csv", 1).cast(types.IntegerType()))
+    df_observed, observation = observe_parse_stats(df_raw, "sd", files)
+    # Some values have Double type like 521.0, they are parsed to integers in the same select
+    df_sd = df_observed.select(*parse_raw_columns("sd"), "year")
+    if persist:
+        df_sd = df_sd.persist(StorageLevel.MEMORY_AND_DISK)
+
+    partitions_num = math.ceil(input_size(spark, input_path) / target_file_bytes) or 1
+    write_parquet_by_year(df_sd, output_path, partitions_num, bool(years), **(layout or {}))
+    check_parse_stats(spark, df_raw, "sd", observation, files, output_path, quarantine_path, ["year"], bool(years))
+    return df_sd
 
 
 def modify_sd(df: DataFrame) -> DataFrame:
     """Modify columns for SAN DIEGO"""
     print(f"Modify columns for SAN DIEGO")
-    # To convert fields like 'crime_date_time' to Date format
-    date_time_format = "yyyy-MM-dd HH:mm:ss"
-
-    df_dt = df \
-        .withColumnRenamed("date_time", "crime_datetime") \
-        .withColumn("incident_num", F.expr("substring(incident_num, 2, length(incident_num) - 1)")) \
-        .withColumn("crime_date", F.to_date("crime_datetime", date_time_format)) \
-        .select("incident_num", "crime_datetime", "crime_date", \
-                "day_of_week", "address_number_primary", "address_dir_primary", \
-                "address_road_primary", "address_sfx_primary", "address_dir_intersecting", \
-                "address_road_intersecting", "address_sfx_intersecting", "call_type", \
-                "disposition", "beat", "priority")
-    return df_dt
-
-
-def parquet_to_bq_aus(spark: SparkSession, input_path: str, output_bq: str):
-    """Read data from parquet, modify columns and
-        save to BigQuery for Austin using daily partitioning by crime_date column"""
+    return project(df, "sd")
+
+
+def parquet_to_bq_aus(spark: SparkSession, input_path: str, output_bq: str, watermark_path: str = None,
+                      cluster_columns: list = None):
+    """Read data from parquet, modify columns and save to BigQuery for Austin"""
     df_aus = read_parquet(spark, input_path)
-    df_modify_aus = modify_aus(df_aus)
-    write_to_bigquery(df_modify_aus, output_bq, "crime_date")
+    load_to_bq_aus(spark, df_aus, output_bq, watermark_path, cluster_columns)
 
 
-def parquet_to_bq_la(spark: SparkSession, input_path: str, output_bq: str):
-    """Read data from parquet, modify columns and
-        save to BigQuery for Los Angeles using daily partitioning by crime_date column"""
+def load_to_bq_aus(spark: SparkSession, df_aus: DataFrame, output_bq: str, watermark_path: str = None,
+                   cluster_columns: list = None):
+    """Modify columns and save to BigQuery for Austin partitioned and clustered by columns from schemas.py,
+        cluster_columns replace the default ones.
+        With watermark_path only months with rows reported since the last run are replaced"""
+    df_modify_aus = modify_aus(df_aus)
+    partition_column = SOURCES["aus"]["partition_column"]
+    cluster_columns = cluster_columns or SOURCES["aus"]["cluster_columns"]
+    if watermark_path:
+        write_to_bigquery_incremental(spark, df_modify_aus, output_bq, partition_column, "report_date",
+                                      watermark_path, cluster_columns)
+    else:
+        write_to_bigquery(df_modify_aus, output_bq, partition_column, cluster_columns=cluster_columns)
+
+
+def parquet_to_bq_la(spark: SparkSession, input_path: str, output_bq: str, watermark_path: str = None,
+                      cluster_columns: list = None):
+    """Read data from parquet, modify columns and save to BigQuery for Los Angeles"""
     df_la = read_parquet(spark, input_path)
-    df_modify_la = modify_la(df_la)
-    write_to_bigquery(df_modify_la, output_bq, "crime_date")
+    load_to_bq_la(spark, df_la, output_bq, watermark_path, cluster_columns)
 
 
-def parquet_to_bq_sd(spark: SparkSession, input_path: str, output_bq: str):
-    """Read data from parquet, modify columns and
-        save to BigQuery for San Diego using daily partitioning by crime_date column"""
+def load_to_bq_la(spark: SparkSession, df_la: DataFrame, output_bq: str, watermark_path: str = None,
+                   cluster_columns: list = None):
+    """Modify columns and save to BigQuery for Los Angeles partitioned and clustered by columns from schemas.py,
+        cluster_columns replace the default ones.
+        With watermark_path only months with rows reported since the last run are replaced"""
+    df_modify_la = modify_la(df_la)
+    partition_column = SOURCES["la"]["partition_column"]
+    cluster_columns = cluster_columns or SOURCES["la"]["cluster_columns"]
+    if watermark_path:
+        write_to_bigquery_incremental(spark, df_modify_la, output_bq, partition_column, "report_date",
+                                      watermark_path, cluster_columns)
+    else:
+        write_to_bigquery(df_modify_la, output_bq, partition_column, cluster_columns=cluster_columns)
+
+
+def parquet_to_bq_sd(spark: SparkSession, input_path: str, output_bq: str, partition_overwrite: bool = False,
+                     cluster_columns: list = None):
+    """Read data from parquet, modify columns and save to BigQuery for San Diego"""
     df_sd = read_parquet(spark, input_path)
-    df_modify_sd = modify_sd(df_sd)
-    write_to_bigquery(df_modify_sd, output_bq, "crime_date")
+    load_to_bq_sd(spark, df_sd, output_bq, partition_overwrite, cluster_columns)
 
 
-def main(params):
-    # Create a Spark session
-    spark = SparkSession.builder \
-        .appName('crime-reports-data-app') \
-        .getOrCreate()
-
-    # temp bucket for saving to BigQuery
-    spark.conf.set('temporaryGcsBucket', params.temp_gcs_bucket)
-
-    # Austin
-    input_path_aus = params.input_path_aus
-    output_path_aus = params.output_path_aus
-    output_bq_aus = params.output_bq_aus
-    csv_to_parquet_aus(spark, input_path_aus, output_path_aus)
-
-    # Los Angeles
-    input_path_la = params.input_path_la
-    output_path_la = params.output_path_la
-    output_bq_la = params.output_bq_la
-    csv_to_parquet_la(spark, input_path_la, output_path_la)
-
-    # San Diego
+def load_to_bq_sd(spark: SparkSession, df_sd: DataFrame, output_bq: str, partition_overwrite: bool = False,
+                  cluster_columns: list = None):
+    """Modify columns and save to BigQuery for San Diego partitioned and clustered by columns from schemas.py,
+        cluster_columns replace the default ones"""
+    df_modify_sd = modify_sd(df_sd)
+    write_to_bigquery(df_modify_sd, output_bq, SOURCES["sd"]["partition_column"], partition_overwrite,
+                      cluster_columns=cluster_columns or SOURCES["sd"]["cluster_columns"])
+
+
+def parquet_input_path(input_path: str) -> str:
+    """Return the path of Parquet files converted during the ingest from CSV files of input_path"""
+    return input_path.replace(".csv", ".parquet")
+
+
+def input_size(spark: SparkSession, path: str) -> int:
+    """Return total size in bytes of files matching path (glob) using Hadoop FileSystem"""
+    fs, pattern = hadoop_path(spark, path)
+    return sum(status.getLen() for status in fs.globStatus(pattern) or [])
+
+
+def input_files(spark: SparkSession, path: str) -> list:
+    """Return names of files matching path (glob or directory) using Hadoop FileSystem"""
+    fs, pattern = hadoop_path(spark, path)
+    names = []
+    for status in fs.globStatus(pattern) or []:
+        statuses = fs.listStatus(status.getPath()) if status.isDirectory() else [status]
+        names += [file.getPath().getName() for file in statuses if file.isFile()]
+    return sorted(names)
+
+
+def quarantine_path_for_city(params, city: str, output_path: str) -> str:
+    """Return the path of quarantined rows of the city, next to the Parquet lake of the city by default"""
+    return f"{params.quarantine_path}{city}/" if params.quarantine_path else f"{output_path.rstrip('/')}_quarantine/"
+
+
+def years_glob(years: list) -> str:
+    """Return Hadoop glob matching any of the years: [2022, 2023] -> {2022,2023}"""
+    return "{" + ",".join(str(year) for year in years) + "}"
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Save the duration of the stage in seconds to timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def target_file_bytes(params) -> int:
+    """Return the target size of Parquet files in bytes of input data, None if it isn't set"""
+    return params.target_file_mb * 1024 * 1024 if params.target_file_mb else None
+
+
+def cluster_columns_for_city(params, city: str) -> list:
+    """
+    Return clustering columns of the city's BigQuery table from --bq_cluster_by ("sd=call_type,beat;la=area_code"),
+    None if they aren't set for the city and the defaults from schemas.py are used
+    """
+    for spec in (params.bq_cluster_by or "").split(";"):
+        name, _, columns = spec.partition("=")
+        if name.strip() == city:
+            return [column.strip() for column in columns.split(",") if column.strip()]
+    return None
+
+
+def lake_layout(params, city: str) -> dict:
+    """Return the Parquet layout of the city's lake from --parquet_layout and --parquet_compression"""
+    return parquet_layout(city, params.parquet_layout, params.parquet_compression)
+
+
+def watermark_path_for_city(params, city: str) -> str:
+    """Return the path of the high-water mark of the city, None if loads aren't incremental"""
+    return f"{params.watermark_path}{city}" if params.watermark_path else None
+
+
+def pipeline_aus(spark: SparkSession, params) -> dict:
+    """
+    Load Austin data: CSV -> Parquet -> BigQuery and return durations of the stages.
+    CSV files converted during the ingest (--input_format parquet) skip the CSV stage,
+    with --single_pass CSV is read once and both writes use the persisted data.
+    """
+    watermark_path = watermark_path_for_city(params, "aus")
+    cluster_columns = cluster_columns_for_city(params, "aus")
+    timings = {}
+    if params.input_format == "parquet":
+        with timed(timings, "bigquery"):
+            parquet_to_bq_aus(spark, f"{parquet_input_path(params.input_path_aus)}*", params.output_bq_aus,
+                              watermark_path, cluster_columns)
+    elif params.single_pass:
+        with timed(timings, "csv_to_parquet"):
+            df_aus = csv_to_parquet_aus(spark, params.input_path_aus, params.output_path_aus, True,
+                                        target_file_bytes(params), params.partition_lake_by,
+                                        quarantine_path_for_city(params, "aus", params.output_path_aus),
+                                        lake_layout(params, "aus"))
+        with timed(timings, "bigquery"):
+            load_to_bq_aus(spark, df_aus, params.output_bq_aus, watermark_path, cluster_columns)
+        df_aus.unpersist()
+    else:
+        with timed(timings, "csv_to_parquet"):
+            csv_to_parquet_aus(spark, params.input_path_aus, params.output_path_aus, False,
+                               target_file_bytes(params), params.partition_lake_by,
+                               quarantine_path_for_city(params, "aus", params.output_path_aus),
+                               lake_layout(params, "aus"))
+        with timed(timings, "bigquery"):
+            parquet_to_bq_aus(spark, params.output_path_aus, params.output_bq_aus, watermark_path, cluster_columns)
+
+    return timings
+
+
+def pipeline_la(spark: SparkSession, params) -> dict:
+    """Load Los Angeles data: CSV -> Parquet -> BigQuery, the modes are the same as for Austin"""
+    watermark_path = watermark_path_for_city(params, "la")
+    cluster_columns = cluster_columns_for_city(params, "la")
+    timings = {}
+    if params.input_format == "parquet":
+        with timed(timings, "bigquery"):
+            parquet_to_bq_la(spark, f"{parquet_input_path(params.input_path_la)}*", params.output_bq_la,
+                             watermark_path, cluster_columns)
+    elif params.single_pass:
+        with timed(timings, "csv_to_parquet"):
+            df_la = csv_to_parquet_la(spark, params.input_path_la, params.output_path_la, True,
+                                      target_file_bytes(params), params.partition_lake_by,
+                                      quarantine_path_for_city(params, "la", params.output_path_la),
+                                      lake_layout(params, "la"))
+        with timed(timings, "bigquery"):
+            load_to_bq_la(spark, df_la, params.output_bq_la, watermark_path, cluster_columns)
+        df_la.unpersist()
+    else:
+        with timed(timings, "csv_to_parquet"):
+            csv_to_parquet_la(spark, params.input_path_la, params.output_path_la, False,
+                              target_file_bytes(params), params.partition_lake_by,
+                              quarantine_path_for_city(params, "la", params.output_path_la),
+                              lake_layout(params, "la"))
+        with timed(timings, "bigquery"):
+            parquet_to_bq_la(spark, params.output_path_la, params.output_bq_la, watermark_path, cluster_columns)
+
+    return timings
+
+
+def pipeline_sd(spark: SparkSession, params) -> dict:
+    """
+    Load San Diego data: CSV of all years -> Parquet partitioned by year -> BigQuery,
+    the modes are the same as for Austin.
+    With --sd_years only these years are rebuilt and only their partitions are replaced in BigQuery.
+    """
     input_path_sd = params.input_path_sd
     output_path_sd = params.output_path_sd
-    output_bq_sd = params.output_bq_sd
-    for year in range(2015, 2024):
-        print(f"processing data for SAN DIEGO for {year}")
+    sd_years = [int(year) for year in params.sd_years.split(",")] if params.sd_years else None
+    cluster_columns = cluster_columns_for_city(params, "sd")
+    timings = {}
+    if params.input_format == "parquet":
+        input_path = f"{input_path_sd}sd_{years_glob(sd_years) if sd_years else '*'}.parquet"
+        with timed(timings, "bigquery"):
+            parquet_to_bq_sd(spark, f"{input_path}*", params.output_bq_sd, bool(sd_years), cluster_columns)
+        return timings
+
+    with timed(timings, "csv_to_parquet"):
+        df_sd = csv_to_parquet_sd(spark, input_path_sd, output_path_sd, sd_years, params.single_pass,
+                                  target_file_bytes(params) or SD_INPUT_BYTES_PER_FILE,
+                                  quarantine_path_for_city(params, "sd", output_path_sd), lake_layout(params, "sd"))
+
+    with timed(timings, "bigquery"):
+        if params.single_pass:
+            load_to_bq_sd(spark, df_sd, params.output_bq_sd, bool(sd_years), cluster_columns)
+            df_sd.unpersist()
+        else:
+            input_path = f"{output_path_sd}year={years_glob(sd_years)}/" if sd_years else output_path_sd
+            parquet_to_bq_sd(spark, input_path, params.output_bq_sd, bool(sd_years), cluster_columns)
+
+    return timings
+
+
+PIPELINES = {
+    "aus": pipeline_aus,
+    "la": pipeline_la,
+    "sd": pipeline_sd,
+}
+
+
+def run_pipeline(spark: SparkSession, params, city: str) -> dict:
+    """
+    Run the pipeline of the city in its own FAIR scheduler pool and job group,
+    return durations of its stages and the total one
+    """
+    sc = spark.sparkContext
+    sc.setLocalProperty("spark.scheduler.pool", city)
+    sc.setJobGroup(city, f"Pipeline for {city}")
+    timings = {}
+    with timed(timings, "total"):
+        timings.update(PIPELINES[city](spark, params))
+
+    return timings
+
+
+def run_pipelines(spark: SparkSession, params, cities: list, parallel_cities: int = 1) -> dict:
+    """
+    Run pipelines of the cities, up to parallel_cities of them at once from driver threads,
+    so they share executors. Stage durations are reported for each city.
+    The threads are InheritableThreads, so the scheduler pool and the job group set in a thread reach
+    the JVM thread running its jobs also without pinned thread mode (off by default before Spark 3.2).
+    A failed pipeline doesn't stop the others, the first error is raised after all of them finish.
+    """
+    pending = queue.Queue()
+    for city in cities:
+        pending.put(city)
+    results = {}
+
+    def worker():
+        while True:
+            try:
+                city = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[city] = run_pipeline(spark, params, city)
+            except Exception as e:
+                results[city] = e
+
+    threads = [pyspark.InheritableThread(target=worker) for _ in range(min(parallel_cities, len(cities)) or 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    timings = {}
+    errors = []
+    for city in cities:
+        if isinstance(results[city], Exception):
+            print(f"{city}: FAILED ({results[city]})")
+            errors.append(results[city])
+            continue
+        timings[city] = results[city]
+        print(f"{city}: " + ", ".join(f"{stage} {seconds:.1f} s" for stage, seconds in timings[city].items()))
+    if errors:
+        raise errors[0]
+
+    return timings
+
+
+def select_cities(cities: str) -> list:
+    """Return cities of the comma-separated selector ("aus,la,sd"), raise ValueError for unknown ones"""
+    selected = [city.strip() for city in cities.split(",") if city.strip()]
+    unknown = [city for city in selected if city not in PIPELINES]
+    if unknown or not selected:
+        raise ValueError(f"Unknown cities '{cities}', use some of {','.join(PIPELINES)}")
+    return selected
 
-        input_path = f"{input_path_sd}sd_{year}.csv"
-        output_path = f"{output_path_sd}{year}/"
 
-        csv_to_parquet_sd(spark, input_path, output_path)
+def main(params):
+    # only selected cities are processed, jobs of single cities are named after them
+    cities = select_cities(params.cities)
+    app_name = 'crime-reports-data-app'
+    if len(cities) < len(PIPELINES):
+        app_name = f"{app_name}-{'-'.join(cities)}"
 
-    # modify aus and save to BQ
-    parquet_to_bq_aus(spark, f"{output_path_aus}*", output_bq_aus)
+    # Create a Spark session
+    builder = SparkSession.builder \
+        .appName(app_name)
+    if params.parallel_cities > 1:
+        # cities' pipelines share executors instead of waiting for each other
+        builder = builder.config("spark.scheduler.mode", "FAIR")
+    spark = builder.getOrCreate()
 
-    # modify la and save to BQ
-    parquet_to_bq_la(spark, f"{output_path_la}*", output_bq_la)
+    # temp bucket for saving to BigQuery
+    spark.conf.set('temporaryGcsBucket', params.temp_gcs_bucket)
+    # options of the BigQuery connector set in the session are used by all writes
+    spark.conf.set('writeMethod', params.bq_write_method)
 
-    # modify sd and save to BQ
-    parquet_to_bq_sd(spark, f"{output_path_sd}*", output_bq_sd)
+    run_pipelines(spark, params, cities, params.parallel_cities)
 
 
 if __name__ == '__main__':
@@ -398,6 +859,36 @@ if __name__ == '__main__':
     parser.add_argument("--output_bq_sd", type=str, required=True,
                         help="Table name in BigQuery for San Diego Crime Records")
 
+    parser.add_argument("--cities", type=str, required=False, default="aus,la,sd",
+                        help="Comma-separated list of cities to process")
+    parser.add_argument("--input_format", type=str, required=False, default="csv", choices=["csv", "parquet"],
+                        help="'parquet' if CSV files were converted to Parquet during the ingest")
+    parser.add_argument("--sd_years", type=str, required=False, default=None,
+                        help="Comma-separated San Diego years to rebuild, all years of input_path_sd by default")
+    parser.add_argument("--parallel_cities", type=int, required=False, default=1,
+                        help="Number of cities processed concurrently using FAIR scheduler pools")
+    parser.add_argument("--target_file_mb", type=int, required=False, default=None,
+                        help="Size of input data per Parquet file in MB, the number of files is fixed by default")
+    parser.add_argument("--partition_lake_by", type=str, required=False, default=None, choices=["year", "month"],
+                        help="Partition Parquet data of Austin and Los Angeles by year or month of the crime date")
+    parser.add_argument("--bq_write_method", type=str, required=False, default="indirect",
+                        choices=["indirect", "direct"],
+                        help="Method of BigQuery writes: files staged in temp_gcs_bucket or the Storage Write API")
+    parser.add_argument("--bq_cluster_by", type=str, required=False, default=None,
+                        help="Clustering columns of BigQuery tables of the cities like 'sd=call_type,beat;la=area_code', "
+                             "defaults are in schemas.py")
+    parser.add_argument("--parquet_layout", type=str, required=False, default=None, choices=["sorted"],
+                        help="Layout of Parquet files: sorted by the crime date and code with explicit encoding "
+                             "and sizes of row groups and pages, default settings if it isn't set")
+    parser.add_argument("--parquet_compression", type=str, required=False, default=None, choices=["snappy", "zstd"],
+                        help="Compression of Parquet files, Spark default (snappy) if it isn't set")
+    parser.add_argument("--single_pass", action="store_true",
+                        help="Read CSV once and write Parquet and BigQuery from the same persisted data")
+    parser.add_argument("--watermark_path", type=str, required=False, default=None,
+                        help="Path for high-water marks of incremental loads for Austin and Los Angeles")
+    parser.add_argument("--quarantine_path", type=str, required=False, default=None,
+                        help="Path for rows with malformed values of the cities, next to the lakes by default")
+
     args = parser.parse_args()
 
     main(args)
@@ -14,21 +14,22 @@ rm openjdk-11.0.2_linux-x64_bin.tar.gz
 
 # Download Spark
 echo "=== Download Spark..."
-wget https://dlcdn.apache.org/spark/spark-3.3.2/spark-3.3.2-bin-hadoop3.tgz
-tar xzfv spark-3.3.2-bin-hadoop3.tgz
+# the same Spark 3.5 line as the Dataproc image 2.2 in terraform/main.tf
+wget https://archive.apache.org/dist/spark/spark-3.5.1/spark-3.5.1-bin-hadoop3.tgz
+tar xzfv spark-3.5.1-bin-hadoop3.tgz
 # Remove the archive
-rm spark-3.3.2-bin-hadoop3.tgz
+rm spark-3.5.1-bin-hadoop3.tgz
 
 # Append the exports to .bashrc
 echo 'export JAVA_HOME="${HOME}/spark/jdk-11.0.2"' >> ~/.bashrc
 echo 'export PATH="${JAVA_HOME}/bin:${PATH}"' >> ~/.bashrc
-echo 'export SPARK_HOME="${HOME}/spark/spark-3.3.2-bin-hadoop3"' >> ~/.bashrc
+echo 'export SPARK_HOME="${HOME}/spark/spark-3.5.1-bin-hadoop3"' >> ~/.bashrc
 echo 'export PATH="${SPARK_HOME}/bin:${PATH}"' >> ~/.bashrc
 
 # PySpark
 # Add exports to .bashrc
 echo 'export PYTHONPATH="${SPARK_HOME}/python/:$PYTHONPATH"' >> ~/.bashrc
-echo 'export PYTHONPATH="${SPARK_HOME}/python/lib/py4j-0.10.9.5-src.zip:$PYTHONPATH"' >> ~/.bashrc
+echo 'export PYTHONPATH="${SPARK_HOME}/python/lib/py4j-0.10.9.7-src.zip:$PYTHONPATH"' >> ~/.bashrc
 
 # Re-evaluate .bashrc
 source ~/.bashrc
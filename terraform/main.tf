@@ -78,7 +78,8 @@ resource "google_dataproc_cluster" "dataproc-cluster" {
 
     # Override or set some custom properties
     software_config {
-      image_version = "2.0-debian10"
+      # Spark 3.5: the job collects parse stats with Observation (3.3+) and count_if (3.5+)
+      image_version = "2.2-debian12"
       override_properties = {
         "dataproc:dataproc.allow.zero.workers" = "true"
       }
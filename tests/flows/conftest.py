@@ -1,11 +1,28 @@
 import pytest
 import requests
 import os
+import sys
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from prefect_gcp import GcpCredentials
 from prefect_gcp.cloud_storage import GcsBucket
 from google.cloud import dataproc_v1 as dataproc
 
+# modules in flows import each other like scripts run from the flows folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../flows"))
+
+
+@pytest.fixture(autouse=True)
+def clear_block_cache(mocker):
+    """
+    This fixture empties the cache of Prefect blocks, so blocks loaded by earlier tests aren't reused.
+    """
+    import block_cache
+    mocker.patch.dict(block_cache.block_cache, clear=True)
+    mocker.patch.dict(block_cache.block_stats, clear=True)
+
 
 @pytest.fixture
 def url():
@@ -64,6 +81,7 @@ def mock_successful_download(mock_requests_get, mock_content):
     """
     # Mock the requests.get response
     mock_requests_get.status_code = 200
+    mock_requests_get.headers = {}
     # Mock the content of the file
     mock_requests_get.iter_content.return_value = [mock_content]
     return mock_content
@@ -78,6 +96,114 @@ def mock_failed_download(mock_requests_get):
     mock_requests_get.status_code = 404
 
 
+@pytest.fixture
+def http_server():
+    """
+    This fixture starts a local HTTP server which serves the files from its `files` dictionary.
+    It supports ETag/Last-Modified validators, Range/If-Range requests and records headers of all requests.
+    Set `fail_after` to the number of bytes after which the next response body is cut off.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.respond(send_body=False)
+
+        def do_GET(self):
+            self.respond(send_body=True)
+
+        def respond(self, send_body):
+            server.requests.append((self.command, self.path, dict(self.headers)))
+            content = server.files.get(self.path)
+            if content is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            etag = f'"{hashlib.md5(content).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            status = 200
+            start, end = 0, len(content) - 1
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range", etag) == etag:
+                status = 206
+                first, last = range_header[len("bytes="):].split("-")
+                start = int(first)
+                end = int(last) if last else end
+
+            body = content[start:end + 1]
+            self.send_response(status)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", "Mon, 02 Jan 2023 00:00:00 GMT")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+            self.end_headers()
+            if send_body:
+                if server.fail_after is not None:
+                    body = body[:server.fail_after]
+                    server.fail_after = None
+                    self.close_connection = True
+                self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.files = {}
+    server.requests = []
+    server.fail_after = None
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_bucket(tmp_path):
+    """
+    This fixture returns a stand-in for google.cloud.storage bucket which stores objects in a local folder.
+    Blobs read the uploaded file object in chunks of chunk_size like a resumable upload
+    and record the size of every chunk in `chunks`.
+    """
+    class LocalBlob:
+        def __init__(self, root, name, chunk_size=None):
+            self.path = root / name
+            self.chunk_size = chunk_size
+            self.chunks = []
+
+        def upload_from_file(self, file_obj, timeout=None):
+            tmp_path = self.path.with_name(f"{self.path.name}.upload")
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                for chunk in iter(lambda: file_obj.read(self.chunk_size), b""):
+                    self.chunks.append(len(chunk))
+                    f.write(chunk)
+            # the object is replaced only after the last chunk
+            tmp_path.replace(self.path)
+
+        def exists(self):
+            return self.path.exists()
+
+    class LocalBucket:
+        def __init__(self, root):
+            self.root = root
+            self.blobs = {}
+
+        def blob(self, name, chunk_size=None):
+            self.blobs[name] = LocalBlob(self.root, name, chunk_size)
+            return self.blobs[name]
+
+    return LocalBucket(tmp_path / "bucket")
+
+
 @pytest.fixture
 def mock_env(mocker):
     """
@@ -233,6 +359,8 @@ def mock_dataproc_client(mocker, mock_job_controller_client):
     """
     This fixture mocks the DataProc client creation.
     """
+    # Clients cached by earlier tests aren't reused
+    mocker.patch.dict("flows.ingest.dataproc_clients", clear=True)
     # Mock the instance creation of the JobControllerClient object.
     mocked_dataproc_client = mocker.patch(
         "google.cloud.dataproc_v1.JobControllerClient",
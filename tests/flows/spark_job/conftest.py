@@ -0,0 +1,26 @@
+from pyspark.sql import SparkSession
+import pytest
+
+
+@pytest.fixture(scope="session")
+def spark():
+    """
+    master = local[1] – specifies that spark is running on a local machine with one thread
+    spark.executor.cores = 1 – set number of cores to one
+    spark.executor.instances = 1 - set executors to one
+    spark.sql.shuffle.partitions = 1 - set the maximum number of partitions to 1
+    spark.driver.bindAddress = 127.0.0.1 – (optional) Explicitly specify the driver bind address.
+    Useful if your machine also has a live connection to a remote cluster
+    :return:
+    """
+    spark = SparkSession.builder \
+        .master("local[1]") \
+        .appName("local-tests") \
+        .config("spark.executor.cores", "1") \
+        .config("spark.executor.instances", "1") \
+        .config("spark.sql.shuffle.partitions", "1") \
+        .config("spark.driver.bindAddress", "127.0.0.1") \
+        .getOrCreate()
+
+    yield spark
+    spark.stop()
@@ -0,0 +1,23 @@
+from flows.spark_job import decode
+
+
+def test_decode_with_default(spark):
+    """
+    Test case for a code table with a description of unknown codes, nulls get it too
+    """
+    df = spark.createDataFrame([("H",), ("Z",), ("-",), (None,)], "vict_descent string")
+
+    rows = df.select(decode("vict_descent").alias("vict_descent")).collect()
+
+    assert [row.vict_descent for row in rows] == ["Hispanic/Latin/Mexican", "Asian Indian", "Unknown", "Unknown"]
+
+
+def test_decode_without_default(spark):
+    """
+    Test case for a code table without a default, unknown codes become null
+    """
+    df = spark.createDataFrame([("C",), ("N",), ("X",), (None,)], "clearance_status string")
+
+    rows = df.select(decode("clearance_status").alias("clearance_status")).collect()
+
+    assert [row.clearance_status for row in rows] == ["Arrested", "Not cleared", None, None]
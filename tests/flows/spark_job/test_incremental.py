@@ -0,0 +1,89 @@
+import datetime
+from flows.spark_job import read_watermark, write_watermark, incremental_months, select_incremental, \
+    write_to_bigquery_incremental
+
+
+def create_reports(spark):
+    """Create a DataFrame with crime and report dates of 3 months"""
+    return spark.createDataFrame(
+        [
+            (1, datetime.date(2023, 1, 10), datetime.date(2023, 1, 11)),
+            (2, datetime.date(2023, 2, 5), datetime.date(2023, 2, 6)),
+            (3, datetime.date(2023, 2, 20), datetime.date(2023, 3, 2)),
+            (4, datetime.date(2023, 3, 1), datetime.date(2023, 3, 3)),
+        ],
+        ["incident_num", "crime_date", "report_date"],
+    )
+
+
+def test_watermark_round_trip(spark, tmp_path):
+    """
+    Test case for saving and reading the high-water mark
+    """
+    path = f"{tmp_path}/watermarks/aus"
+
+    assert read_watermark(spark, path) is None
+    write_watermark(spark, path, datetime.date(2023, 3, 3))
+    assert read_watermark(spark, path) == "2023-03-03"
+
+
+def test_select_incremental(spark):
+    """
+    Test case for rows reported since the watermark, all rows of their crime months are selected,
+    so the month partitions can be replaced
+    """
+    df = create_reports(spark)
+
+    new_watermark, months = incremental_months(df, "report_date", "crime_date", "2023-03-01")
+    df_delta = select_incremental(df, "crime_date", months)
+
+    # report 3 is in February, so the whole February is selected with March
+    assert new_watermark == datetime.date(2023, 3, 3)
+    assert months == [datetime.date(2023, 2, 1), datetime.date(2023, 3, 1)]
+    assert sorted(row.incident_num for row in df_delta.collect()) == [2, 3, 4]
+    assert df_delta.columns == df.columns
+
+
+def test_write_to_bigquery_incremental(mocker, spark, tmp_path):
+    """
+    Test case for incremental loads: the first run overwrites the table,
+    the next one replaces only affected month partitions and moves the watermark
+    """
+    mock_write = mocker.patch("flows.spark_job.write_to_bigquery")
+    path = f"{tmp_path}/watermarks/aus"
+    df = create_reports(spark)
+
+    # The first run without the watermark
+    write_to_bigquery_incremental(spark, df, "dataset.table", "crime_date", "report_date", path)
+    assert mock_write.call_args.args[0].count() == 4
+    assert mock_write.call_args.kwargs == {"cluster_columns": None}
+    assert read_watermark(spark, path) == "2023-03-03"
+
+    # The next run with new reports
+    df_new = df.union(spark.createDataFrame(
+        [(5, datetime.date(2023, 3, 10), datetime.date(2023, 3, 12))], df.schema))
+    write_to_bigquery_incremental(spark, df_new, "dataset.table", "crime_date", "report_date", path)
+    # only March is replaced, February has no new reports
+    assert sorted(row.incident_num for row in mock_write.call_args.args[0].collect()) == [4, 5]
+    assert mock_write.call_args.kwargs == {"partition_overwrite": True, "cluster_columns": None}
+    assert read_watermark(spark, path) == "2023-03-12"
+
+
+def test_write_to_bigquery_incremental_without_rows(mocker, spark, tmp_path):
+    """
+    Test case for runs without rows or without new reports: the table isn't written and the watermark is kept
+    """
+    mock_write = mocker.patch("flows.spark_job.write_to_bigquery")
+    path = f"{tmp_path}/watermarks/aus"
+    df = create_reports(spark)
+
+    # An empty first run doesn't save "None" as the watermark
+    write_to_bigquery_incremental(spark, df.limit(0), "dataset.table", "crime_date", "report_date", path)
+    assert read_watermark(spark, path) is None
+
+    write_watermark(spark, path, datetime.date(2023, 4, 1))
+    write_to_bigquery_incremental(spark, df, "dataset.table", "crime_date", "report_date", path)
+    write_to_bigquery_incremental(spark, df.limit(0), "dataset.table", "crime_date", "report_date", path)
+
+    mock_write.assert_not_called()
+    assert read_watermark(spark, path) == "2023-04-01"
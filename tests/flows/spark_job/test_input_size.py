@@ -0,0 +1,27 @@
+from flows.spark_job import input_size, years_glob
+
+
+def test_input_size(spark, tmp_path):
+    """
+    Test case for the total size of files matching a glob
+    """
+    (tmp_path / "sd_2015.csv").write_text("a" * 100)
+    (tmp_path / "sd_2016.csv").write_text("a" * 50)
+    (tmp_path / "la_2010_2019.csv").write_text("a" * 10)
+
+    assert input_size(spark, f"{tmp_path}/sd_*.csv") == 150
+    assert input_size(spark, f"{tmp_path}/sd_{years_glob([2016])}.csv") == 50
+
+
+def test_input_size_no_files(spark, tmp_path):
+    """
+    Test case for a glob without matching files
+    """
+    assert input_size(spark, f"{tmp_path}/sd_*.csv") == 0
+
+
+def test_years_glob():
+    """
+    Test case for Hadoop glob of the years
+    """
+    assert years_glob([2022, 2023]) == "{2022,2023}"
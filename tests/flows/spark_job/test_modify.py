@@ -0,0 +1,71 @@
+import datetime
+from flows.schemas import AUS_COLUMNS, LA_COLUMNS
+from flows.spark_job import spark_schema, modify_aus, modify_la, modify_sd
+
+
+def raw_row(columns, **values):
+    """Return a raw row with the values, other columns are null"""
+    return tuple(values.get(name.replace("-", "_")) for name, *_ in columns)
+
+
+def test_modify_aus(spark):
+    """
+    Test case for renamed, parsed and decoded columns of Austin
+    """
+    row = raw_row(AUS_COLUMNS, Incident_Number=20235000123, Occurred_Date_Time="05/01/2023 10:20:00 PM",
+                  Occurred_Date="05/01/2023", Report_Date="05/02/2023", Clearance_Status="C",
+                  Highest_Offense_Code=600, PRA=512)
+    df = spark.createDataFrame([row], spark_schema("aus"))
+
+    result = modify_aus(df).first()
+
+    assert result.incident_num == 20235000123
+    assert result.crime_datetime == datetime.datetime(2023, 5, 1, 22, 20)
+    assert result.crime_date == datetime.date(2023, 5, 1)
+    assert result.report_date == datetime.date(2023, 5, 2)
+    assert result.report_datetime is None
+    assert result.clearance_status == "Arrested"
+    assert result.crime_code == 600
+    assert result.pra == 512
+
+
+def test_modify_la(spark):
+    """
+    Test case for renamed, parsed and decoded columns of Los Angeles
+    """
+    row = raw_row(LA_COLUMNS, DR_NO=231204567, Date_Rptd="05/02/2023 12:00:00 AM",
+                  DATE_OCC="05/01/2023 12:00:00 AM", TIME_OCC="2130", Part_1_2=1,
+                  Vict_Sex="F", Vict_Descent="K", LAT=34.05)
+    df = spark.createDataFrame([row], spark_schema("la"))
+
+    result = modify_la(df).first()
+
+    assert result.incident_num == 231204567
+    assert result.crime_datetime == datetime.datetime(2023, 5, 1, 21, 30)
+    assert result.crime_date == datetime.date(2023, 5, 1)
+    assert result.report_date == datetime.date(2023, 5, 2)
+    assert result.part_1_2 == 1
+    assert result.vict_sex == "Female"
+    assert result.vict_descent == "Korean"
+    assert result.latitude == 34.05
+    assert modify_la(df).columns[-1] == "longtitude"
+
+
+def test_modify_sd(spark):
+    """
+    Test case for San Diego columns, the incident number loses its first letter
+    """
+    df = spark.createDataFrame(
+        [("E23010000001", datetime.datetime(2023, 1, 1, 0, 1, 2), 1) + (None,) * 9 + (524, 2)],
+        "incident_num string, date_time timestamp, day_of_week int, address_number_primary int, "
+        "address_dir_primary string, address_road_primary string, address_sfx_primary string, "
+        "address_dir_intersecting string, address_road_intersecting string, address_sfx_intersecting string, "
+        "call_type string, disposition string, beat int, priority int",
+    )
+
+    result = modify_sd(df).first()
+
+    assert result.incident_num == "23010000001"
+    assert result.crime_datetime == datetime.datetime(2023, 1, 1, 0, 1, 2)
+    assert result.crime_date == datetime.date(2023, 1, 1)
+    assert result.beat == 524
@@ -0,0 +1,35 @@
+from flows.spark_job import spark_schema, parse_raw_columns, malformed_values, quarantine_malformed, read_parquet
+
+
+def test_parse_raw_columns(spark):
+    """
+    Test case for parsing integer values written as text in the same select as other raw columns
+    """
+    values = ["524", "521.0", " 12.00 ", "+5", "-7.0", "12.5", "abc", "99999999999", "+-5", None]
+    rows = [("E1", None, 1) + (None,) * 9 + (value, "2") for value in values]
+    df = spark.createDataFrame(rows, spark_schema("sd"))
+
+    df_parsed = df.select(*parse_raw_columns("sd"))
+
+    # Assertions
+    assert dict(df_parsed.dtypes)["beat"] == "int"
+    assert dict(df_parsed.dtypes)["incident_num"] == "string"
+    assert [row.beat for row in df_parsed.collect()] == [524, 521, 12, 5, -7, None, None, None, None, None]
+    # Null values aren't malformed
+    assert [row.beat for row in df.where(malformed_values("sd")).collect()] == ["12.5", "abc", "99999999999",
+                                                                               "+-5"]
+
+
+def test_quarantine_malformed(spark, tmp_path):
+    """
+    Test case for writing rows with malformed values with their raw text, nothing is written without them
+    """
+    rows = [("E1", None, 1) + (None,) * 9 + (beat, priority) for beat, priority in [("524", "2"), ("52x", "2.0")]]
+    df = spark.createDataFrame(rows, spark_schema("sd"))
+
+    assert quarantine_malformed(df, "sd", f"{tmp_path}/quarantine/") == 1
+    df_quarantine = read_parquet(spark, f"{tmp_path}/quarantine/")
+    assert [(row.beat, row.priority) for row in df_quarantine.collect()] == [("52x", "2.0")]
+
+    assert quarantine_malformed(df.limit(1), "sd", f"{tmp_path}/empty/") == 0
+    assert not (tmp_path / "empty").exists()
@@ -0,0 +1,116 @@
+from flows.spark_job import csv_to_parquet_aus, csv_to_parquet_sd, read_parse_stats, write_parse_stats, read_parquet
+from flows.schemas import AUS_COLUMNS
+
+SD_HEADER = "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+
+
+def test_parse_stats_of_files(spark, tmp_path):
+    """
+    Test case for parse stats of every input file saved with the lake, computed by the write itself:
+    malformed rows are counted and quarantined, null rates are saved only for columns with nulls
+    """
+    input_path = tmp_path / "raw"
+    input_path.mkdir()
+    (input_path / "sd_2022.csv").write_text(SD_HEADER + "E22010000001,2022-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,524,2\n")
+    (input_path / "sd_2023.csv").write_text(SD_HEADER + "E23010000001,2023-05-01 10:20:30,2,,,,,,,,415,K,521.0,\n"
+                                                        "E23010000002,2023-05-01 10:20:30,Monday,,,,,,,,415,K,52,1\n")
+
+    csv_to_parquet_sd(spark, f"{input_path}/", f"{tmp_path}/pq/", quarantine_path=f"{tmp_path}/quarantine/")
+
+    stats = read_parse_stats(spark, f"{tmp_path}/pq/")
+    assert stats["sd_2022.csv"] == {"rows": 1, "malformed": 0, "null_rate": {
+        "address_dir_primary": 1.0, "address_dir_intersecting": 1.0,
+        "address_road_intersecting": 1.0, "address_sfx_intersecting": 1.0}}
+    assert stats["sd_2023.csv"]["rows"] == 2
+    assert stats["sd_2023.csv"]["malformed"] == 1
+    assert stats["sd_2023.csv"]["null_rate"]["priority"] == 0.5
+    # The manifest isn't data of the lake
+    assert read_parquet(spark, f"{tmp_path}/pq/").count() == 3
+    df_quarantine = read_parquet(spark, f"{tmp_path}/quarantine/")
+    assert [row._corrupt_record for row in df_quarantine.collect()] == [
+        "E23010000002,2023-05-01 10:20:30,Monday,,,,,,,,415,K,52,1"]
+
+
+def test_parse_stats_without_malformed_rows(mocker, spark, tmp_path):
+    """
+    Test case for the file without malformed rows, raw data isn't scanned again for quarantine
+    """
+    csv_path = tmp_path / "aus.csv"
+    header = ",".join(name for name, _ in AUS_COLUMNS)
+    csv_path.write_text(header + "\n" + "20235000123,Theft,600" + "," * (len(AUS_COLUMNS) - 3) + "\n")
+    mock_quarantine = mocker.patch("flows.spark_job.quarantine_malformed")
+
+    df = csv_to_parquet_aus(spark, str(csv_path), f"{tmp_path}/pq/", quarantine_path=f"{tmp_path}/quarantine/")
+
+    stats = read_parse_stats(spark, f"{tmp_path}/pq/")
+    assert list(stats) == ["aus.csv"]
+    assert stats["aus.csv"]["rows"] == 1 and stats["aus.csv"]["malformed"] == 0
+    assert "_corrupt_record" not in df.columns
+    assert "_corrupt_record" not in read_parquet(spark, f"{tmp_path}/pq/").columns
+    mock_quarantine.assert_not_called()
+
+
+def test_write_parse_stats_merge(spark, tmp_path):
+    """
+    Test case for merging stats of rebuilt files into the manifest, stats of other files are kept
+    """
+    write_parse_stats(spark, f"{tmp_path}/pq/", {"sd_2022.csv": {"rows": 1}, "sd_2023.csv": {"rows": 2}})
+    write_parse_stats(spark, f"{tmp_path}/pq/", {"sd_2023.csv": {"rows": 3}}, merge=True)
+
+    assert read_parse_stats(spark, f"{tmp_path}/pq/") == {"sd_2022.csv": {"rows": 1}, "sd_2023.csv": {"rows": 3}}
+    assert (tmp_path / "pq" / "_parse_stats.json").read_text() == '{"sd_2022.csv":{"rows":1},"sd_2023.csv":{"rows":3}}'
+    assert read_parse_stats(spark, f"{tmp_path}/missing/") is None
+
+
+def test_parse_stats_with_persist(spark, tmp_path):
+    """
+    Test case for parse stats of single-pass mode, names of files are taken before the data is persisted
+    """
+    csv_path = tmp_path / "aus.csv"
+    header = ",".join(name for name, _ in AUS_COLUMNS)
+    row = "20235000123,Theft,600" + "," * (len(AUS_COLUMNS) - 3) + "\n"
+    csv_path.write_text(header + "\n" + row + row.replace("20235000123", "20235000124"))
+
+    df = csv_to_parquet_aus(spark, str(csv_path), f"{tmp_path}/pq/", persist=True)
+
+    stats = read_parse_stats(spark, f"{tmp_path}/pq/")
+    assert stats["aus.csv"]["rows"] == 2 and stats["aus.csv"]["malformed"] == 0
+    assert df.is_cached and df.count() == 2
+    assert "_corrupt_record" not in df.columns and "_source_file" not in df.columns
+    df.unpersist()
+
+
+def test_parse_stats_sd_with_persist(spark, tmp_path):
+    """
+    Test case for parse stats of San Diego in single-pass mode
+    """
+    input_path = tmp_path / "raw"
+    input_path.mkdir()
+    (input_path / "sd_2023.csv").write_text(SD_HEADER + "E23010000001,2023-05-01 10:20:30,2,,,,,,,,415,K,521.0,\n"
+                                                        "E23010000002,2023-05-01 10:20:30,Monday,,,,,,,,415,K,52,1\n")
+
+    df = csv_to_parquet_sd(spark, f"{input_path}/", f"{tmp_path}/pq/", persist=True)
+
+    stats = read_parse_stats(spark, f"{tmp_path}/pq/")
+    assert stats["sd_2023.csv"]["rows"] == 2 and stats["sd_2023.csv"]["malformed"] == 1
+    df.unpersist()
+
+
+def test_parse_stats_sd_many_partitions(spark, tmp_path):
+    """
+    Test case for parse stats of San Diego written in more than one partition,
+    rows are counted once and every year is written into one file
+    """
+    input_path = tmp_path / "raw"
+    input_path.mkdir()
+    for year in [2022, 2023]:
+        rows = "".join(f"E{year}{i:08d},{year}-05-01 10:20:30,2,,,,,,,,415,K,521,1\n" for i in range(1000))
+        (input_path / f"sd_{year}.csv").write_text(SD_HEADER + rows)
+
+    csv_to_parquet_sd(spark, f"{input_path}/", f"{tmp_path}/pq/", target_file_bytes=10000)
+
+    stats = read_parse_stats(spark, f"{tmp_path}/pq/")
+    assert stats["sd_2022.csv"]["rows"] == 1000 and stats["sd_2023.csv"]["rows"] == 1000
+    assert read_parquet(spark, f"{tmp_path}/pq/").count() == 2000
+    for year in [2022, 2023]:
+        assert len(list((tmp_path / "pq" / f"year={year}").glob("*.parquet"))) == 1
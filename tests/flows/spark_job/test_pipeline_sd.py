@@ -0,0 +1,83 @@
+import argparse
+import pytest
+from flows.spark_job import pipeline_sd, read_parquet
+
+
+def sd_params(tmp_path, single_pass, sd_years=None):
+    """Create San Diego CSV files of 2 years and return parameters of the job"""
+    input_path = tmp_path / "raw"
+    input_path.mkdir(exist_ok=True)
+    header = "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+    (input_path / "sd_2022.csv").write_text(header + "E22010000001,2022-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,524,2\n")
+    (input_path / "sd_2023.csv").write_text(header + "E23010000001,2023-05-01 10:20:30,2,,,,,,,,415,K,521.0,\n")
+
+    return argparse.Namespace(input_path_sd=f"{input_path}/", output_path_sd=f"{tmp_path}/pq/",
+                              output_bq_sd="dataset.sd", sd_years=sd_years, input_format="csv",
+                              single_pass=single_pass, target_file_mb=None, quarantine_path=None,
+                              parquet_layout=None, parquet_compression=None, bq_cluster_by=None)
+
+
+@pytest.mark.parametrize("single_pass", [False, True])
+def test_pipeline_sd(mocker, spark, tmp_path, single_pass):
+    """
+    Test case for both pipeline modes: Parquet lake partitioned by year is written
+    and the same data is saved to BigQuery, in the single-pass mode the lake is not read back
+    """
+    mock_write = mocker.patch("flows.spark_job.write_to_bigquery")
+    mock_read_parquet = mocker.patch("flows.spark_job.read_parquet", side_effect=read_parquet)
+    params = sd_params(tmp_path, single_pass)
+
+    pipeline_sd(spark, params)
+
+    # Parquet lake has both years
+    df_lake = read_parquet(spark, f"{tmp_path}/pq/")
+    assert sorted((row.year, row.beat) for row in df_lake.collect()) == [(2022, 524), (2023, 521)]
+
+    # Both years are saved to BigQuery
+    df_bq = mock_write.call_args.args[0]
+    assert sorted(row.incident_num for row in df_bq.collect()) == ["22010000001", "23010000001"]
+    assert mock_read_parquet.called != single_pass
+
+
+def test_pipeline_sd_selected_years(mocker, spark, tmp_path):
+    """
+    Test case for rebuilding only selected years, other years of the lake are kept
+    and only partitions of the selected years are replaced in BigQuery
+    """
+    mock_write = mocker.patch("flows.spark_job.write_to_bigquery")
+    pipeline_sd(spark, sd_params(tmp_path, False))
+
+    # Change the last year and rebuild only it
+    params = sd_params(tmp_path, False, sd_years="2023")
+    header = "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+    (tmp_path / "raw" / "sd_2023.csv").write_text(
+        header + "E23010000001,2023-05-01 10:20:30,2,,,,,,,,415,K,521.0,\n"
+                 "E23010000002,2023-06-01 10:20:30,4,,,,,,,,415,K,522,1\n")
+    pipeline_sd(spark, params)
+
+    df_lake = read_parquet(spark, f"{tmp_path}/pq/")
+    assert sorted((row.year, row.beat) for row in df_lake.collect()) == [(2022, 524), (2023, 521), (2023, 522)]
+
+    df_bq = mock_write.call_args.args[0]
+    assert sorted(row.incident_num for row in df_bq.collect()) == ["23010000001", "23010000002"]
+    assert mock_write.call_args.args[3] is True
+
+
+def test_pipeline_sd_quarantine(mocker, spark, tmp_path):
+    """
+    Test case for rows with malformed beat: the value is null in the lake
+    and the row is quarantined with the raw value next to the lake
+    """
+    mocker.patch("flows.spark_job.write_to_bigquery")
+    params = sd_params(tmp_path, False)
+    header = "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+    (tmp_path / "raw" / "sd_2023.csv").write_text(
+        header + "E23010000001,2023-05-01 10:20:30,2,,,,,,,,415,K,52a,\n")
+
+    pipeline_sd(spark, params)
+
+    df_lake = read_parquet(spark, f"{tmp_path}/pq/")
+    assert sorted((row.year, row.beat) for row in df_lake.collect()) == [(2022, 524), (2023, None)]
+    df_quarantine = read_parquet(spark, f"{tmp_path}/pq_quarantine/")
+    assert [(row.year, row.beat) for row in df_quarantine.collect()] == [(2023, "52a")]
+    assert df_quarantine.collect()[0].source_file.endswith("sd_2023.csv")
@@ -1,4 +1,3 @@
-from pyspark.sql import SparkSession
 from pyspark.sql import types
 import pytest
 import tempfile
@@ -6,30 +5,6 @@ import os
 from flows.spark_job import read_csv
 
 
-@pytest.fixture(scope="session")
-def spark():
-    """
-    master = local[1] – specifies that spark is running on a local machine with one thread
-    spark.executor.cores = 1 – set number of cores to one
-    spark.executor.instances = 1 - set executors to one
-    spark.sql.shuffle.partitions = 1 - set the maximum number of partitions to 1
-    spark.driver.bindAddress = 127.0.0.1 – (optional) Explicitly specify the driver bind address.
-    Useful if your machine also has a live connection to a remote cluster
-    :return:
-    """
-    spark = SparkSession.builder \
-        .master("local[1]") \
-        .appName("local-tests") \
-        .config("spark.executor.cores", "1") \
-        .config("spark.executor.instances", "1") \
-        .config("spark.sql.shuffle.partitions", "1") \
-        .config("spark.driver.bindAddress", "127.0.0.1") \
-        .getOrCreate()
-
-    yield spark
-    spark.stop()
-
-
 def test_read_csv_successful(spark):
     # Create a temporary CSV file
     with tempfile.NamedTemporaryFile(mode="w+", suffix=".csv", delete=False) as f:
@@ -52,3 +27,21 @@ def test_read_csv_successful(spark):
     # Clean up the temporary file
     os.remove(temp_file_path)
 
+
+
+def test_read_csv_corrupt_records(spark, tmp_path):
+    # Rows with a wrong type or number of values
+    csv_path = tmp_path / "people.csv"
+    csv_path.write_text("Name,Age\nAlice,29\nBob,forty\nCarol\n")
+    schema = types.StructType([
+        types.StructField("Name", types.StringType(), True),
+        types.StructField("Age", types.IntegerType(), True)
+    ])
+
+    df = read_csv(spark, schema, str(csv_path), "_corrupt_record")
+
+    # Raw text of the malformed rows is kept in the corrupt record column, values of other columns are null
+    rows = sorted(df.collect(), key=lambda row: row.Name)
+    assert df.columns == ["Name", "Age", "_corrupt_record"]
+    assert [(row.Name, row.Age, row._corrupt_record) for row in rows] == \
+        [("Alice", 29, None), ("Bob", None, "Bob,forty"), ("Carol", None, "Carol")]
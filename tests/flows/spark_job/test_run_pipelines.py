@@ -0,0 +1,90 @@
+import threading
+import pytest
+from flows.spark_job import run_pipelines, select_cities
+
+
+def test_run_pipelines_concurrently(mocker, spark):
+    """
+    Test case for pipelines of the cities running at the same time in their own scheduler pools
+    """
+    # All pipelines wait for each other, so they can finish only if they run concurrently
+    barrier = threading.Barrier(3, timeout=30)
+    pools = {}
+
+    def pipeline(city):
+        def run(spark, params):
+            pools[city] = spark.sparkContext.getLocalProperty("spark.scheduler.pool")
+            spark.range(10).count()
+            barrier.wait()
+            return {"bigquery": 0.1}
+        return run
+
+    mocker.patch.dict("flows.spark_job.PIPELINES", {city: pipeline(city) for city in ["aus", "la", "sd"]})
+
+    timings = run_pipelines(spark, None, ["aus", "la", "sd"], parallel_cities=3)
+
+    # Assertions
+    assert pools == {"aus": "aus", "la": "la", "sd": "sd"}
+    assert set(timings) == {"aus", "la", "sd"}
+    assert timings["aus"]["bigquery"] == 0.1
+    assert timings["aus"]["total"] >= 0
+
+
+def test_run_pipelines_jobs_in_pools(mocker, spark):
+    """
+    Test case for jobs of every city running in the city's pool and job group on the JVM side,
+    not only in local properties seen by Python
+    """
+    jvm_pools = {}
+
+    def pipeline(city):
+        def run(spark, params):
+            spark.range(10).count()
+            jvm_pools[city] = spark.sparkContext._jsc.sc().getLocalProperty("spark.scheduler.pool")
+            return {}
+        return run
+
+    mocker.patch.dict("flows.spark_job.PIPELINES", {city: pipeline(city) for city in ["aus", "la", "sd"]})
+
+    run_pipelines(spark, None, ["aus", "la", "sd"], parallel_cities=2)
+
+    # Assertions
+    assert jvm_pools == {"aus": "aus", "la": "la", "sd": "sd"}
+    tracker = spark.sparkContext.statusTracker()
+    for city in ["aus", "la", "sd"]:
+        job_ids = tracker.getJobIdsForGroup(city)
+        assert job_ids
+        assert all(tracker.getJobInfo(job_id).status == "SUCCEEDED" for job_id in job_ids)
+
+
+def test_run_pipelines_failed_city(mocker, spark):
+    """
+    Test case for a failed pipeline, other cities are processed and the error is raised at the end
+    """
+    processed = []
+
+    def failed(spark, params):
+        raise RuntimeError("Path does not exist")
+
+    def succeeded(spark, params):
+        processed.append("sd")
+        return {}
+
+    mocker.patch.dict("flows.spark_job.PIPELINES", {"la": failed, "sd": succeeded})
+
+    with pytest.raises(RuntimeError, match="Path does not exist"):
+        run_pipelines(spark, None, ["la", "sd"], parallel_cities=1)
+
+    assert processed == ["sd"]
+
+
+def test_select_cities():
+    """
+    Test case for the city selector of the job: known cities in the given order, ValueError for others
+    """
+    assert select_cities("sd") == ["sd"]
+    assert select_cities("la, aus") == ["la", "aus"]
+    with pytest.raises(ValueError):
+        select_cities("aus,ny")
+    with pytest.raises(ValueError):
+        select_cities("")
@@ -0,0 +1,27 @@
+import pyarrow.parquet as pq
+from flows.ingest import csv_to_parquet
+from flows.spark_job import spark_schema, parse_raw_columns, read_csv, read_parquet
+
+
+def test_spark_schema_matches_ingest_parquet(spark, tmp_path):
+    """
+    This test checks that Parquet written by the ingest flow has the same schema
+    as CSV read by the Spark job, so both inputs can be used by the job
+    """
+    csv_path = tmp_path / "sd_2023.csv"
+    csv_path.write_text(
+        "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+        "E23010000001,2023-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,524,2\n"
+    )
+    parquet_path = tmp_path / "sd_2023.parquet"
+    csv_to_parquet(csv_path, parquet_path, "sd")
+
+    # Read both inputs by Spark, the cluster works in UTC
+    spark.conf.set("spark.sql.session.timeZone", "UTC")
+    df_csv = read_csv(spark, spark_schema("sd"), str(csv_path)).select(*parse_raw_columns("sd"))
+    df_parquet = read_parquet(spark, str(parquet_path))
+
+    # Assertions
+    assert [(f.name, f.dataType) for f in df_parquet.schema] == [(f.name, f.dataType) for f in df_csv.schema]
+    assert df_parquet.collect() == df_csv.collect()
+    assert pq.read_metadata(parquet_path).num_rows == 1
@@ -0,0 +1,88 @@
+import datetime
+import pyarrow.parquet as pq
+from flows.spark_job import write_parquet, read_parquet, add_date_partitions, date_partition_columns, parquet_layout
+
+
+def test_write_parquet_fixed_partitions(spark, tmp_path):
+    """
+    Test case for the default mode with the fixed number of files
+    """
+    df = spark.range(100)
+
+    write_parquet(df, f"{tmp_path}/pq", 3)
+
+    assert len(list(tmp_path.glob("pq/*.parquet"))) == 3
+    assert read_parquet(spark, f"{tmp_path}/pq").count() == 100
+
+
+def test_write_parquet_adaptive_coalesce(mocker, spark, tmp_path):
+    """
+    Test case for the adaptive mode: small data in many partitions is merged into one file without a shuffle
+    """
+    df = spark.range(1000).repartition(8)
+    spy_repartition = mocker.spy(df, "repartition")
+
+    write_parquet(df, f"{tmp_path}/pq", 24, target_file_bytes=128 * 1024 * 1024)
+
+    assert len(list(tmp_path.glob("pq/*.parquet"))) == 1
+    spy_repartition.assert_not_called()
+
+
+def test_write_parquet_partition_by(spark, tmp_path):
+    """
+    Test case for the lake partitioned by crime date, reads of one year are pruned to its directory
+    """
+    df = spark.createDataFrame(
+        [(1, "01/15/2022"), (2, "02/01/2022"), (3, "05/10/2023")],
+        ["Incident_Number", "Occurred_Date"],
+    )
+    df = add_date_partitions(df, "aus", "month")
+
+    write_parquet(df, f"{tmp_path}/pq", 2, partition_by=date_partition_columns("month"))
+
+    assert sorted(path.name for path in tmp_path.glob("pq/year=2022/*")) == ["month=1", "month=2"]
+    df_2023 = read_parquet(spark, f"{tmp_path}/pq").filter("year = 2023")
+    assert [row.Incident_Number for row in df_2023.collect()] == [3]
+    assert "PartitionFilters: [isnotnull(year" in df_2023._jdf.queryExecution().executedPlan().toString()
+
+
+def test_date_partition_columns():
+    """
+    Test case for partition columns of the lake
+    """
+    assert date_partition_columns(None) is None
+    assert date_partition_columns("year") == ["year"]
+    assert date_partition_columns("month") == ["year", "month"]
+
+
+def test_write_parquet_sorted_layout(spark, tmp_path):
+    """
+    Test case for the sorted layout: rows of each file are sorted by the crime date and code,
+    files are compressed with the chosen codec and string columns are dictionary-encoded
+    """
+    rows = [(i, f"{i % 12 + 1:02d}/{i % 28 + 1:02d}/2023", 600 - i % 5, "THEFT" if i % 2 else "ASSAULT")
+            for i in range(200)]
+    df = spark.createDataFrame(rows, ["Incident_Number", "Occurred_Date", "Highest_Offense_Code",
+                                      "Highest_Offense_Description"])
+    layout = parquet_layout("aus", "sorted", "zstd", row_group_bytes=1024 * 1024)
+
+    write_parquet(df, f"{tmp_path}/pq", 2, **layout)
+
+    for path in tmp_path.glob("pq/*.parquet"):
+        table = pq.read_table(path)
+        keys = [(datetime.datetime.strptime(date, "%m/%d/%Y"), code) for date, code in
+                zip(table["Occurred_Date"].to_pylist(), table["Highest_Offense_Code"].to_pylist())]
+        assert keys == sorted(keys)
+        column = pq.ParquetFile(path).metadata.row_group(0).column(3)
+        assert column.compression == "ZSTD"
+        assert "RLE_DICTIONARY" in column.encodings or "PLAIN_DICTIONARY" in column.encodings
+    assert read_parquet(spark, f"{tmp_path}/pq").count() == 200
+
+
+def test_parquet_layout_default():
+    """
+    Test case for the default layout: files aren't sorted, only compression is set
+    """
+    assert parquet_layout("la") == {"options": {}}
+    assert parquet_layout("la", compression="snappy") == {"options": {"compression": "snappy"}}
+    assert parquet_layout("la", "sorted")["options"]["parquet.block.size"] == str(128 * 1024 * 1024)
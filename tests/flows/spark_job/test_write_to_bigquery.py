@@ -0,0 +1,125 @@
+import datetime
+import pytest
+from pyspark.sql import DataFrame
+from argparse import Namespace
+from flows.spark_job import write_to_bigquery, cluster_columns_for_city
+
+
+class RecordingTable:
+    """BigQuery table partitioned by month of partitionField, records partitions replaced by writes"""
+
+    def __init__(self, partitions: dict = None):
+        self.partitions = partitions or {}
+        self.replaced = []
+        self.options = {}
+
+
+class RecordingWriter:
+    """Stand-in of the BigQuery connector's writer: overwrites the whole table or only its partitions in df"""
+
+    def __init__(self, df: DataFrame, table: RecordingTable):
+        self.df = df
+        self.table = table
+        self.options = {}
+        self.save_mode = None
+
+    def format(self, source):
+        assert source == "bigquery"
+        return self
+
+    def option(self, key, value):
+        self.options[key] = value
+        return self
+
+    def mode(self, save_mode):
+        self.save_mode = save_mode
+        return self
+
+    def save(self):
+        assert self.save_mode == "overwrite" and self.options["partitionType"] == "MONTH"
+        partitions = {}
+        for row in self.df.collect():
+            month = row[self.options["partitionField"]].replace(day=1)
+            partitions.setdefault(month, []).append(row.incident_num)
+        if self.options.get("spark.sql.sources.partitionOverwriteMode") == "DYNAMIC":
+            self.table.partitions.update(partitions)
+        else:
+            self.table.partitions = partitions
+        self.table.replaced.append(sorted(partitions))
+        self.table.options = self.options
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """Table with January and February, writes of DataFrames go to it"""
+    table = RecordingTable({datetime.date(2023, 1, 1): [1], datetime.date(2023, 2, 1): [2]})
+    monkeypatch.setattr(DataFrame, "write", property(lambda df: RecordingWriter(df, table)))
+    return table
+
+
+def create_crimes(spark, rows):
+    return spark.createDataFrame(rows, ["incident_num", "crime_date"])
+
+
+def test_write_to_bigquery_partition_overwrite(spark, table):
+    """
+    Test case for partition-scoped overwrite: only month partitions present in the DataFrame are replaced
+    """
+    df = create_crimes(spark, [(3, datetime.date(2023, 2, 10)), (4, datetime.date(2023, 3, 5))])
+
+    write_to_bigquery(df, "dataset.table", "crime_date", partition_overwrite=True)
+
+    # Assertions
+    assert table.replaced == [[datetime.date(2023, 2, 1), datetime.date(2023, 3, 1)]]
+    assert table.partitions == {datetime.date(2023, 1, 1): [1], datetime.date(2023, 2, 1): [3],
+                                datetime.date(2023, 3, 1): [4]}
+    assert "writeMethod" not in table.options
+
+
+def test_write_to_bigquery_full_overwrite(spark, table):
+    """
+    Test case for the default overwrite of the whole table
+    """
+    df = create_crimes(spark, [(3, datetime.date(2023, 2, 10))])
+
+    write_to_bigquery(df, "dataset.table", "crime_date")
+
+    assert table.partitions == {datetime.date(2023, 2, 1): [3]}
+    assert "clusteredFields" not in table.options
+
+
+def test_write_to_bigquery_cluster_columns(spark, table):
+    """
+    Test case for clustering: columns are passed to the connector as clusteredFields
+    """
+    df = create_crimes(spark, [(3, datetime.date(2023, 2, 10))])
+
+    write_to_bigquery(df, "dataset.table", "crime_date", cluster_columns=["call_type", "beat"])
+
+    assert table.options["clusteredFields"] == "call_type,beat"
+    assert table.options["partitionField"] == "crime_date"
+
+
+def test_write_to_bigquery_direct(spark, table):
+    """
+    Test case for the direct method with the Storage Write API, partitions are replaced the same way
+    """
+    df = create_crimes(spark, [(5, datetime.date(2023, 1, 20))])
+
+    write_to_bigquery(df, "dataset.table", "crime_date", partition_overwrite=True, write_method="direct")
+
+    assert table.options["writeMethod"] == "direct"
+    assert table.replaced == [[datetime.date(2023, 1, 1)]]
+    assert table.partitions[datetime.date(2023, 2, 1)] == [2]
+
+
+def test_cluster_columns_for_city():
+    """
+    Test case for --bq_cluster_by: columns of the city, None for cities without them
+    """
+    params = Namespace(bq_cluster_by="sd=call_type, beat;la=area_code")
+
+    assert cluster_columns_for_city(params, "sd") == ["call_type", "beat"]
+    assert cluster_columns_for_city(params, "la") == ["area_code"]
+    assert cluster_columns_for_city(params, "aus") is None
+    assert cluster_columns_for_city(Namespace(bq_cluster_by=None), "sd") is None
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from prefect_gcp import GcpCredentials
+from prefect_gcp.cloud_storage import GcsBucket
+# the cache is imported like ingest.py and make_gcp_blocks.py import it, so they share it with the tests
+from block_cache import load_block, load_credentials, invalidate_blocks, save_block, print_block_stats, cached
+from flows.ingest import get_gcs_bucket
+
+
+def test_load_block_cached(mock_gcs_bucket, mock_gcs_bucket_load):
+    """
+    This test checks that a block is loaded from the server once and then reused
+    """
+    assert load_block(GcsBucket, "bucket") is mock_gcs_bucket
+    assert load_block(GcsBucket, "bucket") is mock_gcs_bucket
+
+    mock_gcs_bucket_load.assert_called_once_with("bucket")
+    assert print_block_stats() == {"GcsBucket hit": 1, "GcsBucket load": 1}
+
+
+def test_load_block_expired(mocker, mock_gcs_bucket_load):
+    """
+    This test checks that a block older than ttl is loaded again
+    """
+    mocker.patch("time.monotonic", side_effect=[0, 5, 20, 20])
+
+    load_block(GcsBucket, "bucket", ttl=10)
+    load_block(GcsBucket, "bucket", ttl=10)
+    load_block(GcsBucket, "bucket", ttl=10)
+
+    assert mock_gcs_bucket_load.call_count == 2
+
+
+def test_cached_loads_names_in_parallel():
+    """
+    This test checks that a slow load of one block doesn't block loads of other names,
+    while concurrent loads of the same name make one round trip
+    """
+    other_loaded = threading.Event()
+    loads = []
+
+    def slow_load():
+        loads.append("slow")
+        # a lock held during round trips would keep the other name waiting here
+        assert other_loaded.wait(timeout=10)
+        return "slow"
+
+    threads = [threading.Thread(target=cached, args=("GcsBucket", "slow", slow_load)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert cached("GcsBucket", "other", lambda: "other") == "other"
+    other_loaded.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["slow"]
+    assert print_block_stats() == {"GcsBucket hit": 1, "GcsBucket load": 2}
+
+
+def test_load_credentials_cached(mock_gcp_credentials, mock_gcp_credentials_load):
+    """
+    This test checks that credentials are made from the block once
+    """
+    mock_gcp_credentials.get_credentials_from_service_account.return_value = "credentials"
+
+    assert load_credentials("creds") == "credentials"
+    assert load_credentials("creds") == "credentials"
+
+    mock_gcp_credentials_load.assert_called_once_with("creds")
+    mock_gcp_credentials.get_credentials_from_service_account.assert_called_once()
+
+
+def test_save_block_invalidates(mock_gcp_credentials, mock_gcp_credentials_load):
+    """
+    This test checks that saving a block removes its cached copy and credentials made from it
+    """
+    load_credentials("creds")
+    load_block(GcpCredentials, "other")
+
+    save_block(mock_gcp_credentials, "creds")
+    load_credentials("creds")
+    load_block(GcpCredentials, "other")
+
+    mock_gcp_credentials.save.assert_called_once_with("creds", overwrite=True)
+    assert mock_gcp_credentials_load.call_count == 3
+    assert mock_gcp_credentials.get_credentials_from_service_account.call_count == 2
+
+    invalidate_blocks()
+    load_block(GcpCredentials, "other")
+    assert mock_gcp_credentials_load.call_count == 4
+
+
+def test_get_gcs_bucket_round_trips(mock_env, mock_gcs_bucket_load, capsys):
+    """
+    This test checks the number of round trips reported for repeated uses of the bucket block
+    """
+    for _ in range(12):
+        get_gcs_bucket()
+
+    mock_gcs_bucket_load.assert_called_once()
+    print_block_stats()
+    assert "Prefect blocks: 1 round trips, 11 reused from the cache" in capsys.readouterr().out
@@ -0,0 +1,26 @@
+from flows.ingest import build_sources
+
+
+def test_build_sources_names():
+    """
+    Test case for the list of datasets to ingest.
+    """
+    sources = build_sources("aus_url", "la_url_1", "la_url_2", "sd_url", range(2015, 2024))
+
+    # Austin, 2 files for Los Angeles and 9 years for San Diego
+    assert len(sources) == 12
+    assert sources[:3] == [
+        ("aus_url", "aus_2003_2023.csv"),
+        ("la_url_1", "la_2010_2019.csv"),
+        ("la_url_2", "la_2020_2023.csv"),
+    ]
+
+
+def test_build_sources_sd_urls():
+    """
+    Test case for San Diego urls which have a different suffix before 2018.
+    """
+    sources = dict((csv_name, url) for url, csv_name in build_sources("aus", "la1", "la2", "sd_url", [2017, 2018]))
+
+    assert sources["sd_2017.csv"] == "sd_url_2017_datasd_v1.csv"
+    assert sources["sd_2018.csv"] == "sd_url_2018_datasd.csv"
@@ -0,0 +1,24 @@
+from flows.ingest import changed_cities
+
+
+def test_changed_cities():
+    """
+    Test case for cities with new files, failed and not modified files are ignored.
+    """
+    results = [
+        {"csv_name": "aus_2003_2023.csv", "size": 10, "seconds": 1.0, "skipped": True},
+        {"csv_name": "la_2010_2019.csv", "error": "404"},
+        {"csv_name": "sd_2015.csv", "size": 0, "seconds": 1.0, "skipped": True},
+        {"csv_name": "sd_2023.csv", "size": 10, "seconds": 1.0},
+    ]
+
+    assert changed_cities(results) == ["sd"]
+
+
+def test_changed_cities_nothing_changed():
+    """
+    Test case for a run where all files were not modified.
+    """
+    results = [{"csv_name": "aus_2003_2023.csv", "size": 0, "seconds": 1.0, "skipped": True}]
+
+    assert changed_cities(results) == []
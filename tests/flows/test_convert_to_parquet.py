@@ -0,0 +1,33 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flows.ingest import convert_to_parquet
+from flows.schemas import column_types
+
+
+def test_convert_to_parquet_successful(tmp_path):
+    """
+    This test converts a small San Diego CSV file and checks the names and types of the Parquet columns
+    """
+    # Create a CSV file with the original header, it's replaced by the schema names
+    csv_path = tmp_path / "sd_2023.csv"
+    csv_path.write_text(
+        "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+        "E23010000001,2023-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,524,2\n"
+        "E23010000002,2023-01-01 10:20:30,1,,,,,,,,415,K,521.0,\n"
+    )
+
+    # Call the function
+    parquet_path = convert_to_parquet.fn(csv_path)
+
+    # Assertions
+    assert parquet_path == tmp_path / "sd_2023.parquet"
+    table = pq.read_table(parquet_path)
+    assert table.column_names == [name for name, _ in column_types("sd")]
+    assert table.num_rows == 2
+
+    # Timestamps are in UTC like in Spark, beat and priority are cast to int
+    assert table.schema.field("date_time").type == pa.timestamp("us", tz="UTC")
+    assert table.schema.field("beat").type == pa.int32()
+    assert table.column("beat").to_pylist() == [524, 521]
+    assert table.column("priority").to_pylist() == [2, None]
+    assert table.column("address_dir_primary").to_pylist() == [None, None]
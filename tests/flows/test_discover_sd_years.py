@@ -0,0 +1,48 @@
+from datetime import date
+from flows.ingest import discover_sd_years
+
+
+def test_discover_sd_years_configured(mocker):
+    """
+    Test case for the configured range of years, the source is not probed.
+    """
+    mock_head = mocker.patch("requests.head")
+
+    assert discover_sd_years("sd_url", 2015, 2017) == [2015, 2016, 2017]
+    mock_head.assert_not_called()
+
+
+def test_discover_sd_years_probing(mocker):
+    """
+    Test case for discovering published years with HEAD requests up to the current year.
+    """
+    last_year = date.today().year - 1
+
+    # Files are published up to the last year
+    def head(url, **kwargs):
+        year = int(url.split("_")[2])
+        return mocker.Mock(status_code=200 if year <= last_year else 404)
+    mock_head = mocker.patch("requests.head", side_effect=head)
+
+    years = discover_sd_years("sd_url", 2015)
+
+    assert years == list(range(2015, last_year + 1))
+    assert mock_head.call_count == len(years) + 1
+    assert mock_head.call_args_list[0].args[0] == "sd_url_2015_datasd_v1.csv"
+
+
+def test_discover_sd_years_ledger(mocker):
+    """
+    Test case for years which are final in the ledger, they aren't probed again.
+    """
+    current_year = date.today().year
+    ledger = {"sd/2015": {"final": True}, "sd/2016": {"final": False}, f"sd/{current_year}": {"final": True}}
+    mock_head = mocker.patch("requests.head", return_value=mocker.Mock(status_code=200))
+
+    years = discover_sd_years("sd_url", 2015, ledger=ledger)
+
+    assert years == list(range(2015, current_year + 1))
+    probed = [call.args[0] for call in mock_head.call_args_list]
+    assert len(probed) == current_year - 2015
+    assert "sd_url_2015_datasd_v1.csv" not in probed
+    assert probed[0] == "sd_url_2016_datasd_v1.csv" and probed[-1] == f"sd_url_{current_year}_datasd.csv"
@@ -1,6 +1,7 @@
 import pytest
+import hashlib
 import requests
-from flows.ingest import download_file
+from flows.ingest import download_file, load_manifest, update_manifest, commit_manifest
 
 
 def test_download_file_successful(mock_successful_download, url, csv_name):
@@ -42,3 +43,139 @@ def test_download_file_connection_timeout(mocker, url, csv_name):
     # Attempt to call the function with mock data and catch the exception
     with pytest.raises(requests.exceptions.Timeout):
         download_file.fn(url, csv_name)
+
+
+def test_download_file_not_modified(http_server, tmp_path, csv_name):
+    """
+    This test simulates a second download of an uploaded file which hasn't changed
+    """
+    http_server.files["/rows.csv"] = b"some,data,here"
+    url = f"{http_server.url}/rows.csv"
+    manifest_path = tmp_path / "manifest.json"
+
+    # First download saves validators into the manifest
+    path = download_file.fn(url, csv_name, manifest_path)
+    assert path.read_bytes() == b"some,data,here"
+    path.unlink()
+    # The Spark job loaded the file
+    commit_manifest(manifest_path, [url])
+
+    # Second download is conditional and is skipped
+    assert download_file.fn(url, csv_name, manifest_path) is None
+    assert http_server.requests[-1][2]["If-None-Match"] == load_manifest(manifest_path)[url]["etag"]
+
+
+def test_download_file_modified(http_server, tmp_path, csv_name):
+    """
+    This test simulates a download of a file which has changed since the last upload
+    """
+    http_server.files["/rows.csv"] = b"some,data,here"
+    url = f"{http_server.url}/rows.csv"
+    manifest_path = tmp_path / "manifest.json"
+
+    download_file.fn(url, csv_name, manifest_path).unlink()
+    commit_manifest(manifest_path, [url])
+
+    # The file changed on the server
+    http_server.files["/rows.csv"] = b"new,data,here"
+    path = download_file.fn(url, csv_name, manifest_path)
+
+    # Check the new content and that its validators wait for the Spark job
+    assert path.read_bytes() == b"new,data,here"
+    entry = load_manifest(manifest_path)[url]
+    assert entry["sha256"] == hashlib.sha256(b"some,data,here").hexdigest()
+    assert entry["pending"]["sha256"] == hashlib.sha256(b"new,data,here").hexdigest()
+    path.unlink()
+
+
+def test_download_file_not_loaded(http_server, tmp_path, csv_name):
+    """
+    This test simulates a download of a file whose Spark job failed, the file is downloaded again
+    """
+    http_server.files["/rows.csv"] = b"some,data,here"
+    url = f"{http_server.url}/rows.csv"
+    manifest_path = tmp_path / "manifest.json"
+
+    # The file was uploaded, but the manifest isn't committed
+    download_file.fn(url, csv_name, manifest_path).unlink()
+
+    # Next download isn't conditional
+    path = download_file.fn(url, csv_name, manifest_path)
+    assert "If-None-Match" not in http_server.requests[-1][2]
+    assert path.read_bytes() == b"some,data,here"
+    path.unlink()
+
+
+def test_download_file_same_content_without_validators(mocker, mock_successful_download,
+                                                       tmp_path, url, csv_name):
+    """
+    This test simulates a server without validators which returns the same content again
+    """
+    manifest_path = tmp_path / "manifest.json"
+    mocker.patch('builtins.print')
+    update_manifest(manifest_path, url, uploaded=True,
+                    sha256=hashlib.sha256(mock_successful_download).hexdigest())
+
+    # The file is downloaded but reported as unchanged and removed
+    assert download_file.fn(url, csv_name, manifest_path) is None
+
+
+def test_download_file_resumes_partial_file(mocker, http_server, csv_name):
+    """
+    This test simulates a broken download which is resumed from the partial file by the next attempt
+    """
+    content = b"0123456789" * 1000
+    http_server.files["/rows.csv"] = content
+    url = f"{http_server.url}/rows.csv"
+    mocker.patch('builtins.print')
+    mocker.patch("flows.ingest.CHUNK_SIZE", 1000)
+
+    # The first attempt is cut off after 3000 bytes
+    http_server.fail_after = 3000
+    with pytest.raises(requests.exceptions.RequestException):
+        download_file.fn(url, csv_name)
+
+    # The second attempt asks only for the rest of the file
+    path = download_file.fn(url, csv_name)
+    assert http_server.requests[-1][2]["Range"] == "bytes=3000-"
+    assert path.read_bytes() == content
+    path.unlink()
+
+
+def test_download_file_in_segments(mocker, http_server, tmp_path, csv_name):
+    """
+    This test simulates a download in parallel byte-range segments
+    """
+    content = bytes(range(256)) * 400
+    http_server.files["/rows.csv"] = content
+    url = f"{http_server.url}/rows.csv"
+    mocker.patch("flows.ingest.MIN_SEGMENT_SIZE", 1024)
+    manifest_path = tmp_path / "manifest.json"
+
+    # Call the function
+    path = download_file.fn(url, csv_name, manifest_path, segments=4)
+
+    # Check that segments were requested and stitched in the right order
+    ranges = sorted(headers["Range"] for command, _, headers in http_server.requests if command == "GET")
+    assert ranges == ["bytes=0-25599", "bytes=25600-51199", "bytes=51200-76799", "bytes=76800-102399"]
+    assert path.read_bytes() == content
+    assert load_manifest(manifest_path)[url]["pending"]["sha256"] == hashlib.sha256(content).hexdigest()
+    assert list(path.parent.glob(f"{csv_name}.part*")) == []
+    path.unlink()
+
+
+def test_download_file_small_file_in_one_stream(http_server, csv_name):
+    """
+    This test checks that a file smaller than the minimal size of segments is downloaded in one request
+    """
+    http_server.files["/rows.csv"] = b"some,data,here"
+    url = f"{http_server.url}/rows.csv"
+
+    # Call the function
+    path = download_file.fn(url, csv_name, segments=4)
+
+    # Only HEAD and one GET without Range
+    assert [command for command, _, _ in http_server.requests] == ["HEAD", "GET"]
+    assert "Range" not in http_server.requests[-1][2]
+    assert path.read_bytes() == b"some,data,here"
+    path.unlink()
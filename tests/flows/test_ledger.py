@@ -0,0 +1,58 @@
+import json
+from flows.ingest import partition_key, partition_year, pending_sources, update_ledger, update_manifest
+
+
+def test_partition_key():
+    """
+    Test case for ledger keys and years of source files.
+    """
+    assert partition_key("sd_2019.csv") == "sd/2019"
+    assert partition_key("aus_2003_2023.csv") == "aus/2003_2023"
+    assert partition_year("sd_2019.csv") == 2019
+    assert partition_year("la_2010_2019.csv") is None
+
+
+def test_pending_sources_skips_final():
+    """
+    Test case for sources of final partitions, they are not downloaded unless rechecked.
+    """
+    sources = [("aus", "aus_2003_2023.csv"), ("sd_2022", "sd_2022.csv"), ("sd_2023", "sd_2023.csv")]
+    ledger = {
+        "aus/2003_2023": {"sha256": "a", "final": False},
+        "sd/2022": {"sha256": "b", "final": True},
+    }
+
+    assert pending_sources(sources, ledger) == [("aus", "aus_2003_2023.csv"), ("sd_2023", "sd_2023.csv")]
+    assert pending_sources(sources, ledger, recheck_final=True) == sources
+
+
+def test_update_ledger(tmp_path):
+    """
+    Test case for recording loaded partitions, only closed years become final
+    and failed or not uploaded files are not recorded.
+    """
+    manifest_path = tmp_path / "manifest.json"
+    ledger_path = tmp_path / "ledger.json"
+    update_manifest(manifest_path, "aus", sha256="a", uploaded=True)
+    update_manifest(manifest_path, "sd_2022", sha256="b", uploaded=True)
+    update_manifest(manifest_path, "sd_2023", sha256="c", uploaded=True)
+    update_manifest(manifest_path, "sd_2021", sha256="d", uploaded=False)
+    sources = [("aus", "aus_2003_2023.csv"), ("sd_2021", "sd_2021.csv"), ("sd_2022", "sd_2022.csv"),
+               ("sd_2023", "sd_2023.csv"), ("sd_2020", "sd_2020.csv")]
+    results = [
+        {"csv_name": "aus_2003_2023.csv", "size": 10, "seconds": 1.0},
+        {"csv_name": "sd_2021.csv", "error": "timeout"},
+        {"csv_name": "sd_2022.csv", "size": 0, "seconds": 1.0, "skipped": True},
+        {"csv_name": "sd_2023.csv", "size": 10, "seconds": 1.0},
+        {"csv_name": "sd_2020.csv", "error": "404"},
+    ]
+
+    update_ledger(ledger_path, manifest_path, sources, results, current_year=2023)
+
+    with open(ledger_path) as f:
+        ledger = json.load(f)
+    assert ledger == {
+        "aus/2003_2023": {"sha256": "a", "final": False},
+        "sd/2022": {"sha256": "b", "final": True},
+        "sd/2023": {"sha256": "c", "final": False},
+    }
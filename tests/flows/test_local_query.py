@@ -0,0 +1,102 @@
+import datetime
+import pytest
+from flows.ingest import csv_to_parquet
+from flows.schemas import AUS_COLUMNS, LA_COLUMNS, AUS_TIMESTAMP_FORMAT, SD_TIMESTAMP_FORMAT
+from flows.local_query import connect, daily_counts, top_crimes, fact_filter, strptime_format, FACT_COLUMNS
+
+
+def raw_csv(columns, rows):
+    """Return CSV text with the raw columns and rows given as dicts, other columns are empty"""
+    lines = [",".join(name for name, *_ in columns)]
+    lines += [",".join(str(row.get(name, "")) for name, *_ in columns) for row in rows]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def lake(tmp_path):
+    """Create the lake of 3 cities like the Spark job: flat files of Austin and LA, San Diego by year"""
+    for city in ["aus", "la", "sd/year=2023"]:
+        (tmp_path / city).mkdir(parents=True)
+    (tmp_path / "aus.csv").write_text(raw_csv(AUS_COLUMNS, [
+        {"Incident_Number": 20235000123, "Highest_Offense_Description": "THEFT", "Highest_Offense_Code": 600,
+         "Occurred_Date_Time": "05/01/2023 10:20:00 PM", "Occurred_Date": "05/01/2023", "Zip_Code": 78701,
+         "Clearance_Status": "C"},
+        {"Incident_Number": 20235000124, "Highest_Offense_Description": "THEFT", "Highest_Offense_Code": 600,
+         "Occurred_Date_Time": "05/02/2023 01:00:00 AM", "Occurred_Date": "05/02/2023", "Zip_Code": 78702},
+    ]))
+    csv_to_parquet(tmp_path / "aus.csv", tmp_path / "aus" / "part-0.parquet", "aus")
+    (tmp_path / "la.csv").write_text(raw_csv(LA_COLUMNS, [
+        {"DR_NO": 231204567, "DATE_OCC": "05/01/2023 12:00:00 AM", "TIME_OCC": "2130", "AREA": 12,
+         "AREA_NAME": "77th Street", "Crm_Cd": 510, "Crm_Cd_Desc": "VEHICLE - STOLEN", "Status_Desc": "Invest Cont"},
+    ]))
+    csv_to_parquet(tmp_path / "la.csv", tmp_path / "la" / "part-0.parquet", "la")
+    (tmp_path / "sd.csv").write_text(
+        "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+        "E23010000001,2023-05-01 10:20:30,2,,,,,,,,1016,A,111,2\n")
+    csv_to_parquet(tmp_path / "sd.csv", tmp_path / "sd" / "year=2023" / "part-0.parquet", "sd")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("materialize", [True, False])
+def test_fact_crimedata(lake, materialize):
+    """
+    Test case for fact_crimedata of all cities with the shape of the dbt model
+    """
+    con = connect(lake, materialize=materialize)
+
+    columns = [row[0] for row in con.execute("describe fact_crimedata").fetchall()]
+    rows = con.execute("select * from fact_crimedata order by city, incident_num").fetchall()
+
+    # Assertions
+    assert columns == FACT_COLUMNS
+    assert rows == [
+        (20235000123, "Austin", datetime.datetime(2023, 5, 1, 22, 20), datetime.date(2023, 5, 1),
+         "600", "THEFT", 78701, "", "Arrested"),
+        (20235000124, "Austin", datetime.datetime(2023, 5, 2, 1, 0), datetime.date(2023, 5, 2),
+         "600", "THEFT", 78702, "", None),
+        (231204567, "Los Angeles", datetime.datetime(2023, 5, 1, 21, 30), datetime.date(2023, 5, 1),
+         "510", "VEHICLE - STOLEN", 12, "77th Street", "Invest Cont"),
+        (23010000001, "San Diego", datetime.datetime(2023, 5, 1, 10, 20, 30), datetime.date(2023, 5, 1),
+         "1016", "PRISONER IN CUSTODY", 111, "Clairemont Mesa East", "ARREST"),
+    ]
+
+
+def test_aggregations(lake):
+    """
+    Test case for aggregations filtered by city and crime dates
+    """
+    con = connect(lake)
+
+    assert daily_counts(con, "Austin") == [("Austin", datetime.date(2023, 5, 1), 1),
+                                           ("Austin", datetime.date(2023, 5, 2), 1)]
+    assert daily_counts(con, start_date=datetime.date(2023, 5, 2)) == [("Austin", datetime.date(2023, 5, 2), 1)]
+    assert top_crimes(con, limit=1) == [("Austin", "THEFT", 2), ("Los Angeles", "VEHICLE - STOLEN", 1),
+                                        ("San Diego", "PRISONER IN CUSTODY", 1)]
+
+
+def test_connect_selected_cities(lake, tmp_path):
+    """
+    Test case for loading only selected cities, a directory without lakes is an error
+    """
+    con = connect(lake, cities=["la"])
+    assert con.execute("select distinct city from fact_crimedata").fetchall() == [("Los Angeles",)]
+
+    with pytest.raises(FileNotFoundError):
+        connect(str(tmp_path / "missing"))
+
+
+def test_fact_filter():
+    """
+    Test case for the WHERE clause of filters, values are passed as parameters
+    """
+    assert fact_filter() == ("", [])
+    assert fact_filter("Austin", end_date=datetime.date(2023, 1, 31)) == \
+        ("where city = ? and crime_date <= ?", ["Austin", datetime.date(2023, 1, 31)])
+
+
+def test_strptime_format():
+    """
+    Test case for DuckDB formats derived from Spark datetime patterns of schemas.py
+    """
+    assert strptime_format(AUS_TIMESTAMP_FORMAT) == "%m/%d/%Y %I:%M:%S %p"
+    assert strptime_format(SD_TIMESTAMP_FORMAT) == "%Y-%m-%d %H:%M:%S"
@@ -0,0 +1,14 @@
+from flows.make_dbt_staging import write_staging_models
+from flows.schemas import staging_sql
+
+
+def test_write_staging_models(tmp_path):
+    """
+    Test case for writing a staging model of every city to the directory.
+    """
+    paths = write_staging_models(str(tmp_path))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ["stg_austin_crimedata.sql", "stg_la_crimedata.sql", "stg_sd_crimedata.sql"]
+    assert len(paths) == 3
+    assert (tmp_path / "stg_la_crimedata.sql").read_text() == staging_sql("la")
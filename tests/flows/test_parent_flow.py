@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from flows.ingest import parent_flow, run_transfer, load_manifest, wait_for_dataproc_job, \
+    submit_dataproc_job
+
+
+@pytest.fixture
+def sources(http_server):
+    """
+    This fixture serves one file of every city and returns urls of parent_flow
+    """
+    for path in ["/aus.csv", "/la_1.csv", "/la_2.csv", "/sd_2023_datasd.csv"]:
+        http_server.files[path] = b"some,data,here\n"
+    return {
+        "aus_url": f"{http_server.url}/aus.csv",
+        "la_url_1": f"{http_server.url}/la_1.csv",
+        "la_url_2": f"{http_server.url}/la_2.csv",
+        "sd_url": f"{http_server.url}/sd",
+    }
+
+
+def run_parent_flow(sources: dict, manifest_path, **kwargs):
+    """Run parent_flow streaming the sources with 2 concurrent transfers"""
+    return parent_flow(**kwargs, **sources, temp_gcs_bucket="temp_gcs_bucket",
+                       input_path_aus="input_path_aus", output_path_aus="output_path_aus",
+                       output_bq_aus="output_bq_aus", input_path_la="input_path_la",
+                       output_path_la="output_path_la", output_bq_la="output_bq_la",
+                       input_path_sd="input_path_sd", output_path_sd="output_path_sd",
+                       output_bq_sd="output_bq_sd", max_concurrency=2,
+                       manifest_path=str(manifest_path) if manifest_path else None,
+                       stream_upload=True, sd_start_year=2023, sd_end_year=2023)
+
+
+def test_parent_flow_resubmits_failed_job(mocker, http_server, local_bucket, tmp_path, sources):
+    """
+    This test simulates a failed Spark job, files of the failed run are downloaded again
+    and the job is resubmitted by the next run, which then commits the manifest
+    """
+    mocker.patch("flows.ingest.load_env")
+    mocker.patch("flows.ingest.get_gcs_bucket", return_value=local_bucket)
+    mocker.patch.object(run_transfer, "retries", 0)
+    mock_submit_job = mocker.patch("flows.ingest.submit_job",
+                                   side_effect=[RuntimeError("Job job_1 is ERROR"), "job_2"])
+    manifest_path = tmp_path / "manifest.json"
+
+    # The first run uploads the files, but the job fails
+    with pytest.raises(RuntimeError, match="job_1 is ERROR"):
+        run_parent_flow(sources, manifest_path)
+    assert all("pending" in entry and not entry.get("uploaded") for entry in load_manifest(manifest_path).values())
+
+    # The next run doesn't send validators of the failed run, so the files are uploaded and submitted again
+    requests_before = len(http_server.requests)
+    run_parent_flow(sources, manifest_path)
+    assert all("If-None-Match" not in headers for _, _, headers in http_server.requests[requests_before:])
+    assert mock_submit_job.call_count == 2
+    assert mock_submit_job.call_args.kwargs["job_options"]["cities"] == ["aus", "la", "sd"]
+    assert all(entry.get("uploaded") and "pending" not in entry for entry in load_manifest(manifest_path).values())
+
+    # Files loaded by the job are skipped
+    run_parent_flow(sources, manifest_path)
+    assert mock_submit_job.call_count == 2
+
+
+def test_parent_flow_city_job_overlaps_transfers(mocker):
+    """
+    This test checks that with per_city_jobs the job of a city is submitted as soon as its sources are transferred,
+    while sources of other cities are still transferred, and cities without new files aren't submitted
+    """
+    mocker.patch("flows.ingest.load_env")
+    mocker.patch("flows.ingest.upload_job_files", return_value=("code/spark_job.py", [], "connector.jar"))
+    aus_submitted = threading.Event()
+    sd_waited = []
+    submitted = []
+
+    def transfer(url, csv_name, *args):
+        if csv_name.startswith("sd_"):
+            # a blocking pipeline would submit jobs only after this transfer
+            sd_waited.append(aus_submitted.wait(timeout=10))
+        return {"csv_name": csv_name, "size": 1, "seconds": 0.1, "skipped": csv_name.startswith("la_")}
+
+    def submit(spark_job_file, **kwargs):
+        city = kwargs["job_options"]["cities"][0]
+        submitted.append(city)
+        if city == "aus":
+            aus_submitted.set()
+        return f"job_{city}"
+
+    mocker.patch("flows.ingest.stream_file_to_gcs", side_effect=transfer)
+    mocker.patch.object(submit_dataproc_job, "fn", side_effect=submit)
+    mocker.patch.object(wait_for_dataproc_job, "fn", side_effect=lambda job_id: job_id)
+
+    run_parent_flow({"aus_url": "https://example.com/aus", "la_url_1": "https://example.com/la_1",
+                     "la_url_2": "https://example.com/la_2", "sd_url": "https://example.com/sd"},
+                    None, per_city_jobs=True)
+
+    assert sd_waited == [True]
+    assert sorted(submitted) == ["aus", "sd"]
+
+
+def test_parent_flow_rejects_stream_upload_alongside(mocker, sources):
+    """
+    This test checks that streamed uploads with Parquet alongside CSV are rejected before any transfer is submitted
+    """
+    mocker.patch("flows.ingest.load_env")
+    mock_transfer = mocker.patch("flows.ingest.stream_file_to_gcs")
+
+    with pytest.raises(ValueError, match="parquet_mode 'instead'"):
+        run_parent_flow(sources, None, parquet_mode="alongside")
+
+    mock_transfer.assert_not_called()
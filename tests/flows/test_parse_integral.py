@@ -0,0 +1,78 @@
+import pyarrow as pa
+from flows.ingest import parse_integral, cast_values, csv_to_parquet
+from flows.schemas import AUS_COLUMNS
+import pyarrow.parquet as pq
+
+
+def test_parse_integral():
+    """
+    Test case for integer values written as text, malformed values are null and counted, null values aren't malformed
+    """
+    array = pa.array(["524", "521.0", " 12.00 ", "+5", "-7.0", "12.5", "abc", "99999999999", "+-5", None])
+
+    parsed, malformed = parse_integral(array, pa.int32())
+
+    assert parsed.type == pa.int32()
+    assert parsed.to_pylist() == [524, 521, 12, 5, -7, None, None, None, None, None]
+    assert malformed == 4
+
+
+def test_cast_values():
+    """
+    Test case for typed text columns, the arrays are cast at once, values which can't be cast are null and counted
+    """
+    timestamps = pa.array(["2023-05-01 10:20:30", " 2024-02-29 00:00:00.5 ", "2023-02-30 10:00:00", "05/01/2023", None])
+    doubles = pa.array(["1.5", "+1.5", "-.5", "1e5", "1.2.3", "abc", None])
+    longs = pa.array(["20235000123", "+5", " -7 ", "5.0", "9999999999999999999", None])
+
+    parsed_timestamps, malformed_timestamps = cast_values(timestamps, "timestamp")
+    parsed_doubles, malformed_doubles = cast_values(doubles, "double")
+    parsed_longs, malformed_longs = cast_values(longs, "long")
+
+    assert parsed_timestamps.type == pa.timestamp("us")
+    assert [str(value) if value else None for value in parsed_timestamps.to_pylist()] == [
+        "2023-05-01 10:20:30", "2024-02-29 00:00:00.500000", None, None, None]
+    assert malformed_timestamps == 2
+    assert parsed_doubles.to_pylist() == [1.5, 1.5, -0.5, 100000.0, None, None, None]
+    assert malformed_doubles == 2
+    assert parsed_longs.type == pa.int64()
+    assert parsed_longs.to_pylist() == [20235000123, 5, -7, None, None, None]
+    assert malformed_longs == 2
+
+
+def test_csv_to_parquet_malformed_values(tmp_path, capsys):
+    """
+    Test case for converting San Diego data with malformed beat, the value is null and reported
+    """
+    csv_path = tmp_path / "sd_2023.csv"
+    csv_path.write_text(
+        "Incident Num,Date Time,Day,Addr,Dir,Road,Sfx,Dir2,Road2,Sfx2,Call,Disp,Beat,Priority\n"
+        "E23010000001,2023-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,521.0,2\n"
+        "E23010000002,2023-01-01 00:01:02,1,100,,MAIN,ST,,,,11-8,A,52a,\n"
+    )
+
+    assert csv_to_parquet(csv_path, tmp_path / "sd_2023.parquet", "sd") == 2
+
+    table = pq.read_table(tmp_path / "sd_2023.parquet")
+    assert table["beat"].to_pylist() == [521, None]
+    assert table["priority"].to_pylist() == [2, None]
+    assert "1 malformed values of beat are null" in capsys.readouterr().out
+
+
+def test_csv_to_parquet_malformed_typed_column(tmp_path, capsys):
+    """
+    Test case for a malformed value of an int column which isn't read as text in the Spark job,
+    the value is null like in PERMISSIVE mode and other rows are converted
+    """
+    csv_path = tmp_path / "aus.csv"
+    header = ",".join(name for name, _ in AUS_COLUMNS)
+    padding = "," * (len(AUS_COLUMNS) - 3)
+    csv_path.write_text(header + "\n" + "20235000123,Theft,600" + padding + "\n"
+                        + "20235000124,Theft,6x0" + padding + "\n")
+
+    assert csv_to_parquet(csv_path, tmp_path / "aus.parquet", "aus") == 2
+
+    table = pq.read_table(tmp_path / "aus.parquet")
+    assert table["Incident_Number"].to_pylist() == [20235000123, 20235000124]
+    assert table["Highest_Offense_Code"].to_pylist() == [600, None]
+    assert "1 malformed values of Highest_Offense_Code are null" in capsys.readouterr().out
@@ -0,0 +1,53 @@
+import os
+from flows.schemas import SOURCES, read_columns, column_types, narrowed_columns, staging_sql
+
+STAGING_DIR = os.path.join(os.path.dirname(__file__), "../../dbt_crime/models/staging")
+
+
+def test_narrowed_columns_read_as_text():
+    """
+    Test case for integer columns read as text and parsed to their type.
+    """
+    assert narrowed_columns("sd") == {"beat": "int", "priority": "int"}
+    assert narrowed_columns("aus") == {}
+
+    read_types = dict(read_columns("sd"))
+    types = dict(column_types("sd"))
+    assert read_types["beat"] == "string" and types["beat"] == "int"
+    # other columns are read with their type
+    assert read_types["incident_num"] == types["incident_num"] == "string"
+
+
+def test_models_use_raw_columns():
+    """
+    Test case for models of the cities: plain and derived columns refer to raw columns of the city.
+    """
+    for city, source in SOURCES.items():
+        raw_names = {name for name, _ in column_types(city)}
+        for name, column, _ in source["model"]:
+            if isinstance(column, str):
+                assert column in raw_names, (city, name)
+            elif column[0] != "expr":
+                assert column[1] in raw_names, (city, name)
+
+
+def test_staging_sql_matches_dbt_models():
+    """
+    Test case for dbt staging models generated from the registry,
+    the committed models must be regenerated with flows/make_dbt_staging.py after changes of schemas.py.
+    """
+    for city, source in SOURCES.items():
+        with open(os.path.join(STAGING_DIR, f"stg_{source['table']}.sql")) as f:
+            assert f.read() == staging_sql(city), city
+
+
+def test_staging_sql_casts():
+    """
+    Test case for casts of model columns in the staging model, string columns are not cast.
+    """
+    sql = staging_sql("sd")
+
+    assert "cast(beat as integer) as beat," in sql
+    assert "    call_type,\n" in sql
+    assert "{{ get_priority_description('priority') }} as priority_description\n" in sql
+    assert "from {{ source('staging','sd_crimedata') }}" in sql
@@ -0,0 +1,61 @@
+import pytest
+from flows.ingest import stream_file_to_gcs, load_manifest, commit_manifest
+
+
+def test_stream_file_to_gcs_successful(mocker, http_server, local_bucket, csv_name):
+    """
+    This test simulates streaming of a file from web into the bucket without a local file
+    """
+    content = b"some,data,here\n" * 1000
+    http_server.files["/rows.csv"] = content
+    mocker.patch("flows.ingest.UPLOAD_CHUNK_SIZE", 4096)
+
+    # Call the function
+    result = stream_file_to_gcs(f"{http_server.url}/rows.csv", csv_name, bucket=local_bucket)
+
+    # Assertions
+    blob = local_bucket.blobs[f"data/raw/aus/{csv_name}"]
+    assert blob.path.read_bytes() == content
+    assert result["size"] == len(content)
+
+    # Data was uploaded in bounded chunks
+    assert max(blob.chunks) == 4096
+    assert sum(blob.chunks) == len(content)
+
+
+def test_stream_file_to_gcs_not_modified(http_server, local_bucket, tmp_path, csv_name):
+    """
+    This test simulates streaming of a file which hasn't changed since the last upload
+    """
+    http_server.files["/rows.csv"] = b"some,data,here"
+    url = f"{http_server.url}/rows.csv"
+    manifest_path = tmp_path / "manifest.json"
+
+    # The first call uploads the file and saves validators into the manifest as pending
+    stream_file_to_gcs(url, csv_name, manifest_path, bucket=local_bucket)
+    assert "etag" in load_manifest(manifest_path)[url]["pending"]
+
+    # Until the Spark job has loaded the file, it's uploaded again
+    local_bucket.blobs.clear()
+    result = stream_file_to_gcs(url, csv_name, manifest_path, bucket=local_bucket)
+    assert not result.get("skipped")
+    assert f"data/raw/aus/{csv_name}" in local_bucket.blobs
+
+    # The job loaded the file, the next call is skipped
+    commit_manifest(manifest_path, [url])
+    assert load_manifest(manifest_path)[url]["uploaded"] is True
+    local_bucket.blobs.clear()
+    result = stream_file_to_gcs(url, csv_name, manifest_path, bucket=local_bucket)
+    assert result["skipped"] is True
+    assert local_bucket.blobs == {}
+
+
+def test_stream_file_to_gcs_failed_download(http_server, local_bucket, csv_name):
+    """
+    This test simulates a failed download, nothing is uploaded
+    """
+    # Call the function and assert it raises the expected exception
+    with pytest.raises(RuntimeError):
+        stream_file_to_gcs(f"{http_server.url}/missing.csv", csv_name, bucket=local_bucket)
+
+    assert local_bucket.blobs == {}
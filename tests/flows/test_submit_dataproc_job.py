@@ -1,7 +1,7 @@
 import pytest
 import os
 from pathlib import Path
-from flows.ingest import submit_dataproc_job
+from flows.ingest import submit_dataproc_job, BIGQUERY_CONNECTOR_JAR
 
 
 def test_submit_dataproc_job_successful(mocker,
@@ -64,7 +64,7 @@ def test_submit_dataproc_job_successful(mocker,
                 "--output_path_sd", output_path_sd,
                 "--output_bq_sd", output_bq_sd
             ],
-            "jar_file_uris": ["gs://spark-lib/bigquery/spark-bigquery-latest_2.12.jar"],
+            "jar_file_uris": [BIGQUERY_CONNECTOR_JAR],
             "python_file_uris": [],
             "file_uris": [],
             "archive_uris": [],
@@ -178,3 +178,93 @@ def test_submit_dataproc_job_exception_handling(mocker,
     mock_job_controller_client.submit_job_as_operation.assert_called_once()
 
     assert str(e.value) == "Test Exception"
+
+
+@pytest.mark.parametrize("job_options, expected_args", [
+    ({}, []),
+    ({"cities": ["aus", "sd"]}, ["--cities", "aus,sd"]),
+    ({"input_format": "parquet"}, ["--input_format", "parquet"]),
+    ({"input_format": "csv", "cities": []}, []),
+    ({"cities": ["sd"], "sd_years": [2022, 2023]}, ["--cities", "sd", "--sd_years", "2022,2023"]),
+    ({"watermark_path": "gs://bucket/state/watermarks/"}, ["--watermark_path", "gs://bucket/state/watermarks/"]),
+    ({"single_pass": True}, ["--single_pass"]),
+    ({"parallel_cities": 3}, ["--parallel_cities", "3"]),
+    ({"parallel_cities": 1}, []),
+    ({"target_file_mb": 192, "partition_lake_by": "month"},
+     ["--target_file_mb", "192", "--partition_lake_by", "month"]),
+    ({"parquet_layout": "sorted", "parquet_compression": "zstd"},
+     ["--parquet_layout", "sorted", "--parquet_compression", "zstd"]),
+    ({"bq_write_method": "direct"}, ["--bq_write_method", "direct"]),
+    ({"bq_cluster_by": "sd=call_type,beat"}, ["--bq_cluster_by", "sd=call_type,beat"]),
+])
+def test_submit_dataproc_job_options(mocker,
+                                     mock_dataproc_env,
+                                     mock_gcp_credentials,
+                                     mock_gcp_credentials_load,
+                                     mock_job_controller_client,
+                                     mock_dataproc_client,
+                                     job_options,
+                                     expected_args):
+    """
+    This test checks that options of the job are passed to the Spark job as flags after its paths,
+    options with default values are not passed
+    """
+    mocker.patch("uuid.uuid4", return_value="test_uuid")
+
+    # Call the function with the job options
+    submit_dataproc_job.fn(
+        "test_spark_job.py", "temp_gcs_bucket",
+        "input_path_aus", "output_path_aus", "output_bq_aus",
+        "input_path_la", "output_path_la", "output_bq_la",
+        "input_path_sd", "output_path_sd", "output_bq_sd",
+        job_options=job_options
+    )
+
+    # Check the arguments of the submitted job, the first 20 are the bucket and paths
+    request = mock_job_controller_client.submit_job_as_operation.call_args.kwargs["request"]
+    assert request["job"]["pyspark_job"]["args"][20:] == expected_args
+
+
+def test_submit_dataproc_job_unknown_option(mock_dataproc_env,
+                                            mock_gcp_credentials_load,
+                                            mock_job_controller_client,
+                                            mock_dataproc_client):
+    """
+    This test checks that a misspelled job option is not ignored
+    """
+    with pytest.raises(ValueError, match="Unknown job options: city"):
+        submit_dataproc_job.fn(
+            "test_spark_job.py", "temp_gcs_bucket",
+            "input_path_aus", "output_path_aus", "output_bq_aus",
+            "input_path_la", "output_path_la", "output_bq_la",
+            "input_path_sd", "output_path_sd", "output_bq_sd",
+            job_options={"city": ["sd"]}
+        )
+
+    mock_job_controller_client.submit_job_as_operation.assert_not_called()
+
+
+def test_submit_dataproc_job_python_files(mocker,
+                                          mock_dataproc_env,
+                                          mock_gcp_credentials,
+                                          mock_gcp_credentials_load,
+                                          mock_job_controller_client,
+                                          mock_dataproc_client):
+    """
+    This test checks that the job dependencies are passed to the Spark job
+    """
+    mocker.patch("uuid.uuid4", return_value="test_uuid")
+    mocker.patch("os.getenv", side_effect=lambda x, default=None: os.environ.get(x, f"test_{x.lower()}"))
+
+    # Call the function with the shared schemas module
+    submit_dataproc_job.fn(
+        "test_spark_job.py", "temp_gcs_bucket",
+        "input_path_aus", "output_path_aus", "output_bq_aus",
+        "input_path_la", "output_path_la", "output_bq_la",
+        "input_path_sd", "output_path_sd", "output_bq_sd",
+        python_files=["code/schemas.py"]
+    )
+
+    # Check the dependencies of the submitted job
+    pyspark_job = mock_job_controller_client.submit_job_as_operation.call_args.kwargs["request"]["job"]["pyspark_job"]
+    assert pyspark_job["python_file_uris"] == [f"gs://{os.getenv('DATA_LAKE_BUCKET_NAME')}/code/schemas.py"]
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from prefect import flow
+
+from flows.ingest import run_transfer, start_transfers, transfer_results
+
+
+def track_transfers(active: list, peak: list, lock: threading.Lock):
+    """Return a fake transfer which records the number of transfers running at once"""
+    def transfer(url, csv_name, *args):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        if csv_name == "bad.csv":
+            raise FileNotFoundError(url)
+        return {"csv_name": csv_name, "size": 1, "seconds": 0.2}
+
+    return transfer
+
+
+def test_submit_transfers_max_concurrency(mocker):
+    """
+    This test submits more files than slots, no more than max_concurrency transfers may run at once
+    and a failed file doesn't stop the others
+    """
+    active, peak, lock = [0], [0], threading.Lock()
+    mocker.patch("flows.ingest.transfer_file", side_effect=track_transfers(active, peak, lock))
+    mocker.patch.object(run_transfer, "retries", 0)
+    sources = [(f"https://example.com/{i}", f"file_{i}.csv") for i in range(7)] + [
+        ("https://example.com/bad", "bad.csv")]
+
+    @flow(name="transfers-max-concurrency")
+    def transfers():
+        return transfer_results(sources, start_transfers(sources, max_concurrency=3))
+
+    results = transfers()
+
+    # Assertions
+    assert peak[0] == 3
+    assert [result["csv_name"] for result in results] == [csv_name for _, csv_name in sources]
+    assert "error" in results[-1]
+    assert all("error" not in result for result in results[:-1])
+
+
+def test_submit_transfers_stream_upload(mocker):
+    """
+    This test checks streamed uploads share the limit as well
+    """
+    active, peak, lock = [0], [0], threading.Lock()
+    mocker.patch("flows.ingest.stream_file_to_gcs", side_effect=track_transfers(active, peak, lock))
+    mock_transfer = mocker.patch("flows.ingest.transfer_file")
+    sources = [(f"https://example.com/{i}", f"file_{i}.csv") for i in range(4)]
+
+    @flow(name="transfers-stream-upload")
+    def transfers():
+        return transfer_results(sources, start_transfers(sources, max_concurrency=1, stream_upload=True))
+
+    results = transfers()
+
+    # Assertions
+    assert peak[0] == 1
+    assert len(results) == 4
+    mock_transfer.assert_not_called()
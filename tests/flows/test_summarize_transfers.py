@@ -0,0 +1,46 @@
+from flows.ingest import summarize_transfers
+
+
+def test_summarize_transfers_successful(mocker):
+    """
+    Test case for a batch where all files were transferred.
+    """
+    # Capture prints
+    mock_print = mocker.patch('builtins.print')
+
+    mb = 1024 * 1024
+    results = [
+        {"csv_name": "aus_2003_2023.csv", "size": 10 * mb, "seconds": 2.0},
+        {"csv_name": "sd_2015.csv", "size": 2 * mb, "seconds": 1.0},
+    ]
+
+    # Call the function
+    summary = summarize_transfers(results, elapsed=3.0)
+
+    # Assertions
+    assert summary["files"] == 2
+    assert summary["failed"] == []
+    assert summary["size_mb"] == 12
+    assert summary["throughput_mb_s"] == 4
+    mock_print.assert_any_call("aus_2003_2023.csv: 10.00 MB in 2.0 s (5.00 MB/s)")
+
+
+def test_summarize_transfers_with_failed_file(mocker):
+    """
+    Test case for a batch where one of the files failed.
+    """
+    # Capture prints
+    mock_print = mocker.patch('builtins.print')
+
+    results = [
+        {"csv_name": "aus_2003_2023.csv", "size": 1024 * 1024, "seconds": 1.0},
+        {"csv_name": "la_2010_2019.csv", "error": "404"},
+    ]
+
+    # Call the function
+    summary = summarize_transfers(results, elapsed=1.0)
+
+    # Assertions
+    assert summary["files"] == 1
+    assert summary["failed"] == ["la_2010_2019.csv"]
+    mock_print.assert_any_call("la_2010_2019.csv: FAILED (404)")
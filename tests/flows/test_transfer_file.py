@@ -0,0 +1,36 @@
+import pytest
+from flows.ingest import transfer_file
+
+
+def test_transfer_file_successful(mocker, mock_successful_download, url, csv_name):
+    """
+    This test simulates a successful download and upload of one file
+    """
+    # Mock upload to GCS
+    mock_upload = mocker.patch("flows.ingest.upload_to_gcs.fn")
+
+    # Call the function
+    result = transfer_file(url, csv_name)
+
+    # Assertions
+    assert result["csv_name"] == csv_name
+    assert result["size"] == len(mock_successful_download)
+    assert result["seconds"] >= 0
+    mock_upload.assert_called_once()
+
+    # The local file is removed after uploading
+    assert not mock_upload.call_args.kwargs["from_path"].exists()
+
+
+def test_transfer_file_failed_download(mocker, mock_failed_download, url, csv_name):
+    """
+    This test simulates a failed download, the file must not be uploaded
+    """
+    # Mock upload to GCS
+    mock_upload = mocker.patch("flows.ingest.upload_to_gcs.fn")
+
+    # Call the function and assert it raises the expected exception
+    with pytest.raises(FileNotFoundError):
+        transfer_file(url, csv_name)
+
+    mock_upload.assert_not_called()
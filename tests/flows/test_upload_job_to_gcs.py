@@ -0,0 +1,100 @@
+import os
+import time
+import zipfile
+from pathlib import Path
+from flows.ingest import artifact_path, upload_artifact, zip_modules, cache_connector_jar, \
+    upload_job_dependencies_to_gcs
+
+
+def test_artifact_path(tmp_path):
+    """
+    This test checks that the path in GCS keeps the file's name and changes only with its content
+    """
+    path = tmp_path / "spark_job.py"
+    path.write_text("print('v1')")
+    first = artifact_path(path)
+
+    assert first.name == "spark_job.py"
+    assert first.parts[0] == "code"
+    assert artifact_path(path) == first
+
+    path.write_text("print('v2')")
+    assert artifact_path(path) != first
+
+
+def test_upload_artifact_skips_existing(mocker, tmp_path):
+    """
+    This test checks that a file already in GCS with the same content isn't uploaded again
+    """
+    path = tmp_path / "schemas.py"
+    path.write_text("COLUMNS = []")
+    bucket = mocker.patch("flows.ingest.get_gcs_bucket").return_value
+    mock_upload = mocker.patch("flows.ingest.upload_to_gcs")
+
+    bucket.blob.return_value.exists.return_value = True
+    assert upload_artifact(path) == artifact_path(path)
+    mock_upload.fn.assert_not_called()
+
+    bucket.blob.return_value.exists.return_value = False
+    upload_artifact(path)
+    mock_upload.fn.assert_called_once_with(from_path=path, to_path=artifact_path(path))
+    bucket.blob.assert_called_with(artifact_path(path).as_posix())
+
+
+def test_zip_modules_reproducible(tmp_path):
+    """
+    This test checks that the same modules give the same zip, so its path in GCS doesn't change
+    """
+    module = tmp_path / "schemas.py"
+    module.write_text("SOURCES = {'sd': 1}\n")
+
+    first = zip_modules([module], tmp_path / "first.zip").read_bytes()
+    os.utime(module, (time.time() + 100, time.time() + 100))
+    second = zip_modules([module], tmp_path / "second.zip").read_bytes()
+
+    assert first == second
+    with zipfile.ZipFile(tmp_path / "first.zip") as zf:
+        assert zf.namelist() == ["schemas.py"]
+        assert zf.read("schemas.py") == b"SOURCES = {'sd': 1}\n"
+
+
+def test_upload_job_dependencies_zip(mocker):
+    """
+    This test checks that with zip_dependencies modules are uploaded as one zip which is removed afterwards
+    """
+    uploaded = []
+
+    def upload(path):
+        with zipfile.ZipFile(path) as zf:
+            uploaded.append(zf.namelist())
+        return Path(f"code/hash/{path.name}")
+
+    mocker.patch("flows.ingest.upload_artifact", side_effect=upload)
+
+    paths = upload_job_dependencies_to_gcs.fn(zip_dependencies=True)
+
+    assert paths == [Path("code/hash/job_dependencies.zip")]
+    assert uploaded == [["schemas.py"]]
+    assert not os.path.exists("data/job_dependencies.zip")
+
+
+def test_cache_connector_jar(mocker):
+    """
+    This test checks that the connector is copied to the data lake bucket only once
+    """
+    bucket = mocker.patch("flows.ingest.get_gcs_bucket").return_value
+    bucket.name = "lake"
+    source_bucket = bucket.client.bucket.return_value
+
+    bucket.blob.return_value.exists.return_value = False
+    uri = cache_connector_jar.fn("gs://spark-lib/bigquery/connector-1.0.jar")
+
+    assert uri == "gs://lake/jars/connector-1.0.jar"
+    bucket.client.bucket.assert_called_once_with("spark-lib")
+    source_bucket.copy_blob.assert_called_once_with(source_bucket.blob.return_value, bucket,
+                                                    "jars/connector-1.0.jar")
+    source_bucket.blob.assert_called_once_with("bigquery/connector-1.0.jar")
+
+    bucket.blob.return_value.exists.return_value = True
+    assert cache_connector_jar.fn("gs://spark-lib/bigquery/connector-1.0.jar") == uri
+    source_bucket.copy_blob.assert_called_once()
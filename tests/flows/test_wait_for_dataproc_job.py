@@ -0,0 +1,172 @@
+import pytest
+from google.cloud import dataproc_v1 as dataproc
+from flows.ingest import get_dataproc_client, submit_dataproc_job, wait_for_dataproc_job, run_city_job, \
+    city_job_properties, load_manifest, update_pending
+
+
+class FakeJobController:
+    """Stand-in of JobControllerClient: submitted job goes through the given states, one per get_job"""
+
+    def __init__(self, states: list, details: str = ""):
+        self.states = list(states)
+        self.details = details
+        self.requests = []
+
+    def job(self, job_id: str, state: str) -> dataproc.Job:
+        return dataproc.Job(reference={"job_id": job_id},
+                            status={"state": state, "details": self.details},
+                            driver_output_resource_uri=f"gs://staging/driveroutput/{job_id}")
+
+    def submit_job(self, request):
+        self.requests.append(request)
+        return self.job(request["job"]["reference"]["job_id"], "PENDING")
+
+    def get_job(self, request):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return self.job(request["job_id"], state)
+
+
+@pytest.fixture
+def fake_controller(mocker, mock_dataproc_env, mock_gcp_credentials_load, mock_dataproc_client):
+    """Factory of fake job controllers returned by the Dataproc client factory"""
+    def create(states, details=""):
+        controller = FakeJobController(states, details)
+        mock_dataproc_client.return_value = controller
+        return controller
+    return create
+
+
+def test_get_dataproc_client_cached(mock_dataproc_env, mock_gcp_credentials_load, mock_dataproc_client):
+    """
+    This test checks that clients are created once per region and credentials block
+    """
+    client = get_dataproc_client("test_region", "test_creds")
+
+    assert get_dataproc_client("test_region", "test_creds") is client
+    mock_gcp_credentials_load.assert_called_once_with("test_creds")
+    mock_dataproc_client.assert_called_once()
+
+    get_dataproc_client("other_region", "test_creds")
+    assert mock_dataproc_client.call_count == 2
+
+
+def test_submit_dataproc_job_without_wait(mocker, fake_controller):
+    """
+    This test checks that without wait the job is submitted and its ID is returned without waiting for it
+    """
+    mocker.patch("uuid.uuid4", return_value="test_uuid")
+    controller = fake_controller(["RUNNING"])
+
+    job_id = submit_dataproc_job.fn(
+        "test_spark_job.py", "temp_gcs_bucket",
+        "input_path_aus", "output_path_aus", "output_bq_aus",
+        "input_path_la", "output_path_la", "output_bq_la",
+        "input_path_sd", "output_path_sd", "output_bq_sd",
+        wait=False
+    )
+
+    assert job_id == "test_uuid"
+    assert len(controller.requests) == 1
+    assert controller.requests[0]["job"]["reference"] == {"job_id": "test_uuid"}
+
+
+def test_wait_for_dataproc_job_done(mocker, capsys, fake_controller):
+    """
+    This test checks polling with growing intervals and printing of state changes and driver output
+    """
+    mock_sleep = mocker.patch("time.sleep")
+    fake_controller(["PENDING", "RUNNING", "RUNNING", "RUNNING", "DONE"])
+
+    job_id = wait_for_dataproc_job.fn("job_1", poll_interval=4, max_interval=8)
+
+    assert job_id == "job_1"
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [4, 6, 8, 8]
+    output = capsys.readouterr().out
+    assert "driver output: gs://staging/driveroutput/job_1" in output
+    assert [line.split(" is ")[1].split()[0] for line in output.splitlines() if " is " in line] == \
+        ["PENDING", "RUNNING", "DONE"]
+
+
+def test_wait_for_dataproc_job_error(mocker, fake_controller):
+    """
+    This test checks that a failed job raises RuntimeError with details of its status
+    """
+    mocker.patch("time.sleep")
+    fake_controller(["RUNNING", "ERROR"], details="Job failed with message [Out of memory]")
+
+    with pytest.raises(RuntimeError, match="ERROR: Job failed with message"):
+        wait_for_dataproc_job.fn("job_1")
+
+
+def test_wait_for_dataproc_job_timeout(mocker, fake_controller):
+    """
+    This test checks that polling stops when the job isn't finished in time
+    """
+    mocker.patch("time.sleep")
+    mocker.patch("time.monotonic", side_effect=[0, 10, 20, 30, 40])
+    fake_controller(["RUNNING"])
+
+    with pytest.raises(TimeoutError):
+        wait_for_dataproc_job.fn("job_1", timeout=15)
+
+
+def test_run_city_job(mocker, fake_controller):
+    """
+    This test checks that the city's job processes only the city with its Spark properties
+    """
+    mocker.patch("time.sleep")
+    mocker.patch("uuid.uuid4", return_value="test_uuid")
+    controller = fake_controller(["RUNNING", "DONE"])
+    job_paths = {
+        "temp_gcs_bucket": "temp_gcs_bucket",
+        "input_path_aus": "input_path_aus", "output_path_aus": "output_path_aus", "output_bq_aus": "output_bq_aus",
+        "input_path_la": "input_path_la", "output_path_la": "output_path_la", "output_bq_la": "output_bq_la",
+        "input_path_sd": "input_path_sd", "output_path_sd": "output_path_sd", "output_bq_sd": "output_bq_sd",
+    }
+
+    job_id = run_city_job.fn("sd", "test_spark_job.py", job_paths, {"cities": ["aus", "sd"], "sd_years": [2023]},
+                             properties={"spark.executor.memory": "8g"})
+
+    assert job_id == "test_uuid"
+    pyspark_job = controller.requests[0]["job"]["pyspark_job"]
+    assert pyspark_job["args"][-4:] == ["--cities", "sd", "--sd_years", "2023"]
+    assert pyspark_job["properties"] == {"spark.executor.memory": "8g"}
+
+
+@pytest.mark.parametrize("state, committed", [("DONE", True), ("ERROR", False)])
+def test_run_city_job_commits_manifest(mocker, tmp_path, fake_controller, state, committed):
+    """
+    This test checks that pending validators of the city's files are committed only if its job succeeds
+    """
+    mocker.patch("time.sleep")
+    fake_controller(["RUNNING", state])
+    manifest_path = tmp_path / "manifest.json"
+    update_pending(manifest_path, "sd_2023", etag='"new"', sha256="b")
+    update_pending(manifest_path, "la_2020", etag='"la"', sha256="c")
+    job_paths = {name: name for name in [
+        "temp_gcs_bucket", "input_path_aus", "output_path_aus", "output_bq_aus", "input_path_la", "output_path_la",
+        "output_bq_la", "input_path_sd", "output_path_sd", "output_bq_sd"]}
+
+    if committed:
+        run_city_job.fn("sd", "test_spark_job.py", job_paths, manifest_path=manifest_path, urls=["sd_2023"])
+    else:
+        with pytest.raises(RuntimeError):
+            run_city_job.fn("sd", "test_spark_job.py", job_paths, manifest_path=manifest_path, urls=["sd_2023"])
+
+    manifest = load_manifest(manifest_path)
+    assert ("pending" not in manifest["sd_2023"]) == committed
+    assert manifest["sd_2023"].get("etag") == ('"new"' if committed else None)
+    assert manifest["sd_2023"].get("uploaded") == (True if committed else None)
+    # files of other cities stay pending
+    assert "pending" in manifest["la_2020"]
+
+
+def test_city_job_properties():
+    """
+    This test checks that properties of a city override the defaults only for this city
+    """
+    properties = city_job_properties("sd", {"sd": {"spark.executor.memory": "8g"}})
+
+    assert properties["spark.executor.memory"] == "8g"
+    assert "spark.dynamicAllocation.maxExecutors" in properties
+    assert "spark.executor.memory" not in city_job_properties("la", {"sd": {"spark.executor.memory": "8g"}})